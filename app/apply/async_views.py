@@ -0,0 +1,256 @@
+"""
+Native async resume endpoints for ASGI (daphne).
+
+DRF views are synchronous, so under ASGI every request, and every slow
+Gemini call or R2 upload inside it, holds a thread of the sync_to_async
+pool. These plain async Django views use the async ORM, await the Gemini
+call through the SDK's asyncio client and hand storage writes to a
+dedicated bounded thread pool, so one process can keep many slow uploads
+in flight. Responses match the ResumeViewSet endpoints.
+"""
+import asyncio
+import json
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from . import models
+from .pagination import ResumeKeysetPagination
+from .resume_events import TERMINAL_STATUSES, get_events_setting, is_terminal_event, status_data
+from .resume_parser import afind_stored_copy, clone_resume_data
+from .resume_queue import aprocess_resume, aset_status, get_processing_setting, get_storage_executor, store_upload
+from .serializers import ResumeSerializer, ResumeStatusSerializer
+from .utils import SharedBuffer
+
+logger = logging.getLogger(__name__)
+
+def _authenticate_sync(request, allow_query_token: bool):
+    authentication = JWTAuthentication()
+    result = authentication.authenticate(request)
+    if result is not None:
+        return result[0]
+    raw_token = request.GET.get('token') if allow_query_token else None
+    if not raw_token:
+        return None
+    return authentication.get_user(authentication.get_validated_token(raw_token))
+
+
+async def _authenticate(request, allow_query_token: bool = False):
+    """
+    Authenticate the request with the JWT Authorization header (or the
+    ``token`` query parameter, for EventSource connections that cannot set headers).
+
+    Returns:
+        (user, None) on success, (None, error response) otherwise
+    """
+    try:
+        user = await sync_to_async(_authenticate_sync)(request, allow_query_token)
+    except (AuthenticationFailed, InvalidToken) as e:
+        return None, JsonResponse({'detail': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+    if user is None:
+        return None, JsonResponse(
+            {'detail': 'Authentication credentials were not provided.'},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+    return user, None
+
+
+async def _get_resume(user, pk) -> models.Resume:
+    try:
+        return await models.Resume.objects.filter(user=user).aget(pk=pk)
+    except models.Resume.DoesNotExist:
+        raise Http404
+
+
+async def save_upload(upload: SharedBuffer) -> str:
+    """
+    Write an upload to the resume storage backend without blocking the event loop.
+
+    Returns:
+        The stored file name
+    """
+    loop = asyncio.get_running_loop()
+    # Storage writes run in their own pool so they cannot starve other sync_to_async work
+    return await loop.run_in_executor(get_storage_executor(), store_upload, upload)
+
+
+# Token-authenticated like the DRF views, which are CSRF exempt as well
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncResumeListView(View):
+    """
+    GET  /api/async/resumes/  list the user's resumes
+    POST /api/async/resumes/  upload a resume (multipart, field ``file``)
+    """
+
+    async def get(self, request):
+        user, error = await _authenticate(request)
+        if error:
+            return error
+        paginator = ResumeKeysetPagination()
+        queryset = models.Resume.objects.filter(user=user).defer('text_extracted', 'text_normalized')
+        drf_request = Request(request)
+        try:
+            resumes = await sync_to_async(paginator.paginate_queryset)(queryset, drf_request)
+        except NotFound as e:
+            return JsonResponse({'detail': str(e.detail)}, status=status.HTTP_404_NOT_FOUND)
+        data = ResumeSerializer(resumes, many=True, context={'request': request, 'omit_text': True}).data
+        return JsonResponse(paginator.get_paginated_response(data).data)
+
+    async def post(self, request):
+        user, error = await _authenticate(request)
+        if error:
+            return error
+
+        serializer = ResumeSerializer(data=request.FILES, context={'request': request})
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # Mapped once, as in ResumeSerializer.create: hashing, the R2 upload and
+        # extraction all read the same buffer. Spooling and hashing a 10MB upload
+        # is blocking work, so it stays off the event loop
+        upload = await sync_to_async(SharedBuffer, thread_sensitive=False)(serializer.validated_data['file'])
+        try:
+            resume = await self._create(user, upload)
+        finally:
+            upload.close()
+
+        response_status = (
+            status.HTTP_201_CREATED if resume.status == models.Resume.Status.DONE else status.HTTP_202_ACCEPTED
+        )
+        data = ResumeSerializer(resume, context={'request': request}).data
+        return JsonResponse(data, status=response_status)
+
+    async def _create(self, user, upload: SharedBuffer) -> models.Resume:
+        """Store (or reuse) the upload and create the resume, as ResumeSerializer._create does."""
+        content_hash = await sync_to_async(upload.sha256, thread_sensitive=False)()
+        stored_copy = await afind_stored_copy(content_hash, user.id)
+        file_name = stored_copy.file.name if stored_copy else await save_upload(upload)
+
+        inline = get_processing_setting('MODE') == 'inline'
+        resume = await models.Resume.objects.acreate(
+            user=user,
+            file=file_name,
+            content_hash=content_hash,
+            status=models.Resume.Status.EXTRACTING if inline else models.Resume.Status.QUEUED,
+            attempts=1 if inline else 0,
+        )
+
+        if stored_copy and stored_copy.status == models.Resume.Status.DONE and \
+                await sync_to_async(clone_resume_data)(stored_copy, resume):
+            await aset_status(resume, models.Resume.Status.DONE)
+            logger.info(f"Resume {resume.id} is a duplicate of resume {stored_copy.id}, reused parsed data")
+        elif inline:
+            await aprocess_resume(resume, file=upload.open())
+        else:
+            logger.info(f"Resume {resume.id} queued for processing")
+        return resume
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncResumeDetailView(View):
+    """GET /api/async/resumes/{id}/"""
+
+    async def get(self, request, pk):
+        user, error = await _authenticate(request)
+        if error:
+            return error
+        resume = await _get_resume(user, pk)
+        return JsonResponse(ResumeSerializer(resume, context={'request': request}).data)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncResumeStatusView(View):
+    """GET /api/async/resumes/{id}/status/"""
+
+    async def get(self, request, pk):
+        user, error = await _authenticate(request)
+        if error:
+            return error
+        resume = await _get_resume(user, pk)
+        return JsonResponse(ResumeStatusSerializer(resume).data)
+
+
+def _format_event(event_type: str, data: dict, event_id=None) -> str:
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event_type}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+@csrf_exempt
+async def resume_events(request, pk):
+    """
+    Stream processing progress of a resume as server-sent events.
+    GET /api/resumes/{id}/events/
+
+    Sends the current status first, then every status change and every
+    parsed item (experience, education, skill, ...) as it is written. The
+    stream ends once the resume is done or failed. Reconnecting clients
+    resume after the Last-Event-ID header.
+
+    An async view rather than a ViewSet action: DRF views are synchronous
+    and would hold a worker thread for the whole stream.
+    """
+    user, error = await _authenticate(request, allow_query_token=True)
+    if error:
+        return error
+
+    resumes = models.Resume.objects.filter(user=user).only('id', 'status', 'status_message')
+    try:
+        resume = await resumes.aget(pk=pk)
+    except models.Resume.DoesNotExist:
+        raise Http404
+
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.GET.get('last_event_id') or 0)
+    except ValueError:
+        last_id = 0
+
+    poll_interval = get_events_setting('POLL_INTERVAL_SECONDS')
+    keepalive = get_events_setting('KEEPALIVE_SECONDS')
+    deadline = time.monotonic() + get_events_setting('STREAM_TIMEOUT_SECONDS')
+
+    async def stream():
+        nonlocal last_id, resume
+        yield _format_event(models.ResumeEvent.Kind.STATUS, status_data(resume))
+        if resume.status in TERMINAL_STATUSES and not last_id:
+            # Already processed: the parsed data is available from the REST endpoints
+            return
+        last_sent = time.monotonic()
+        while time.monotonic() < deadline:
+            events = [
+                event async for event in models.ResumeEvent.objects
+                .filter(resume_id=resume.id, id__gt=last_id).order_by('id')[:100]
+            ]
+            for event in events:
+                last_id = event.id
+                yield _format_event(event.kind, event.data, event_id=event.id)
+                if is_terminal_event(event):
+                    return
+            if events:
+                last_sent = time.monotonic()
+                continue
+
+            if time.monotonic() - last_sent >= keepalive:
+                # Also catches status changes made without an event (e.g. stale rows reset in bulk)
+                resume = await resumes.aget(pk=resume.id)
+                if resume.status in TERMINAL_STATUSES:
+                    yield _format_event(models.ResumeEvent.Kind.STATUS, status_data(resume))
+                    return
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+            await asyncio.sleep(poll_interval)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
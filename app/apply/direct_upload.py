@@ -0,0 +1,185 @@
+"""
+Direct-to-storage resume uploads.
+
+Instead of streaming the file through the API (and then again to R2), the
+client asks for a presigned POST, uploads the file straight to the bucket
+and then calls the finalize endpoint. The presigned policy pins the object
+key under resumes/, the content type and the size range, so the bucket
+itself rejects oversized uploads. Finalize checks the stored object's
+metadata (HEAD), hashes the object and creates the Resume with its content
+hash, so a re-upload of the same file reuses the parsed data like any other
+duplicate. The worker reads the object from storage as for any other resume.
+
+The upload token returned with the presigned POST is a signed
+(user id, key) pair, so a client can only finalize keys issued to it.
+"""
+import logging
+import os
+import uuid
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from . import models
+from .utils import compute_file_hash
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'MAX_FILE_SIZE': 10 * 1024 * 1024,  # 10MB, same limit as regular uploads
+    'URL_EXPIRES': 900,  # seconds the presigned POST is valid
+    'TOKEN_MAX_AGE': 3600,  # seconds a client has to finalize an upload
+    'KEY_PREFIX': 'resumes/',
+}
+
+# Allowed extensions and the content types accepted for them
+ALLOWED_TYPES = {
+    '.pdf': ('application/pdf',),
+    '.doc': ('application/msword',),
+    '.docx': ('application/vnd.openxmlformats-officedocument.wordprocessingml.document',),
+}
+
+TOKEN_SALT = 'apply.direct_upload'
+
+
+class DirectUploadError(Exception):
+    """Raised when an upload cannot be issued or finalized."""
+
+
+def get_upload_setting(name: str):
+    """Read a value from settings.RESUME_UPLOADS, falling back to defaults."""
+    return getattr(settings, 'RESUME_UPLOADS', {}).get(name, DEFAULT_SETTINGS[name])
+
+
+def direct_uploads_available() -> bool:
+    """True if the default storage is S3-compatible (R2), which can presign uploads."""
+    return hasattr(default_storage, 'bucket') and hasattr(default_storage, '_normalize_name')
+
+
+def _s3_client():
+    return default_storage.connection.meta.client
+
+
+def _object_key(name: str) -> str:
+    """Bucket key of a storage name (adds the storage location prefix, if any)."""
+    return default_storage._normalize_name(name)
+
+
+def validate_file_name(file_name: str, content_type: str = '') -> str:
+    """
+    Check a file name (and optionally its content type) against ALLOWED_TYPES.
+
+    Returns:
+        The lowercased extension
+    """
+    extension = os.path.splitext(file_name.lower())[1]
+    if extension not in ALLOWED_TYPES:
+        raise DirectUploadError(f'Invalid file type. Allowed types: {", ".join(ALLOWED_TYPES)}')
+    if content_type and content_type not in ALLOWED_TYPES[extension]:
+        raise DirectUploadError(f'Content type {content_type} does not match {extension} files')
+    return extension
+
+
+def create_upload(user, file_name: str, content_type: str, size: Optional[int] = None) -> dict:
+    """
+    Issue a presigned POST for one resume file.
+
+    Args:
+        user: Uploading user
+        file_name: Original file name (only its extension is kept)
+        content_type: MIME type the client will upload with
+        size: Declared size in bytes, checked early (the policy enforces it anyway)
+
+    Returns:
+        {'url', 'fields', 'upload_token', 'expires_in'}: POST the file to url as
+        multipart form data with fields, then finalize with upload_token
+    """
+    extension = validate_file_name(file_name, content_type or '')
+    content_type = content_type or ALLOWED_TYPES[extension][0]
+    max_size = get_upload_setting('MAX_FILE_SIZE')
+    if size is not None and not 0 < size <= max_size:
+        raise DirectUploadError(f'File size too large. Maximum size is {max_size / (1024*1024)}MB')
+
+    name = f"{get_upload_setting('KEY_PREFIX')}{uuid.uuid4().hex}{extension}"
+    expires_in = get_upload_setting('URL_EXPIRES')
+    presigned = _s3_client().generate_presigned_post(
+        Bucket=default_storage.bucket_name,
+        Key=_object_key(name),
+        Fields={'Content-Type': content_type},
+        Conditions=[
+            {'Content-Type': content_type},
+            ['content-length-range', 1, max_size],
+        ],
+        ExpiresIn=expires_in,
+    )
+    token = signing.dumps({'user': user.id, 'name': name}, salt=TOKEN_SALT)
+    return {
+        'url': presigned['url'],
+        'fields': presigned['fields'],
+        'upload_token': token,
+        'expires_in': expires_in,
+    }
+
+
+def _read_token(user, token: str) -> str:
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT, max_age=get_upload_setting('TOKEN_MAX_AGE'))
+    except signing.SignatureExpired:
+        raise DirectUploadError('Upload token expired')
+    except signing.BadSignature:
+        raise DirectUploadError('Invalid upload token')
+    if payload.get('user') != user.id:
+        raise DirectUploadError('Invalid upload token')
+    return payload['name']
+
+
+def finalize_upload(user, token: str) -> Tuple[models.Resume, bool]:
+    """
+    Validate an uploaded object from its metadata and create its Resume.
+
+    Finalizing the same token again returns the resume created the first time,
+    also when both calls run concurrently.
+
+    Returns:
+        (resume, created)
+    """
+    name = _read_token(user, token)
+    existing = models.Resume.objects.filter(user=user, file=name).first()
+    if existing:
+        return existing, False
+
+    try:
+        head = _s3_client().head_object(Bucket=default_storage.bucket_name, Key=_object_key(name))
+    except Exception as e:
+        logger.warning(f"Finalize of {name} failed, object not found: {str(e)}")
+        raise DirectUploadError('File has not been uploaded')
+
+    size = head.get('ContentLength', 0)
+    content_type = (head.get('ContentType') or '').split(';')[0].strip()
+    try:
+        if not 0 < size <= get_upload_setting('MAX_FILE_SIZE'):
+            raise DirectUploadError('Uploaded file is empty or too large')
+        validate_file_name(name, content_type)
+    except DirectUploadError:
+        default_storage.delete(name)
+        raise
+
+    # The object is at most MAX_FILE_SIZE; hashing it lets the worker reuse the
+    # parsed data of an earlier upload of the same file
+    with default_storage.open(name) as stored:
+        content_hash = compute_file_hash(stored)
+
+    with transaction.atomic():
+        # Serializes finalizes of the user, so concurrent calls with the same
+        # token cannot both create a resume
+        get_user_model().objects.select_for_update().filter(pk=user.pk).first()
+        existing = models.Resume.objects.filter(user=user, file=name).first()
+        if existing:
+            return existing, False
+        resume = models.Resume.objects.create(user=user, file=name, content_hash=content_hash)
+    logger.info(f"Resume {resume.id} uploaded directly to storage ({size} bytes), queued for processing")
+    return resume, True
@@ -0,0 +1,308 @@
+"""
+Benchmark harness for the resume text extraction path in apply/utils.py.
+
+Generates a reproducible corpus of PDF and DOCX files, runs every extractor
+over it in a fresh process and reports throughput, latency percentiles,
+peak RSS and output size. Results can be saved as a baseline and compared
+against later runs so regressions show up before they reach production.
+"""
+import hashlib
+import json
+import logging
+import math
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+CORPUS_VERSION = 1
+
+# (name, pages, table density) per generated document shape
+DOCUMENT_SHAPES = [
+    ('onepage', 1, 0.0),
+    ('onepage-tables', 1, 0.5),
+    ('short', 3, 0.2),
+    ('medium', 8, 0.3),
+    ('long', 30, 0.1),
+    ('portfolio', 120, 0.6),
+]
+
+WORDS = (
+    'python django developer engineer senior lead manager data analysis cloud aws kubernetes '
+    'docker postgresql api design team agile scrum delivered improved reduced latency revenue '
+    'customers platform migration architecture testing automation pipeline frontend backend '
+    'react typescript machine learning models production reliability monitoring security'
+).split()
+
+SECTION_TITLES = ['Experience', 'Education', 'Skills', 'Projects', 'Certifications', 'Languages']
+
+# Benchmark name -> (corpus file type, extractor kind, see _get_extractor)
+EXTRACTORS = {
+    'pdf-pypdf2': ('pdf', 'pypdf2'),
+    'pdf-pdfplumber': ('pdf', 'pdfplumber'),
+    'pdf-selected': ('pdf', 'selected'),
+    'docx': ('docx', 'docx'),
+    'doc': ('doc', 'doc'),
+}
+
+
+def _sentence(rng: random.Random, low: int = 6, high: int = 14) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high))).capitalize()
+
+
+def _page_rows(rng: random.Random, page: int, table_density: float) -> List[List[str]]:
+    """Rows of one page; a row with several cells is rendered as a table row."""
+    rows = [[f'Jane Doe - Page {page + 1}']]
+    for _ in range(38):
+        if rng.random() < table_density:
+            rows.append([_sentence(rng, 1, 3) for _ in range(rng.randint(2, 4))])
+        elif rng.random() < 0.1:
+            rows.append([rng.choice(SECTION_TITLES)])
+        else:
+            rows.append([_sentence(rng)])
+    return rows
+
+
+def _escape_pdf_text(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def build_pdf(pages: List[List[List[str]]]) -> bytes:
+    """Write a minimal PDF (Helvetica text, tables as positioned columns)."""
+    objects = [
+        '<< /Type /Catalog /Pages 2 0 R >>',
+        None,  # page tree, filled in below
+        '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    page_refs = []
+    for rows in pages:
+        commands = ['BT', '/F1 10 Tf']
+        y = 760
+        for cells in rows:
+            column_width = 500 // len(cells)
+            for column, cell in enumerate(cells):
+                commands.append(f'1 0 0 1 {50 + column * column_width} {y} Tm ({_escape_pdf_text(cell[:90])}) Tj')
+            y -= 18
+        commands.append('ET')
+        content = '\n'.join(commands)
+        objects.append(f'<< /Length {len(content)} >>\nstream\n{content}\nendstream')
+        content_ref = len(objects)
+        objects.append(
+            '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+            f'/Resources << /Font << /F1 3 0 R >> >> /Contents {content_ref} 0 R >>'
+        )
+        page_refs.append(f'{len(objects)} 0 R')
+    objects[1] = f'<< /Type /Pages /Kids [{" ".join(page_refs)}] /Count {len(page_refs)} >>'
+
+    output = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f'{number} 0 obj\n{body}\nendobj\n'.encode('latin-1')
+    xref_offset = len(output)
+    output += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+    output += b''.join(f'{offset:010d} 00000 n \n'.encode() for offset in offsets)
+    output += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n'.encode()
+    return bytes(output)
+
+
+def build_docx(pages: List[List[List[str]]]) -> bytes:
+    """Write a DOCX with paragraphs and tables from the same rows as the PDF."""
+    from docx import Document
+
+    document = Document()
+    for rows in pages:
+        table_rows = []
+        for cells in rows + [[]]:
+            if len(cells) > 1:
+                table_rows.append(cells)
+                continue
+            if table_rows:
+                table = document.add_table(rows=len(table_rows), cols=max(len(row) for row in table_rows))
+                for row_index, row in enumerate(table_rows):
+                    for column, cell in enumerate(row):
+                        table.cell(row_index, column).text = cell
+                table_rows = []
+            if cells:
+                document.add_paragraph(cells[0])
+        document.add_page_break()
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def generate_corpus(directory: Path, seed: int = 42, copies: int = 3) -> List[Path]:
+    """
+    Generate the benchmark corpus into a directory.
+
+    The corpus is deterministic for a seed; an existing corpus with a matching
+    manifest is reused instead of being generated again.
+
+    Returns:
+        Paths of the generated documents
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    manifest_path = directory / 'manifest.json'
+    spec = {'version': CORPUS_VERSION, 'seed': seed, 'copies': copies, 'shapes': DOCUMENT_SHAPES}
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text())
+        if manifest.get('spec') == json.loads(json.dumps(spec)):
+            return [directory / name for name in manifest['files']]
+
+    rng = random.Random(seed)
+    files = []
+    for shape, page_count, table_density in DOCUMENT_SHAPES:
+        for copy in range(copies):
+            pages = [_page_rows(rng, page, table_density) for page in range(page_count)]
+            stem = f'{shape}-{copy}'
+            outputs = {
+                f'{stem}.pdf': build_pdf(pages),
+                f'{stem}.docx': build_docx(pages),
+            }
+            # Old .doc uploads go through the same python-docx path
+            outputs[f'{stem}.doc'] = outputs[f'{stem}.docx']
+            for name, content in outputs.items():
+                (directory / name).write_bytes(content)
+                files.append(name)
+
+    manifest_path.write_text(json.dumps({'spec': spec, 'files': files}, indent=2))
+    return [directory / name for name in files]
+
+
+def _get_extractor(name: str):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    from . import utils
+
+    kind = EXTRACTORS[name][1]
+
+    def single(extractors):
+        def run(file):
+            return "\n\n".join(page.text for page in utils.iter_pdf_pages(file, extractors=extractors))
+        return run
+
+    functions = {
+        'pypdf2': single([('pypdf2', utils._pypdf2_pages)]),
+        'pdfplumber': single([('pdfplumber', utils._pdfplumber_pages)]),
+        'selected': utils.extract_text_from_pdf,
+        'docx': utils.extract_text_from_docx,
+        'doc': utils.extract_text_from_doc,
+    }
+    function = functions[kind]
+    return lambda path: function(SimpleUploadedFile(path.name, path.read_bytes()))
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    if not values:
+        return 0.0
+    # Nearest-rank percentile
+    ordered = sorted(values)
+    index = max(0, math.ceil(percentile / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def _run_extractor(name: str, paths: List[str], repeat: int, queue) -> None:
+    """Child process entrypoint: benchmark one extractor and report through the queue."""
+    import django
+
+    django.setup()
+    logging.disable(logging.WARNING)
+    extract = _get_extractor(name)
+
+    latencies = []
+    output_chars = 0
+    input_bytes = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for path in map(Path, paths):
+            input_bytes += path.stat().st_size
+            document_started = time.perf_counter()
+            text = extract(path)
+            latencies.append(time.perf_counter() - document_started)
+            output_chars += len(text)
+    elapsed = time.perf_counter() - started
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (1024 * 1024) if sys.platform == 'darwin' else peak_rss / 1024
+
+    queue.put({
+        'documents': len(latencies),
+        'docs_per_second': round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        'mb_per_second': round(input_bytes / (1024 * 1024) / elapsed, 3) if elapsed else 0.0,
+        'p50_ms': round(_percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(_percentile(latencies, 95) * 1000, 2),
+        'peak_rss_mb': round(peak_rss_mb, 1),
+        'output_chars': output_chars // max(repeat, 1),
+    })
+
+
+def run_benchmark(corpus: List[Path], extractors: List[str], repeat: int = 1) -> Dict[str, dict]:
+    """
+    Run each extractor over its part of the corpus in a fresh process,
+    so peak RSS is measured per extractor.
+
+    Returns:
+        Mapping of extractor name to its metrics
+    """
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for name in extractors:
+        file_type = EXTRACTORS[name][0]
+        paths = [str(path) for path in corpus if path.suffix == f'.{file_type}']
+        queue = context.Queue()
+        process = context.Process(target=_run_extractor, args=(name, paths, repeat, queue))
+        process.start()
+        results[name] = queue.get()
+        process.join()
+    return results
+
+
+def compare_to_baseline(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """
+    Compare benchmark results with a stored baseline.
+
+    Args:
+        results: Output of run_benchmark
+        baseline: Previously saved results
+        tolerance: Allowed relative slowdown / growth (0.2 = 20%)
+
+    Returns:
+        Human readable regression messages (empty when there are none)
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'peak_rss_mb'):
+            if previous[metric] and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f'{name}: {metric} {previous[metric]} -> {current[metric]}')
+        if previous['docs_per_second'] and current['docs_per_second'] < previous['docs_per_second'] * (1 - tolerance):
+            regressions.append(
+                f"{name}: docs_per_second {previous['docs_per_second']} -> {current['docs_per_second']}"
+            )
+        # Output should stay stable; a drop means text is being lost
+        if previous['output_chars'] and current['output_chars'] < previous['output_chars'] * 0.99:
+            regressions.append(f"{name}: output_chars {previous['output_chars']} -> {current['output_chars']}")
+    return regressions
+
+
+def corpus_fingerprint(corpus: List[Path]) -> str:
+    """Hash of the corpus content, stored with baselines so only like runs are compared."""
+    digest = hashlib.sha256()
+    for path in sorted(corpus):
+        digest.update(path.name.encode())
+        digest.update(hashlib.sha256(path.read_bytes()).digest())
+    return digest.hexdigest()[:16]
+
+
+def default_corpus_dir() -> Path:
+    return Path(os.getenv('EXTRACTION_BENCHMARK_DIR', '/tmp/jobai-extraction-corpus'))
@@ -0,0 +1,204 @@
+"""
+Batched Gemini parsing for bulk workloads (backfills, imports).
+
+Several short resumes are packed into one prompt, delimited per document,
+and Gemini is asked for a JSON array keyed by document id. Documents whose
+result is missing or malformed are parsed again with single-document calls.
+"""
+import json
+import logging
+from typing import Any, Dict, Hashable, List, Optional
+
+from django.conf import settings
+
+from .gemini_cache import get_gemini_cache
+from .gemini_client import CircuitOpenError, get_gemini_client
+from .gemini_service import (
+    PROMPT_VERSION,
+    RESUME_JSON_STRUCTURE,
+    parse_resume_with_gemini,
+    strip_code_fences,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'MAX_DOCUMENTS': 6,
+    'MAX_CHARS': 20000,
+    'SINGLE_DOCUMENT_CHARS': 8000,
+}
+
+BATCH_PROMPT_TEMPLATE = """Extract the following information from each of the {count} resumes below and return ONLY valid JSON.
+Each resume starts with a line <<<RESUME id=ID>>> and ends with a line <<<END RESUME id=ID>>>.
+Never mix information between resumes. If a section is not found, use an empty array [] or null.
+
+{documents}
+
+Return a JSON array with exactly one element per resume, in this exact structure:
+[
+    {{
+        "id": "ID of the resume",
+        "data": {structure}
+    }}
+]
+
+Return ONLY the JSON array, no markdown, no code blocks, no explanations."""
+
+
+def get_batch_setting(name: str):
+    """Read a value from settings.GEMINI_BATCH, falling back to defaults."""
+    return getattr(settings, 'GEMINI_BATCH', {}).get(name, DEFAULT_SETTINGS[name])
+
+
+def plan_batches(documents: Dict[Hashable, str]) -> List[List[Hashable]]:
+    """
+    Group documents into batches sized by their text length.
+
+    Long documents get a batch of their own; shorter ones are packed
+    (largest first) until MAX_CHARS or MAX_DOCUMENTS is reached.
+
+    Args:
+        documents: Mapping of document id to resume text
+
+    Returns:
+        List of batches, each a list of document ids
+    """
+    max_documents = get_batch_setting('MAX_DOCUMENTS')
+    max_chars = get_batch_setting('MAX_CHARS')
+    single_document_chars = get_batch_setting('SINGLE_DOCUMENT_CHARS')
+
+    batches = []
+    open_batches = []  # [ids, total_chars]
+    for doc_id in sorted(documents, key=lambda key: len(documents[key]), reverse=True):
+        length = len(documents[doc_id])
+        if length >= single_document_chars or max_documents <= 1:
+            batches.append([doc_id])
+            continue
+        for batch in open_batches:
+            if len(batch[0]) < max_documents and batch[1] + length <= max_chars:
+                batch[0].append(doc_id)
+                batch[1] += length
+                break
+        else:
+            open_batches.append([[doc_id], length])
+
+    return batches + [ids for ids, _total in open_batches]
+
+
+def build_batch_prompt(documents: Dict[Hashable, str]) -> str:
+    """Build a multi-resume prompt with per-document delimiters."""
+    parts = []
+    for doc_id, text in documents.items():
+        parts.append(f"<<<RESUME id={doc_id}>>>\n{text}\n<<<END RESUME id={doc_id}>>>")
+    return BATCH_PROMPT_TEMPLATE.format(
+        count=len(documents),
+        documents="\n\n".join(parts),
+        structure=RESUME_JSON_STRUCTURE.replace('\n', '\n        '),
+    )
+
+
+def split_batch_response(response_text: str, doc_ids: List[Hashable]) -> Dict[Hashable, Dict[str, Any]]:
+    """
+    Split a batch response into per-document parsed data.
+
+    Entries with unknown ids or without a data object are dropped, so the
+    caller can fall back to single-document calls for them.
+
+    Returns:
+        Mapping of document id to parsed data for the valid entries
+    """
+    ids_by_key = {str(doc_id): doc_id for doc_id in doc_ids}
+    try:
+        entries = json.loads(strip_code_fences(response_text))
+    except json.JSONDecodeError as e:
+        logger.error(f"Failed to parse JSON from Gemini batch response: {str(e)}")
+        return {}
+
+    if not isinstance(entries, list):
+        logger.error("Gemini batch response is not a JSON array")
+        return {}
+
+    results = {}
+    for entry in entries:
+        if not isinstance(entry, dict) or not isinstance(entry.get('data'), dict):
+            continue
+        doc_id = ids_by_key.get(str(entry.get('id')).strip())
+        if doc_id is None or doc_id in results:
+            continue
+        results[doc_id] = entry['data']
+    return results
+
+
+def parse_resume_batch_with_gemini(documents: Dict[Hashable, str]) -> Dict[Hashable, Dict[str, Any]]:
+    """
+    Send one multi-resume prompt to Gemini.
+
+    Returns:
+        Mapping of document id to parsed data; ids missing from the
+        mapping were not returned (or malformed) and must be retried
+    """
+    client = get_gemini_client()
+    if client is None:
+        return {}
+    try:
+        response = client.generate_content(build_batch_prompt(documents))
+    except CircuitOpenError as e:
+        logger.warning(str(e))
+        return {}
+    except Exception as e:
+        logger.error(f"Error calling Gemini API for batch of {len(documents)} resumes: {str(e)}")
+        return {}
+    return split_batch_response(response.text, list(documents))
+
+
+def parse_resumes_with_gemini(documents: Dict[Hashable, str], use_cache: bool = True) -> Dict[Hashable, Optional[Dict[str, Any]]]:
+    """
+    Parse many resumes with as few Gemini requests as possible.
+
+    Cached documents are answered from the response cache, the rest are
+    grouped with plan_batches(). Results missing from a batch response are
+    retried with parse_resume_with_gemini().
+
+    Args:
+        documents: Mapping of document id (e.g. resume id) to resume text
+        use_cache: Look up and store responses in the Gemini response cache
+
+    Returns:
+        Mapping of every document id to parsed data, or None if parsing failed
+    """
+    results: Dict[Hashable, Optional[Dict[str, Any]]] = {}
+    pending = {}
+    cache = get_gemini_cache()
+    client = get_gemini_client()
+    model_name = client.model_name if client else None
+
+    for doc_id, text in documents.items():
+        if not text or not text.strip():
+            results[doc_id] = None
+            continue
+        cached = cache.get(text, model_name, PROMPT_VERSION) if use_cache and model_name else None
+        if cached is not None:
+            results[doc_id] = cached
+        else:
+            pending[doc_id] = text
+
+    for batch_ids in plan_batches(pending):
+        if len(batch_ids) == 1:
+            doc_id = batch_ids[0]
+            results[doc_id] = parse_resume_with_gemini(pending[doc_id], use_cache=use_cache)
+            continue
+
+        batch = {doc_id: pending[doc_id] for doc_id in batch_ids}
+        parsed = parse_resume_batch_with_gemini(batch)
+        logger.info(f"Gemini batch returned {len(parsed)}/{len(batch)} resumes")
+
+        for doc_id in batch_ids:
+            if doc_id in parsed:
+                results[doc_id] = parsed[doc_id]
+                if use_cache:
+                    cache.set(batch[doc_id], client.model_name, PROMPT_VERSION, parsed[doc_id])
+            else:
+                # Malformed or missing entry: fall back to a single-document call
+                results[doc_id] = parse_resume_with_gemini(batch[doc_id], use_cache=use_cache)
+
+    return results
@@ -0,0 +1,256 @@
+"""
+Persistent cache for parsed Gemini responses.
+
+Entries are keyed by a hash of the normalized resume text, the model name and
+the prompt version, and stored in the GeminiResponseCache table. An optional
+in-process LRU tier answers repeated lookups without a database query.
+"""
+import copy
+import hashlib
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'ENABLED': True,
+    'TTL_SECONDS': 60 * 60 * 24 * 30,
+    'MAX_ENTRIES': 100000,
+    'LOCAL_MAX_ENTRIES': 256,
+    'LOCAL_TTL_SECONDS': 60 * 10,
+}
+
+# Size-based eviction runs a COUNT(*), so only check every N writes
+EVICTION_CHECK_INTERVAL = 100
+
+_whitespace_re = re.compile(r'\s+')
+
+
+def get_cache_setting(name: str):
+    """Read a value from settings.GEMINI_CACHE, falling back to defaults."""
+    return getattr(settings, 'GEMINI_CACHE', {}).get(name, DEFAULT_SETTINGS[name])
+
+
+def normalize_cache_text(text: str) -> str:
+    """
+    Normalize resume text so that differently encoded copies of the same
+    content produce the same cache key. Only Unicode forms and whitespace
+    are folded: case can change what Gemini extracts (names, acronyms).
+    """
+    text = unicodedata.normalize('NFKC', text or '')
+    return _whitespace_re.sub(' ', text).strip()
+
+
+def make_cache_key(text: str, model_name: str, prompt_version: str) -> str:
+    """Build the cache key for a resume text, model and prompt version."""
+    digest = hashlib.sha256()
+    for part in (model_name, prompt_version, normalize_cache_text(text)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class LocalLRUCache:
+    """Thread-safe in-process LRU cache with a per-entry TTL."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class GeminiCache:
+    """
+    Two-tier cache for parsed Gemini responses.
+
+    Cache failures are logged and treated as misses so they never break parsing.
+    """
+
+    def __init__(self):
+        local_max_entries = get_cache_setting('LOCAL_MAX_ENTRIES')
+        self.local = (
+            LocalLRUCache(local_max_entries, get_cache_setting('LOCAL_TTL_SECONDS'))
+            if local_max_entries > 0 else None
+        )
+        self._counters = {
+            'local_hits': 0,
+            'db_hits': 0,
+            'misses': 0,
+            'writes': 0,
+            'evictions': 0,
+            'errors': 0,
+        }
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return get_cache_setting('ENABLED')
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+        metrics.inc('gemini_cache_events_total', amount, event=name)
+
+    def get(self, text: str, model_name: str, prompt_version: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a parsed response.
+
+        Returns:
+            A copy of the cached parsed data, or None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        from .models import GeminiResponseCache
+
+        key = make_cache_key(text, model_name, prompt_version)
+        if self.local is not None:
+            value = self.local.get(key)
+            if value is not None:
+                self._count('local_hits')
+                return copy.deepcopy(value)
+
+        try:
+            now = timezone.now()
+            entry = GeminiResponseCache.objects.filter(key=key).first()
+            if entry is None or (entry.expires_at and entry.expires_at <= now):
+                self._count('misses')
+                return None
+
+            GeminiResponseCache.objects.filter(pk=entry.pk).update(hits=F('hits') + 1, last_used_at=now)
+        except Exception as e:
+            logger.error(f"Gemini cache lookup failed: {str(e)}")
+            self._count('errors')
+            return None
+
+        self._count('db_hits')
+        if self.local is not None:
+            self.local.set(key, entry.response)
+        return copy.deepcopy(entry.response)
+
+    def set(self, text: str, model_name: str, prompt_version: str, parsed_data: Dict[str, Any]) -> None:
+        """Store a parsed response in both tiers."""
+        if not self.enabled:
+            return
+
+        from .models import GeminiResponseCache
+
+        key = make_cache_key(text, model_name, prompt_version)
+        ttl_seconds = get_cache_setting('TTL_SECONDS')
+        now = timezone.now()
+        try:
+            GeminiResponseCache.objects.update_or_create(
+                key=key,
+                defaults={
+                    'model_name': model_name,
+                    'prompt_version': prompt_version,
+                    'response': parsed_data,
+                    'last_used_at': now,
+                    'expires_at': now + timedelta(seconds=ttl_seconds) if ttl_seconds else None,
+                },
+            )
+        except Exception as e:
+            logger.error(f"Gemini cache write failed: {str(e)}")
+            self._count('errors')
+            return
+
+        self._count('writes')
+        if self.local is not None:
+            self.local.set(key, copy.deepcopy(parsed_data))
+        if self._counters['writes'] % EVICTION_CHECK_INTERVAL == 0:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Delete expired entries and trim the table to MAX_ENTRIES,
+        removing the least recently used entries first.
+
+        Returns:
+            Number of deleted entries
+        """
+        from .models import GeminiResponseCache
+
+        deleted, _ = GeminiResponseCache.objects.filter(expires_at__lte=timezone.now()).delete()
+
+        max_entries = get_cache_setting('MAX_ENTRIES')
+        overflow = GeminiResponseCache.objects.count() - max_entries
+        if max_entries and overflow > 0:
+            oldest = GeminiResponseCache.objects.order_by('last_used_at').values_list('pk', flat=True)[:overflow]
+            trimmed, _ = GeminiResponseCache.objects.filter(pk__in=list(oldest)).delete()
+            deleted += trimmed
+
+        if deleted:
+            logger.info(f"Evicted {deleted} Gemini cache entries")
+            self._count('evictions', deleted)
+        return deleted
+
+    def invalidate(self, prompt_version: Optional[str] = None) -> int:
+        """
+        Delete cached entries, optionally only those of one prompt version.
+        Also clears this process' local tier.
+
+        Returns:
+            Number of deleted entries
+        """
+        from .models import GeminiResponseCache
+
+        entries = GeminiResponseCache.objects.all()
+        if prompt_version is not None:
+            entries = entries.filter(prompt_version=prompt_version)
+        deleted, _ = entries.delete()
+        if self.local is not None:
+            self.local.clear()
+        return deleted
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_gemini_cache() -> GeminiCache:
+    """Return the per-process Gemini response cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = GeminiCache()
+    return _cache
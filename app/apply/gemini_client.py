@@ -0,0 +1,459 @@
+"""
+Long-lived Gemini client shared by everything that talks to the Gemini API.
+
+The client configures the SDK once per process, resolves the first working
+model of the fallback chain and keeps using it, retries transient errors
+with jittered exponential backoff and stops calling the API through a
+circuit breaker while it keeps failing.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+import logging
+from typing import Optional, Sequence
+
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'MODELS': ['gemini-1.5-flash', 'gemini-1.5-pro', 'gemini-pro'],
+    'MAX_RETRIES': 3,
+    'BACKOFF_BASE_SECONDS': 1.0,
+    'BACKOFF_MAX_SECONDS': 20.0,
+    'CIRCUIT_FAILURE_THRESHOLD': 5,
+    'CIRCUIT_RESET_SECONDS': 60,
+}
+
+
+def get_client_setting(name: str):
+    """Read a value from settings.GEMINI_CLIENT, falling back to defaults."""
+    return getattr(settings, 'GEMINI_CLIENT', {}).get(name, DEFAULT_SETTINGS[name])
+
+
+class GeminiUnavailableError(Exception):
+    """Raised when Gemini cannot be called (circuit open, no working model)."""
+
+
+class CircuitOpenError(GeminiUnavailableError):
+    """Raised instead of calling Gemini while the circuit breaker is open."""
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Return True for rate limiting, server side and transport errors."""
+    from google.api_core import exceptions as google_exceptions
+
+    retryable = (
+        google_exceptions.TooManyRequests,
+        google_exceptions.ResourceExhausted,
+        google_exceptions.InternalServerError,
+        google_exceptions.BadGateway,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.GatewayTimeout,
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.Aborted,
+        ConnectionError,
+        TimeoutError,
+    )
+    return isinstance(error, retryable)
+
+
+def is_model_not_found_error(error: Exception) -> bool:
+    """Return True when the requested model does not exist for this API key."""
+    from google.api_core import exceptions as google_exceptions
+
+    return isinstance(error, google_exceptions.NotFound)
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After ``failure_threshold`` failed calls in a row the circuit opens and
+    calls are rejected for ``reset_timeout`` seconds. The first call after that
+    is let through as a probe (half-open): success closes the circuit,
+    failure opens it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow_request(self) -> bool:
+        """Return True if a call may be made now."""
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.error(f"Gemini circuit breaker opened after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+
+
+class RateLimiter:
+    """
+    Token bucket shared by the threads of one process.
+
+    ``acquire()`` blocks until a request may be made, so at most ``rate``
+    requests start per ``per`` seconds, with bursts of up to ``burst``.
+    """
+
+    def __init__(self, rate: float, per: float = 60.0, burst: int = 1):
+        self.interval = per / rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) / self.interval)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) * self.interval
+            time.sleep(wait)
+
+
+def response_text(response) -> str:
+    """Text of a response or stream chunk, or '' if it has no text part (blocked, finish-only chunks)."""
+    try:
+        return response.text
+    except ValueError:
+        return ''
+
+
+class StreamedResponse:
+    """
+    Streamed Gemini response that reports the outcome of the call once it
+    has been read.
+
+    Errors of a stream surface while its chunks are iterated, so the circuit
+    breaker and the request counter are only updated when iteration ends:
+    a success when the stream ends (or the reader stops early) without an
+    error, a failure when reading a chunk raises. Other attributes are those
+    of the wrapped SDK response.
+    """
+
+    def __init__(self, client: 'GeminiClient', response, model_name: str):
+        self._client = client
+        self._response = response
+        self._model_name = model_name
+        self._text = []
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def _collect(self, chunk):
+        self._text.append(response_text(chunk))
+        return chunk
+
+    def _finish(self, error: Optional[Exception]) -> None:
+        self._client._record_outcome(self._model_name, error, ''.join(self._text))
+
+    def __iter__(self):
+        error = None
+        try:
+            for chunk in self._response:
+                yield self._collect(chunk)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._finish(error)
+
+    async def __aiter__(self):
+        error = None
+        try:
+            async for chunk in self._response:
+                yield self._collect(chunk)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._finish(error)
+
+
+class GeminiClient:
+    """
+    Reusable Gemini client.
+
+    Use get_gemini_client() instead of instantiating this class directly so the
+    configured SDK, resolved model and circuit breaker are shared per process.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model_names: Sequence[str],
+        max_retries: int,
+        backoff_base: float,
+        backoff_max: float,
+        breaker: CircuitBreaker,
+    ):
+        import google.generativeai as genai
+
+        self.api_key = api_key
+        self.model_names = list(model_names)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker
+        self._genai = genai
+        self._model_index = 0
+        self._model = None
+        self._lock = threading.Lock()
+
+        genai.configure(api_key=api_key)
+
+    @property
+    def model_name(self) -> str:
+        """Name of the model currently in use."""
+        return self.model_names[self._model_index]
+
+    @property
+    def available(self) -> bool:
+        """False while the circuit breaker rejects calls."""
+        return self.breaker.state != CircuitBreaker.OPEN
+
+    def get_model(self):
+        """Return the cached GenerativeModel, building it on first use."""
+        return self._resolve_model()[0]
+
+    def _resolve_model(self):
+        with self._lock:
+            if self._model is None:
+                self._model = self._genai.GenerativeModel(self.model_name)
+                logger.info(f"Using Gemini model: {self.model_name}")
+            return self._model, self.model_name
+
+    def _fall_back_to_next_model(self, failed_model_name: str, error: Exception) -> None:
+        with self._lock:
+            if self.model_name != failed_model_name:
+                # Another thread already moved on to the next model
+                return
+            if self._model_index + 1 >= len(self.model_names):
+                raise GeminiUnavailableError(f"No working Gemini model: {str(error)}") from error
+            logger.warning(
+                f"Failed to use {self.model_name}, trying {self.model_names[self._model_index + 1]}: {str(error)}"
+            )
+            self._model_index += 1
+            self._model = None
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry attempt (0-based)."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _handle_error(self, model_name: str, error: Exception, attempt: int) -> Optional[float]:
+        """
+        Decide how to continue after a failed call.
+
+        Returns:
+            Seconds to wait before retrying, or None to try the next model right away
+
+        Raises:
+            The error itself (or GeminiUnavailableError) when it must not be retried
+        """
+        if is_model_not_found_error(error):
+            try:
+                self._fall_back_to_next_model(model_name, error)
+            except GeminiUnavailableError:
+                self.breaker.record_failure()
+                raise
+            return None
+        if not is_retryable_error(error) or attempt >= self.max_retries:
+            # Client errors (bad request, invalid key) are not an upstream outage
+            if is_retryable_error(error):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise error
+        delay = self.backoff_delay(attempt)
+        logger.warning(
+            f"Gemini call failed ({type(error).__name__}: {str(error)}), "
+            f"retry {attempt + 1}/{self.max_retries} in {delay:.1f}s"
+        )
+        return delay
+
+    def _record_call(self, model_name: str, prompt, response, started: float, stream: bool):
+        """
+        Record latency and prompt size of a call that returned. Plain calls
+        are complete at this point; streams are wrapped in a StreamedResponse
+        that records their outcome once they have been read.
+
+        Returns:
+            The response to hand to the caller
+        """
+        metrics.observe('gemini_request_seconds', time.perf_counter() - started, model=model_name, stream=str(bool(stream)).lower())
+        if isinstance(prompt, str):
+            metrics.observe_gemini_text(model_name, 'prompt', prompt)
+        if stream:
+            return StreamedResponse(self, response, model_name)
+        self._record_outcome(model_name, None, response_text(response))
+        return response
+
+    def _record_outcome(self, model_name: str, error: Optional[Exception], text: str) -> None:
+        """Report a finished call (error is None on success) to the circuit breaker and metrics."""
+        if error is None:
+            self.breaker.record_success()
+            metrics.inc('gemini_requests_total', model=model_name, outcome='ok')
+            if text:
+                metrics.observe_gemini_text(model_name, 'response', text)
+            return
+        metrics.inc('gemini_requests_total', model=model_name, outcome='error')
+        # Same rule as _handle_error: client errors are not an upstream outage
+        if is_retryable_error(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def generate_content(self, prompt: str, **kwargs):
+        """
+        Call generate_content on the resolved model with retries.
+        With stream=True the response is a StreamedResponse; only errors
+        before the first chunk are retried.
+
+        Raises:
+            CircuitOpenError: if the circuit breaker is open
+            GeminiUnavailableError: if no model of the fallback chain exists
+            Exception: the last error once retries are exhausted, or any
+                non-retryable API error
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("Gemini circuit breaker is open, skipping call")
+
+        attempt = 0
+        while True:
+            model, model_name = self._resolve_model()
+            started = time.perf_counter()
+            try:
+                response = model.generate_content(prompt, **kwargs)
+            except Exception as e:
+                metrics.inc('gemini_requests_total', model=model_name, outcome='error')
+                delay = self._handle_error(model_name, e, attempt)
+                if delay is not None:
+                    attempt += 1
+                    time.sleep(delay)
+                continue
+
+            return self._record_call(model_name, prompt, response, started, kwargs.get('stream', False))
+
+    async def generate_content_async(self, prompt: str, **kwargs):
+        """
+        Async variant of generate_content: awaits the SDK's asyncio (grpc.aio)
+        call and backs off with asyncio.sleep, so no thread is blocked.
+
+        Raises:
+            The same errors as generate_content
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("Gemini circuit breaker is open, skipping call")
+
+        attempt = 0
+        while True:
+            model, model_name = self._resolve_model()
+            started = time.perf_counter()
+            try:
+                response = await model.generate_content_async(prompt, **kwargs)
+            except Exception as e:
+                metrics.inc('gemini_requests_total', model=model_name, outcome='error')
+                delay = self._handle_error(model_name, e, attempt)
+                if delay is not None:
+                    attempt += 1
+                    await asyncio.sleep(delay)
+                continue
+
+            return self._record_call(model_name, prompt, response, started, kwargs.get('stream', False))
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_api_key() -> Optional[str]:
+    """Get API key from environment (check both GEMINI_KEY and GEMINI_API_KEY)."""
+    return os.getenv('GEMINI_KEY') or os.getenv('GEMINI_API_KEY')
+
+
+def get_gemini_client() -> Optional[GeminiClient]:
+    """
+    Return the per-process Gemini client, creating it on first use.
+    A new client is built after a fork, since gRPC channels cannot be shared
+    across processes.
+
+    Returns:
+        GeminiClient, or None if no API key is configured
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+
+    with _client_lock:
+        if _client is None or _client_pid != pid:
+            api_key = get_api_key()
+            if not api_key:
+                logger.error("GEMINI_KEY or GEMINI_API_KEY not found in environment variables")
+                return None
+
+            # Validate API key format (should start with AIza)
+            if not api_key.startswith('AIza'):
+                logger.warning(f"API key format looks unusual (doesn't start with 'AIza'): {api_key[:10]}...")
+
+            _client = GeminiClient(
+                api_key=api_key,
+                model_names=get_client_setting('MODELS'),
+                max_retries=get_client_setting('MAX_RETRIES'),
+                backoff_base=get_client_setting('BACKOFF_BASE_SECONDS'),
+                backoff_max=get_client_setting('BACKOFF_MAX_SECONDS'),
+                breaker=CircuitBreaker(
+                    failure_threshold=get_client_setting('CIRCUIT_FAILURE_THRESHOLD'),
+                    reset_timeout=get_client_setting('CIRCUIT_RESET_SECONDS'),
+                ),
+            )
+            _client_pid = pid
+    return _client
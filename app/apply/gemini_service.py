@@ -1,14 +1,96 @@
 """
 Service for interacting with Google Gemini API to parse resume text.
 """
-import os
 import json
 import logging
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+
+from asgiref.sync import sync_to_async
+
+from .gemini_cache import get_gemini_cache
+from .gemini_client import CircuitOpenError, get_gemini_client
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever the prompts or RESUME_JSON_STRUCTURE change so cached responses are not reused
+PROMPT_VERSION = "2"
+
+# JSON structure Gemini is asked to return, per resume section
+RESUME_SECTION_STRUCTURES = {
+    'experiences': """[
+        {
+            "title": "Job Title",
+            "company": "Company Name",
+            "start_date": "YYYY-MM-DD or null",
+            "end_date": "YYYY-MM-DD or null",
+            "description": "Job description",
+            "achievements": "Key achievements"
+        }
+    ]""",
+    'educations': """[
+        {
+            "institution": "School/University Name",
+            "degree": "Degree Name",
+            "start_date": "YYYY-MM-DD or null",
+            "end_date": "YYYY-MM-DD or null",
+            "description": "Additional details"
+        }
+    ]""",
+    'skills': """[
+        "Skill 1",
+        "Skill 2"
+    ]""",
+    'languages': """[
+        {
+            "language": "Language Name",
+            "level": "Proficiency Level (e.g., Native, Fluent, B2, etc.)"
+        }
+    ]""",
+    'certifications': """[
+        {
+            "name": "Certification Name",
+            "issuer": "Issuing Organization",
+            "date_obtained": "YYYY-MM-DD or null"
+        }
+    ]""",
+    'projects': """[
+        {
+            "name": "Project Name",
+            "description": "Project description",
+            "start_date": "YYYY-MM-DD or null",
+            "end_date": "YYYY-MM-DD or null",
+            "url": "Project URL or empty string",
+            "technologies": "Technologies used",
+            "role": "Role in project",
+            "achievements": "Project achievements"
+        }
+    ]""",
+}
+
+
+def build_json_structure(sections: Optional[List[str]] = None) -> str:
+    """JSON structure for the given sections (all sections by default)."""
+    sections = sections or list(RESUME_SECTION_STRUCTURES)
+    return "{\n" + ",\n".join(
+        f'    "{section}": {RESUME_SECTION_STRUCTURES[section]}' for section in sections
+    ) + "\n}"
+
+
+# JSON structure Gemini is asked to return for one resume
+RESUME_JSON_STRUCTURE = build_json_structure()
+
+RESUME_PROMPT_TEMPLATE = """Extract the following information from this resume text and return ONLY valid JSON. 
+If a section is not found, use an empty array [] or null.
+
+Resume text:
+{text}
+
+Return a JSON object with this exact structure:
+{structure}
+
+Return ONLY the JSON object, no markdown, no code blocks, no explanations."""
+
 
 def test_gemini_api_key() -> bool:
     """
@@ -18,18 +100,12 @@ def test_gemini_api_key() -> bool:
         True if API key is valid, False otherwise
     """
     try:
-        import google.generativeai as genai
-        
-        api_key = os.getenv('GEMINI_KEY') or os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            logger.error("GEMINI_KEY or GEMINI_API_KEY not found")
+        client = get_gemini_client()
+        if client is None:
             return False
         
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
         # Make a simple test call
-        response = model.generate_content("Say 'API key is valid' if you can read this.")
+        response = client.generate_content("Say 'API key is valid' if you can read this.")
         logger.info(f"API key test successful: {response.text}")
         return True
         
@@ -38,12 +114,82 @@ def test_gemini_api_key() -> bool:
         return False
 
 
-def parse_resume_with_gemini(text: str) -> Optional[Dict[str, Any]]:
+def strip_code_fences(response_text: str) -> str:
+    """Remove markdown code blocks Gemini sometimes wraps around JSON."""
+    response_text = response_text.strip()
+    if response_text.startswith('```json'):
+        response_text = response_text[7:]
+    if response_text.startswith('```'):
+        response_text = response_text[3:]
+    if response_text.endswith('```'):
+        response_text = response_text[:-3]
+    return response_text.strip()
+
+
+def build_resume_prompt(text: str, sections: Optional[List[str]] = None) -> str:
+    """
+    Build the structured extraction prompt for a resume.
+
+    Args:
+        text: Extracted text from resume
+        sections: Only ask for these sections (all sections by default)
+
+    Returns:
+        Prompt string for Gemini
+    """
+    structure = build_json_structure(sections) if sections else RESUME_JSON_STRUCTURE
+    return RESUME_PROMPT_TEMPLATE.format(text=text, structure=structure)
+
+
+def log_gemini_error(client, error: Exception) -> None:
+    """Log a failed Gemini call, with setup instructions for API key errors."""
+    error_msg = str(error)
+    logger.error(f"Error calling Gemini API: {error_msg}")
+    
+    # Check if it's an API key error
+    if 'API key' in error_msg or 'API_KEY' in error_msg or 'API_KEY_INVALID' in error_msg:
+        logger.error("=" * 60)
+        logger.error("GEMINI API KEY ERROR - ACTION REQUIRED")
+        logger.error("=" * 60)
+        logger.error("Your API key is being read but Google says it's invalid.")
+        logger.error("")
+        logger.error("SOLUTIONS:")
+        logger.error("1. Enable Generative Language API:")
+        logger.error("   - Go to: https://console.cloud.google.com/apis/library")
+        logger.error("   - Search: 'Generative Language API'")
+        logger.error("   - Click 'Enable'")
+        logger.error("")
+        logger.error("2. Check API key restrictions:")
+        logger.error("   - Go to: https://console.cloud.google.com/apis/credentials")
+        logger.error("   - Edit your API key")
+        logger.error("   - Make sure 'Generative Language API' is allowed")
+        logger.error("")
+        logger.error("3. Regenerate API key:")
+        logger.error("   - Go to: https://makersuite.google.com/app/apikey")
+        logger.error("   - Create new key and update .env file")
+        logger.error("")
+        logger.error(f"Current API key (first 20 chars): {client.api_key[:20]}...")
+        logger.error("=" * 60)
+
+
+def resume_cache_text(text: str, sections: Optional[List[str]] = None) -> str:
+    """Text the response cache is keyed by; targeted prompts return fewer sections, so they are cached separately."""
+    return f"[{','.join(sections)}]\n{text}" if sections else text
+
+
+def parse_resume_with_gemini(
+    text: str,
+    use_cache: bool = True,
+    sections: Optional[List[str]] = None,
+) -> Optional[Dict[str, Any]]:
     """
     Send resume text to Gemini API and get structured JSON response.
+    Responses are cached by normalized text, model and prompt version.
     
     Args:
         text: Extracted text from resume
+        use_cache: Look up and store the response in the Gemini response cache
+        sections: Only ask for these sections (all sections by default)
         
     Returns:
         Dict with parsed resume data, or None if parsing fails
@@ -52,155 +198,106 @@ def parse_resume_with_gemini(text: str) -> Optional[Dict[str, Any]]:
         logger.warning("Empty text provided to Gemini")
         return None
     
-    try:
-        import google.generativeai as genai
-        
-        # Get API key from environment (check both GEMINI_KEY and GEMINI_API_KEY)
-        api_key = os.getenv('GEMINI_KEY') or os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            logger.error("GEMINI_KEY or GEMINI_API_KEY not found in environment variables")
-            return None
-        
-        # Validate API key format (should start with AIza)
-        if not api_key.startswith('AIza'):
-            logger.warning(f"API key format looks unusual (doesn't start with 'AIza'): {api_key[:10]}...")
-        
-        # Configure Gemini
-        genai.configure(api_key=api_key)
-        
-        # Try different model names (gemini-1.5-pro, gemini-1.5-flash, gemini-pro)
-        # Start with gemini-1.5-flash as it's faster and cheaper
-        model_name = 'gemini-1.5-flash'
-        try:
-            model = genai.GenerativeModel(model_name)
-        except Exception as e:
-            logger.warning(f"Failed to use {model_name}, trying gemini-1.5-pro: {str(e)}")
-            model_name = 'gemini-1.5-pro'
-            try:
-                model = genai.GenerativeModel(model_name)
-            except Exception as e2:
-                logger.warning(f"Failed to use {model_name}, trying gemini-pro: {str(e2)}")
-                model_name = 'gemini-pro'
-                model = genai.GenerativeModel(model_name)
-        
-        logger.info(f"Using Gemini model: {model_name}")
-        
-        # Create the prompt for structured JSON extraction
-        prompt = f"""Extract the following information from this resume text and return ONLY valid JSON. 
-If a section is not found, use an empty array [] or null.
+    # Shared per-process client: SDK configured and model resolved only once
+    client = get_gemini_client()
+    if client is None:
+        return None
 
-Resume text:
-{text}
+    cache_text = resume_cache_text(text, sections)
 
-Return a JSON object with this exact structure:
-{{
-    "experiences": [
-        {{
-            "title": "Job Title",
-            "company": "Company Name",
-            "start_date": "YYYY-MM-DD or null",
-            "end_date": "YYYY-MM-DD or null",
-            "description": "Job description",
-            "achievements": "Key achievements"
-        }}
-    ],
-    "educations": [
-        {{
-            "institution": "School/University Name",
-            "degree": "Degree Name",
-            "start_date": "YYYY-MM-DD or null",
-            "end_date": "YYYY-MM-DD or null",
-            "description": "Additional details"
-        }}
-    ],
-    "skills": [
-        "Skill 1",
-        "Skill 2"
-    ],
-    "languages": [
-        {{
-            "language": "Language Name",
-            "level": "Proficiency Level (e.g., Native, Fluent, B2, etc.)"
-        }}
-    ],
-    "certifications": [
-        {{
-            "name": "Certification Name",
-            "issuer": "Issuing Organization",
-            "date_obtained": "YYYY-MM-DD or null"
-        }}
-    ],
-    "projects": [
-        {{
-            "name": "Project Name",
-            "description": "Project description",
-            "start_date": "YYYY-MM-DD or null",
-            "end_date": "YYYY-MM-DD or null",
-            "url": "Project URL or empty string",
-            "technologies": "Technologies used",
-            "role": "Role in project",
-            "achievements": "Project achievements"
-        }}
-    ]
-}}
+    try:
+        model_name = client.model_name
 
-Return ONLY the JSON object, no markdown, no code blocks, no explanations."""
+        # Serve identical requests from the response cache
+        if use_cache:
+            cached_data = get_gemini_cache().get(cache_text, model_name, PROMPT_VERSION)
+            if cached_data is not None:
+                logger.info("Returning cached Gemini response")
+                return cached_data
 
-        # Generate response
-        response = model.generate_content(prompt)
+        # Create the prompt for structured JSON extraction
+        prompt = build_resume_prompt(text, sections)
+
+        # Generate response (retries transient errors, fails fast while the circuit is open)
+        response = client.generate_content(prompt)
         
         # Extract JSON from response
-        response_text = response.text.strip()
-        
-        # Remove markdown code blocks if present
-        if response_text.startswith('```json'):
-            response_text = response_text[7:]
-        if response_text.startswith('```'):
-            response_text = response_text[3:]
-        if response_text.endswith('```'):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
+        response_text = strip_code_fences(response.text)
         
         # Parse JSON
         parsed_data = json.loads(response_text)
         
         logger.info("Successfully parsed resume with Gemini")
+        if use_cache:
+            get_gemini_cache().set(cache_text, client.model_name, PROMPT_VERSION, parsed_data)
         return parsed_data
         
+    except CircuitOpenError as e:
+        logger.warning(str(e))
+        return None
     except json.JSONDecodeError as e:
         logger.error(f"Failed to parse JSON from Gemini response: {str(e)}")
         if 'response_text' in locals():
             logger.error(f"Response text: {response_text[:500]}")  # Log first 500 chars
         return None
     except Exception as e:
-        error_msg = str(e)
-        logger.error(f"Error calling Gemini API: {error_msg}")
-        
-        # Check if it's an API key error
-        if 'API key' in error_msg or 'API_KEY' in error_msg or 'API_KEY_INVALID' in error_msg:
-            logger.error("=" * 60)
-            logger.error("GEMINI API KEY ERROR - ACTION REQUIRED")
-            logger.error("=" * 60)
-            logger.error("Your API key is being read but Google says it's invalid.")
-            logger.error("")
-            logger.error("SOLUTIONS:")
-            logger.error("1. Enable Generative Language API:")
-            logger.error("   - Go to: https://console.cloud.google.com/apis/library")
-            logger.error("   - Search: 'Generative Language API'")
-            logger.error("   - Click 'Enable'")
-            logger.error("")
-            logger.error("2. Check API key restrictions:")
-            logger.error("   - Go to: https://console.cloud.google.com/apis/credentials")
-            logger.error("   - Edit your API key")
-            logger.error("   - Make sure 'Generative Language API' is allowed")
-            logger.error("")
-            logger.error("3. Regenerate API key:")
-            logger.error("   - Go to: https://makersuite.google.com/app/apikey")
-            logger.error("   - Create new key and update .env file")
-            logger.error("")
-            logger.error(f"Current API key (first 20 chars): {api_key[:20]}...")
-            logger.error("=" * 60)
-        
+        log_gemini_error(client, e)
+        return None
+
+
+async def aparse_resume_with_gemini(
+    text: str,
+    use_cache: bool = True,
+    sections: Optional[List[str]] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Async variant of parse_resume_with_gemini for the ASGI views.
+    The Gemini call goes through the SDK's asyncio client, so no thread is
+    held while waiting for the response.
+
+    Args:
+        text: Extracted text from resume
+        use_cache: Look up and store the response in the Gemini response cache
+        sections: Only ask for these sections (all sections by default)
+
+    Returns:
+        Dict with parsed resume data, or None if parsing fails
+    """
+    if not text or not text.strip():
+        logger.warning("Empty text provided to Gemini")
+        return None
+
+    client = get_gemini_client()
+    if client is None:
+        return None
+
+    cache = get_gemini_cache()
+    cache_text = resume_cache_text(text, sections)
+    try:
+        if use_cache:
+            cached_data = await sync_to_async(cache.get)(cache_text, client.model_name, PROMPT_VERSION)
+            if cached_data is not None:
+                logger.info("Returning cached Gemini response")
+                return cached_data
+
+        response = await client.generate_content_async(build_resume_prompt(text, sections))
+        response_text = strip_code_fences(response.text)
+        parsed_data = json.loads(response_text)
+
+        logger.info("Successfully parsed resume with Gemini")
+        if use_cache:
+            await sync_to_async(cache.set)(cache_text, client.model_name, PROMPT_VERSION, parsed_data)
+        return parsed_data
+
+    except CircuitOpenError as e:
+        logger.warning(str(e))
+        return None
+    except json.JSONDecodeError as e:
+        logger.error(f"Failed to parse JSON from Gemini response: {str(e)}")
+        logger.error(f"Response text: {response_text[:500]}")
+        return None
+    except Exception as e:
+        log_gemini_error(client, e)
         return None
 
 
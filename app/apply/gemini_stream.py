@@ -0,0 +1,173 @@
+"""
+Streaming Gemini parsing.
+
+The response is consumed chunk by chunk. IncrementalResumeParser scans the
+partial JSON and hands every experience, education, project, ... object to
+a callback as soon as it is complete, so rows can be written and progress
+published before the whole response has arrived.
+"""
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .gemini_cache import get_gemini_cache
+from .gemini_client import CircuitOpenError, get_gemini_client, response_text
+from .gemini_service import (
+    PROMPT_VERSION,
+    RESUME_SECTION_STRUCTURES,
+    build_resume_prompt,
+    resume_cache_text,
+    strip_code_fences,
+)
+
+logger = logging.getLogger(__name__)
+
+ItemCallback = Callable[[str, Any], None]
+
+
+class IncrementalResumeParser:
+    """
+    Incremental scanner for the resume JSON object.
+
+    Tracks string and nesting state across chunks and emits
+    (section, item) pairs for every complete element of a top-level array.
+    The full text is kept for the final json.loads.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_key = None
+        self._section = None
+        self._item_start = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Add a chunk of the response.
+
+        Returns:
+            (section, item) pairs completed by this chunk
+        """
+        self.text += chunk
+        items = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            char = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._end_string(text[self._string_start:i + 1], items)
+                continue
+            if self._depth == 0:
+                # Skip code fences and anything else before the object
+                if char == '{':
+                    self._depth = 1
+                continue
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char in '{[':
+                self._depth += 1
+                if self._depth == 2 and char == '[':
+                    self._section = self._last_key
+                elif self._depth == 3:
+                    self._item_start = i
+            elif char in '}]':
+                if self._depth == 3 and self._item_start is not None:
+                    self._emit(text[self._item_start:i + 1], items)
+                    self._item_start = None
+                elif self._depth == 2:
+                    self._section = None
+                self._depth -= 1
+        self._pos = len(text)
+        return items
+
+    def _end_string(self, literal: str, items: list) -> None:
+        if self._depth == 1:
+            self._last_key = literal
+        elif self._depth == 2 and self._section is not None:
+            # Plain string element, e.g. a skill
+            self._emit(literal, items)
+
+    def _emit(self, literal: str, items: list) -> None:
+        if self._section is None:
+            return
+        try:
+            section = json.loads(self._section)
+            item = json.loads(literal)
+        except json.JSONDecodeError:
+            return
+        if section in RESUME_SECTION_STRUCTURES:
+            items.append((section, item))
+
+
+def stream_resume_with_gemini(
+    text: str,
+    on_item: ItemCallback,
+    sections: Optional[List[str]] = None,
+    use_cache: bool = True,
+) -> Optional[Dict[str, Any]]:
+    """
+    Parse a resume with a streaming Gemini call.
+
+    Args:
+        text: Resume text
+        on_item: Called with (section, item) for every completed item; cached
+            responses replay all their items through it
+        sections: Only ask for these sections (all sections by default)
+        use_cache: Look up and store the response in the Gemini response cache
+
+    Returns:
+        Dict with the complete parsed resume data, or None if parsing fails
+    """
+    if not text or not text.strip():
+        logger.warning("Empty text provided to Gemini")
+        return None
+
+    client = get_gemini_client()
+    if client is None:
+        return None
+
+    cache = get_gemini_cache()
+    cache_text = resume_cache_text(text, sections)
+    if use_cache:
+        cached_data = cache.get(cache_text, client.model_name, PROMPT_VERSION)
+        if cached_data is not None:
+            logger.info("Returning cached Gemini response")
+            for section in RESUME_SECTION_STRUCTURES:
+                for item in cached_data.get(section) or []:
+                    on_item(section, item)
+            return cached_data
+
+    parser = IncrementalResumeParser()
+    emitted = 0
+    try:
+        response = client.generate_content(build_resume_prompt(text, sections), stream=True)
+        for chunk in response:
+            for section, item in parser.feed(response_text(chunk)):
+                on_item(section, item)
+                emitted += 1
+        parsed_data = json.loads(strip_code_fences(parser.text))
+    except CircuitOpenError as e:
+        logger.warning(str(e))
+        return None
+    except json.JSONDecodeError as e:
+        logger.error(f"Failed to parse JSON from streamed Gemini response: {str(e)}")
+        logger.error(f"Response text: {parser.text[:500]}")
+        return None
+    except Exception as e:
+        logger.error(f"Error streaming Gemini response after {emitted} items: {str(e)}")
+        return None
+
+    logger.info(f"Successfully parsed resume with streaming Gemini ({emitted} items)")
+    if use_cache:
+        cache.set(cache_text, client.model_name, PROMPT_VERSION, parsed_data)
+    return parsed_data
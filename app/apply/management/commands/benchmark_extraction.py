@@ -0,0 +1,85 @@
+"""
+Django command to benchmark resume text extraction.
+"""
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apply.extraction_benchmark import (
+    EXTRACTORS,
+    compare_to_baseline,
+    corpus_fingerprint,
+    default_corpus_dir,
+    generate_corpus,
+    run_benchmark,
+)
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the extractors in apply/utils.py."""
+
+    help = 'Benchmark PDF/DOCX/DOC text extraction over a generated corpus.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--corpus-dir',
+            type=Path,
+            default=None,
+            help='Directory for the generated corpus (default: $EXTRACTION_BENCHMARK_DIR '
+                 'or /tmp/jobai-extraction-corpus).',
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Corpus generation seed.')
+        parser.add_argument('--copies', type=int, default=3, help='Documents generated per shape.')
+        parser.add_argument('--repeat', type=int, default=1, help='Passes over the corpus per extractor.')
+        parser.add_argument(
+            '--extractor',
+            action='append',
+            dest='extractors',
+            choices=sorted(EXTRACTORS),
+            help='Extractor to benchmark (can be given several times, default: all).',
+        )
+        parser.add_argument('--baseline', type=Path, help='Baseline JSON file to compare against.')
+        parser.add_argument('--save-baseline', type=Path, help='Write the results to this baseline file.')
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.2,
+            help='Allowed relative regression before failing (default 0.2 = 20%%).',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        corpus_dir = options['corpus_dir'] or default_corpus_dir()
+        self.stdout.write(f'Generating corpus in {corpus_dir}...')
+        corpus = generate_corpus(corpus_dir, seed=options['seed'], copies=options['copies'])
+        fingerprint = corpus_fingerprint(corpus)
+        self.stdout.write(f'{len(corpus)} documents, fingerprint {fingerprint}')
+
+        extractors = options['extractors'] or list(EXTRACTORS)
+        results = run_benchmark(corpus, extractors, repeat=options['repeat'])
+
+        header = f"{'extractor':<16}{'docs':>6}{'docs/s':>9}{'MB/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'RSS MB':>9}{'chars':>10}"
+        self.stdout.write(header)
+        for name, metrics in results.items():
+            self.stdout.write(
+                f"{name:<16}{metrics['documents']:>6}{metrics['docs_per_second']:>9}{metrics['mb_per_second']:>8}"
+                f"{metrics['p50_ms']:>9}{metrics['p95_ms']:>9}{metrics['peak_rss_mb']:>9}{metrics['output_chars']:>10}"
+            )
+
+        if options['save_baseline']:
+            options['save_baseline'].write_text(
+                json.dumps({'corpus': fingerprint, 'results': results}, indent=2)
+            )
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved to {options['save_baseline']}"))
+
+        if options['baseline']:
+            baseline = json.loads(options['baseline'].read_text())
+            if baseline.get('corpus') != fingerprint:
+                raise CommandError('Baseline was recorded on a different corpus, regenerate it with --save-baseline.')
+            regressions = compare_to_baseline(results, baseline['results'], options['tolerance'])
+            if regressions:
+                for regression in regressions:
+                    self.stdout.write(self.style.ERROR(f'REGRESSION {regression}'))
+                raise CommandError(f'{len(regressions)} extraction regressions against {options["baseline"]}')
+            self.stdout.write(self.style.SUCCESS('No regressions against baseline.'))
@@ -0,0 +1,51 @@
+"""
+Django command to build or compact the semantic resume index.
+"""
+from django.core.management.base import BaseCommand
+
+from apply import semantic_index
+from apply.models import Resume
+
+
+class Command(BaseCommand):
+    """Django command that embeds processed resumes into the memory-mapped index."""
+
+    help = 'Embed processed resumes into the semantic index and compact it.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Resumes embedded per append.',
+        )
+        parser.add_argument(
+            '--compact-only',
+            action='store_true',
+            help='Only compact the index (drop removed rows, retrain the inverted lists).',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        done = Resume.objects.filter(status=Resume.Status.DONE)
+
+        if not options['compact_only']:
+            # Walk the table by primary key so every batch is an index range
+            last_id = 0
+            total = 0
+            while True:
+                ids = list(
+                    done.filter(id__gt=last_id).order_by('id')
+                    .values_list('id', flat=True)[:options['batch_size']]
+                )
+                if not ids:
+                    break
+                total += semantic_index.append_vectors(semantic_index.embed_resumes(ids))
+                last_id = ids[-1]
+                self.stdout.write(f'Embedded {total} resumes...')
+
+        meta = semantic_index.compact(keep_ids=set(done.values_list('id', flat=True)))
+        self.stdout.write(self.style.SUCCESS(
+            f"Semantic index has {meta['count']} resumes in {meta['nlist']} lists "
+            f"(generation {meta['generation']})."
+        ))
@@ -0,0 +1,67 @@
+"""
+Django command to invalidate cached Gemini responses.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Sum
+
+from apply.gemini_cache import get_gemini_cache
+from apply.gemini_service import PROMPT_VERSION
+from apply.models import GeminiResponseCache
+
+
+class Command(BaseCommand):
+    """Django command to delete Gemini cache entries by prompt version."""
+
+    help = 'Delete cached Gemini responses for one or more prompt versions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prompt-version',
+            action='append',
+            dest='prompt_versions',
+            default=[],
+            help='Prompt version to invalidate (can be given several times).',
+        )
+        parser.add_argument(
+            '--outdated',
+            action='store_true',
+            help=f'Invalidate every prompt version except the current one ({PROMPT_VERSION}).',
+        )
+        parser.add_argument(
+            '--expired',
+            action='store_true',
+            help='Only run eviction of expired and over-capacity entries.',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Invalidate the whole cache.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        cache = get_gemini_cache()
+        prompt_versions = options['prompt_versions']
+
+        if options['outdated']:
+            prompt_versions += list(
+                GeminiResponseCache.objects.exclude(prompt_version=PROMPT_VERSION)
+                .values_list('prompt_version', flat=True).distinct()
+            )
+
+        if options['all']:
+            deleted = cache.invalidate()
+        elif options['expired']:
+            deleted = cache.evict()
+        elif prompt_versions or options['outdated']:
+            deleted = sum(cache.invalidate(version) for version in set(prompt_versions))
+        else:
+            raise CommandError('Pass --prompt-version, --outdated, --expired or --all.')
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} cache entries.'))
+
+        for row in (GeminiResponseCache.objects.values('prompt_version')
+                    .annotate(entries=Count('id'), hits=Sum('hits')).order_by('prompt_version')):
+            self.stdout.write(
+                f"prompt version {row['prompt_version']}: {row['entries']} entries, {row['hits']} hits"
+            )
@@ -0,0 +1,84 @@
+"""
+Django command to process queued resume uploads.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from apply import semantic_index
+from apply.matching import prune_resume_deletions
+from apply.resume_events import prune_events
+from apply.resume_queue import (
+    claim_resumes,
+    get_processing_setting,
+    process_resume,
+    process_resume_batch,
+    requeue_stale_resumes,
+)
+
+
+class Command(BaseCommand):
+    """Django command that runs a resume processing worker."""
+
+    help = 'Claim queued resumes and run extraction, Gemini parsing and population.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the queue and exit instead of polling forever.',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=None,
+            help='Seconds to sleep when the queue is empty.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1,
+            help='Claim up to N resumes at a time and parse them with batched Gemini prompts '
+                 '(useful for backfills).',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        poll_interval = options['poll_interval']
+        if poll_interval is None:
+            poll_interval = get_processing_setting('POLL_INTERVAL_SECONDS')
+
+        self.stdout.write('Resume worker started.')
+        processed = 0
+        requeue_stale_resumes()
+        while True:
+            batch_size = options['batch_size']
+            resumes = claim_resumes(limit=batch_size)
+            if not resumes:
+                if options['once']:
+                    break
+                time.sleep(poll_interval)
+                requeue_stale_resumes()
+                prune_events()
+                prune_resume_deletions()
+                semantic_index.maybe_compact()
+                continue
+
+            if batch_size > 1:
+                self.stdout.write(f'Processing batch of {len(resumes)} resumes...')
+                done = process_resume_batch(resumes)
+                self.stdout.write(self.style.SUCCESS(f'Batch finished, {done}/{len(resumes)} done.'))
+                processed += len(resumes)
+                continue
+
+            resume = resumes[0]
+            self.stdout.write(f'Processing resume {resume.id} (attempt {resume.attempts})...')
+            if process_resume(resume):
+                self.stdout.write(self.style.SUCCESS(f'Resume {resume.id} done.'))
+            else:
+                self.stdout.write(self.style.WARNING(
+                    f'Resume {resume.id} {resume.status}: {resume.status_message}'
+                ))
+            processed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Queue drained, processed {processed} resumes.'))
@@ -0,0 +1,51 @@
+"""
+Django command to (re)build the full-text search vectors of all resumes.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apply.models import Resume
+from apply.resume_search import search_available, update_search_vectors
+
+
+class Command(BaseCommand):
+    """Django command that backfills Resume.search_vector in batches."""
+
+    help = 'Rebuild the full-text search vector of every resume (PostgreSQL only).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Resumes updated per UPDATE statement.',
+        )
+        parser.add_argument(
+            '--missing',
+            action='store_true',
+            help='Only build vectors for resumes that have none yet.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if not search_available():
+            raise CommandError('Full-text search requires PostgreSQL.')
+
+        resumes = Resume.objects.all()
+        if options['missing']:
+            resumes = resumes.filter(search_vector__isnull=True)
+
+        # Walk the table by primary key so every batch is an index range
+        last_id = 0
+        total = 0
+        while True:
+            ids = list(
+                resumes.filter(id__gt=last_id).order_by('id')
+                .values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            total += update_search_vectors(Resume.objects.filter(id__in=ids))
+            last_id = ids[-1]
+            self.stdout.write(f'Updated {total} resumes...')
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt search vectors for {total} resumes.'))
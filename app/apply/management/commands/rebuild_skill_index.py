@@ -0,0 +1,53 @@
+"""
+Django command to (re)build the canonical skill index of all resumes.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apply.models import Resume
+from apply.skill_index import sync_resume_skills
+
+
+class Command(BaseCommand):
+    """Django command that backfills ResumeSkill links in batches."""
+
+    help = 'Map every resume\'s skills to canonical skills and rebuild the skill -> resume index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Resumes indexed per transaction.',
+        )
+        parser.add_argument(
+            '--missing',
+            action='store_true',
+            help='Only index resumes that have skills but no index entries yet.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        resumes = Resume.objects.filter(skills__isnull=False).distinct()
+        if options['missing']:
+            resumes = resumes.filter(skill_links__isnull=True)
+
+        # Walk the table by primary key so every batch is an index range
+        last_id = 0
+        total = created = deleted = 0
+        while True:
+            batch = list(resumes.filter(id__gt=last_id).order_by('id').only('id')[:options['batch_size']])
+            if not batch:
+                break
+            with transaction.atomic():
+                for resume in batch:
+                    added, removed = sync_resume_skills(resume)
+                    created += added
+                    deleted += removed
+            total += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f'Indexed {total} resumes...')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {total} resumes: {created} links created, {deleted} removed.'
+        ))
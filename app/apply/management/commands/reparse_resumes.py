@@ -0,0 +1,82 @@
+"""
+Django command to re-parse resumes written by an older parser version.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from apply.gemini_client import RateLimiter
+from apply.resume_parser import PARSER_VERSION
+from apply.resume_reparse import ReparseStats, claim_stale_resumes, reparse_chunk, stale_resumes
+
+
+class Command(BaseCommand):
+    """Django command that re-parses stale resumes in keyset-ordered chunks."""
+
+    help = (f'Re-parse resumes whose parsed data was written by another parser version '
+            f'(current: {PARSER_VERSION}). Safe to run in several processes at once.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Resumes claimed per chunk.',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=4,
+            help='Gemini requests in flight at once.',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=60,
+            help='Maximum Gemini requests started per minute by this process (0 for no limit).',
+        )
+        parser.add_argument(
+            '--include-local',
+            action='store_true',
+            help='Also re-parse current resumes that were parsed by the local parser.',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Re-parse at most N resumes.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the stale resumes.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        include_local = options['include_local']
+        self.stdout.write(
+            f'{stale_resumes(include_local).count()} stale resumes (parser version {PARSER_VERSION}).'
+        )
+        if options['dry_run']:
+            return
+
+        limiter = RateLimiter(options['rate']) if options['rate'] else None
+        stats = ReparseStats()
+        last_id = 0
+        with ThreadPoolExecutor(max_workers=options['concurrency'], thread_name_prefix='reparse') as executor:
+            while options['limit'] is None or stats.total < options['limit']:
+                batch_size = options['batch_size']
+                if options['limit'] is not None:
+                    batch_size = min(batch_size, options['limit'] - stats.total)
+                resumes = claim_stale_resumes(last_id, batch_size, include_local)
+                if not resumes:
+                    break
+                reparse_chunk(resumes, executor, limiter, stats)
+                last_id = resumes[-1].id
+                self.stdout.write(f'Processed {stats.total} resumes (up to id {last_id})...')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Re-parsed {stats.counts.get("reparsed", 0)} of {stats.total} resumes: '
+            + ', '.join(f'{count} {outcome}' for outcome, count in sorted(stats.counts.items()))
+        ))
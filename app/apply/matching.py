@@ -0,0 +1,440 @@
+"""
+Vectorized resume-to-job matching.
+
+Every processed resume is a row of one sparse TF-IDF matrix. Its columns
+are (term, field) pairs over three fields: the normalized resume text, the
+skill names and the experience titles. A job description is tokenized once
+and scored against all resumes with a single sparse matrix product that
+yields the cosine similarity of every field at once. The field scores are
+then combined with the configured weights.
+
+The index lives in process memory and is built lazily from the database.
+It is updated incrementally: save_parse_result re-indexes a resume as soon
+as it is parsed, and every REFRESH_INTERVAL seconds the index picks up the
+resumes changed by other processes (by updated_at) and drops the ones that
+are no longer done or were deleted (ResumeDeletion tombstones, written by a
+post_delete handler and pruned by the resume worker).
+IDF weights and document norms are derived from document frequencies at
+query time, so adding a resume never requires rebuilding the matrix.
+"""
+import logging
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+from scipy import sparse
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    # Relative weight of each field in the combined score
+    'FIELD_WEIGHTS': {'text': 1.0, 'skills': 2.0, 'titles': 1.0},
+    'REFRESH_INTERVAL': 30,  # seconds between checks for resumes processed elsewhere
+    'BATCH_SIZE': 1000,  # resumes loaded per batch when building the index
+    'TOP_K': 10,
+    'MAX_TOP_K': 100,
+    'EXPLAIN_TERMS': 5,  # matched terms reported per field
+    'MAX_QUERY_LENGTH': 20000,  # characters of job description used
+    'COMPACT_RATIO': 0.25,  # compact the matrix once this share of rows is dead
+    # Deletion tombstones are kept this long; an index not refreshed for longer is rebuilt
+    'DELETION_RETENTION_SECONDS': 60 * 60 * 24,
+}
+
+FIELDS = ('text', 'skills', 'titles')
+
+STOP_WORDS = frozenset("""
+a about above after all also an and any are as at be been being but by can could did do does
+for from had has have having he her his how i if in into is it its just may me more most must
+my no not of on or our out over own per she should so some such than that the their them then
+there these they this those through to too under up us very was we were what when where which
+while who will with within would you your yours
+""".split())
+
+# Keeps technology tokens whole: c++, c#, node.js, asp.net, ci/cd parts
+_token_re = re.compile(r'[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*')
+
+
+def get_matching_setting(name: str):
+    """Read a value from settings.RESUME_MATCHING, falling back to defaults."""
+    return getattr(settings, 'RESUME_MATCHING', {}).get(name, DEFAULT_SETTINGS[name])
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase terms of a text without stop words and one-letter noise (except C and R)."""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return [
+        token for token in _token_re.findall(text)
+        if token not in STOP_WORDS and (len(token) > 1 or token in ('c', 'r'))
+    ]
+
+
+@dataclass
+class Match:
+    """One scored resume."""
+    resume_id: int
+    score: float
+    breakdown: Dict[str, float] = field(default_factory=dict)  # cosine similarity per field
+    matched_terms: Dict[str, List[str]] = field(default_factory=dict)  # strongest shared terms per field
+
+
+class MatchIndex:
+    """
+    In-memory TF-IDF index of resumes.
+
+    Column ``term_id * len(FIELDS) + field_index`` holds the sublinear term
+    frequency (1 + log tf) of a term in one field, so new terms only widen
+    the matrix. New rows are buffered and stacked onto the CSR matrix on the
+    next query; removed rows are zeroed and compacted away in bulk.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self) -> None:
+        """Forget every indexed resume; the next refresh rebuilds the index."""
+        self.loaded = False
+        self.synced_at = None  # updated_at watermark of the last refresh
+        self.deleted_after = 0  # last ResumeDeletion id applied
+        self.checked_at = 0.0  # monotonic time of the last refresh
+        self._vocab: Dict[str, int] = {}
+        self._terms: List[str] = []
+        self._rows: Dict[int, int] = {}  # resume id -> row
+        self._matrix = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self._resume_ids = np.zeros(0, dtype=np.int64)
+        self._owners = np.zeros(0, dtype=np.int64)
+        self._alive = np.zeros(0, dtype=bool)
+        self._df = np.zeros(0, dtype=np.float64)  # document frequency per column
+        self._pending: List[Tuple[int, int, Dict[int, float]]] = []  # (resume id, owner id, {column: tf})
+        self._norms = None  # cached (idf, document norms per field)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def width(self) -> int:
+        return len(self._terms) * len(FIELDS)
+
+    def _column(self, term: str, field_index: int) -> int:
+        term_id = self._vocab.get(term)
+        if term_id is None:
+            term_id = self._vocab[term] = len(self._terms)
+            self._terms.append(term)
+        return term_id * len(FIELDS) + field_index
+
+    def add(self, resume_id: int, owner_id: int, fields: Dict[str, List[str]]) -> None:
+        """Index (or re-index) one resume from its tokenized fields."""
+        self.add_many({resume_id: (owner_id, fields)})
+
+    def add_many(self, documents: Dict[int, Tuple[int, Dict[str, List[str]]]]) -> None:
+        """Index (or re-index) resumes given as {resume id: (owner id, tokenized fields)}."""
+        with self.lock:
+            self.remove_many(documents)
+            for resume_id, (owner_id, fields) in documents.items():
+                weights = {}
+                for field_index, name in enumerate(FIELDS):
+                    for term, count in Counter(fields.get(name, [])).items():
+                        weights[self._column(term, field_index)] = 1.0 + math.log(count)
+                if len(self._df) < self.width:
+                    self._df = np.concatenate([self._df, np.zeros(self.width - len(self._df))])
+                self._df[list(weights)] += 1
+                self._rows[resume_id] = self._matrix.shape[0] + len(self._pending)
+                self._pending.append((resume_id, owner_id, weights))
+            self._norms = None
+
+    def remove(self, resume_id: int) -> None:
+        """Drop a resume from the index (no-op if it is not indexed)."""
+        self.remove_many([resume_id])
+
+    def remove_many(self, resume_ids: Iterable[int]) -> int:
+        """
+        Drop resumes from the index with one flush of the buffered rows.
+
+        Returns:
+            Number of resumes that were indexed
+        """
+        with self.lock:
+            resume_ids = [resume_id for resume_id in resume_ids if resume_id in self._rows]
+            if not resume_ids:
+                return 0
+            self._flush()
+            for resume_id in resume_ids:
+                row = self._rows.pop(resume_id)
+                start, end = self._matrix.indptr[row], self._matrix.indptr[row + 1]
+                self._df[self._matrix.indices[start:end]] -= 1
+                self._matrix.data[start:end] = 0
+                self._alive[row] = False
+            self._norms = None
+            dead = len(self._alive) - len(self._rows)
+            if dead > get_matching_setting('COMPACT_RATIO') * len(self._alive):
+                self._compact()
+            return len(resume_ids)
+
+    def _flush(self) -> None:
+        """Stack buffered rows onto the matrix."""
+        width = self.width
+        if self._matrix.shape[1] < width:
+            self._matrix.resize((self._matrix.shape[0], width))
+        if not self._pending:
+            return
+        row_index, columns, values = [], [], []
+        for offset, (_resume_id, _owner_id, weights) in enumerate(self._pending):
+            row_index += [offset] * len(weights)
+            columns += list(weights)
+            values += list(weights.values())
+        new_rows = sparse.csr_matrix(
+            (np.array(values, dtype=np.float32), (row_index, columns)),
+            shape=(len(self._pending), width),
+        )
+        self._matrix = sparse.vstack([self._matrix, new_rows], format='csr')
+        self._resume_ids = np.concatenate([self._resume_ids, [item[0] for item in self._pending]])
+        self._owners = np.concatenate([self._owners, [item[1] for item in self._pending]])
+        self._alive = np.concatenate([self._alive, np.ones(len(self._pending), dtype=bool)])
+        self._pending = []
+
+    def _compact(self) -> None:
+        """Physically remove dead rows."""
+        keep = np.flatnonzero(self._alive)
+        self._matrix = self._matrix[keep]
+        self._matrix.eliminate_zeros()
+        self._resume_ids = self._resume_ids[keep]
+        self._owners = self._owners[keep]
+        self._alive = self._alive[keep]
+        self._rows = {int(resume_id): row for row, resume_id in enumerate(self._resume_ids)}
+
+    def _field_blocks(self, column_values: np.ndarray) -> sparse.csr_matrix:
+        """(width x fields) matrix putting each column's value under its field."""
+        width = len(column_values)
+        columns = np.arange(width)
+        return sparse.csr_matrix((column_values, (columns, columns % len(FIELDS))), shape=(width, len(FIELDS)))
+
+    def _idf_and_norms(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Smoothed IDF per column and TF-IDF norm of every row per field."""
+        if self._norms is None:
+            documents = len(self._rows)
+            idf = np.log((1.0 + documents) / (1.0 + self._df)) + 1.0
+            # ||tf * idf|| per field for every row in one product
+            squared = self._matrix.multiply(self._matrix).tocsr()
+            norms = np.sqrt(np.asarray((squared @ self._field_blocks(idf ** 2)).todense()))
+            self._norms = (idf, norms)
+        return self._norms
+
+    def score(self, tokens: List[str], owner_id: Optional[int] = None, top_k: int = 10) -> List[Match]:
+        """
+        Rank indexed resumes against the tokens of a job description.
+
+        Args:
+            tokens: Tokenized job description
+            owner_id: Only rank resumes of this user (None ranks all)
+            top_k: Number of matches to return
+
+        Returns:
+            Best matches first, each with a per-field score breakdown
+        """
+        with self.lock:
+            self._flush()
+            if not self._rows:
+                return []
+            idf, norms = self._idf_and_norms()
+
+            # The query is the same text for every field, weighted by that field's IDF
+            query = np.zeros(self.width)
+            for term, count in Counter(tokens).items():
+                term_id = self._vocab.get(term)
+                if term_id is not None:
+                    start = term_id * len(FIELDS)
+                    query[start:start + len(FIELDS)] = 1.0 + math.log(count)
+            query *= idf
+            query_norms = np.sqrt(np.bincount(np.arange(self.width) % len(FIELDS), query ** 2, len(FIELDS)))
+            if not query_norms.any():
+                return []
+
+            # One product scores every resume on every field: (rows x width) @ (width x fields)
+            dot = np.asarray((self._matrix @ self._field_blocks(query * idf)).todense())
+            with np.errstate(divide='ignore', invalid='ignore'):
+                cosine = np.nan_to_num(dot / (norms * np.where(query_norms > 0, query_norms, 1.0)))
+
+            weight_map = get_matching_setting('FIELD_WEIGHTS')
+            weights = np.array([weight_map.get(name, 0.0) for name in FIELDS])
+            total = cosine @ weights / weights.sum()
+
+            candidates = self._alive & (total > 0)
+            if owner_id is not None:
+                candidates &= self._owners == owner_id
+            rows = np.flatnonzero(candidates)
+            if len(rows) > top_k:
+                rows = rows[np.argpartition(-total[rows], top_k - 1)[:top_k]]
+            rows = rows[np.lexsort((-self._resume_ids[rows], -total[rows]))]
+
+            return [
+                Match(
+                    resume_id=int(self._resume_ids[row]),
+                    score=round(float(total[row]), 4),
+                    breakdown={name: round(float(cosine[row, index]), 4) for index, name in enumerate(FIELDS)},
+                    matched_terms=self._explain(row, query * idf),
+                )
+                for row in rows
+            ]
+
+    def _explain(self, row: int, weighted_query: np.ndarray) -> Dict[str, List[str]]:
+        """Shared terms contributing most to each field score of a row."""
+        start, end = self._matrix.indptr[row], self._matrix.indptr[row + 1]
+        columns = self._matrix.indices[start:end]
+        contributions = self._matrix.data[start:end] * weighted_query[columns]
+        limit = get_matching_setting('EXPLAIN_TERMS')
+        terms = {name: [] for name in FIELDS}
+        for position in np.argsort(-contributions):
+            if contributions[position] <= 0:
+                break
+            term_id, field_index = divmod(int(columns[position]), len(FIELDS))
+            field_terms = terms[FIELDS[field_index]]
+            if len(field_terms) < limit:
+                field_terms.append(self._terms[term_id])
+        return terms
+
+
+def load_documents(resume_ids: Iterable[int]) -> Dict[int, Tuple[int, Dict[str, List[str]]]]:
+    """
+    Load and tokenize the matching fields of some resumes (3 queries).
+
+    Returns:
+        Mapping of resume id to (owner id, tokens per field)
+    """
+    resume_ids = list(resume_ids)
+    documents = {}
+    resumes = models.Resume.objects.filter(id__in=resume_ids).values_list(
+        'id', 'user_id', 'text_normalized', 'text_extracted',
+    )
+    for resume_id, user_id, text_normalized, text_extracted in resumes:
+        documents[resume_id] = (user_id, {'text': tokenize(text_normalized or text_extracted), 'skills': [], 'titles': []})
+    for model, name, attribute in ((models.Skill, 'skills', 'name'), (models.Experience, 'titles', 'title')):
+        for resume_id, value in model.objects.filter(resume_id__in=resume_ids).values_list('resume_id', attribute):
+            if resume_id in documents:
+                documents[resume_id][1][name] += tokenize(value)
+    return documents
+
+
+def _index_batch(index: MatchIndex, resume_ids: List[int]) -> None:
+    index.add_many(load_documents(resume_ids))
+
+
+_index = MatchIndex()
+
+
+def reset_match_index() -> None:
+    """Forget the in-memory index; the next query rebuilds it."""
+    global _index
+    _index = MatchIndex()
+
+
+def refresh_match_index(index: Optional[MatchIndex] = None) -> MatchIndex:
+    """
+    Build the index on first use, then pick up resumes changed since the
+    last refresh and drop resumes that were deleted or are no longer done.
+    Only rows past the updated_at and tombstone watermarks are read.
+    """
+    index = index or _index
+    batch_size = get_matching_setting('BATCH_SIZE')
+    retention = timedelta(seconds=get_matching_setting('DELETION_RETENTION_SECONDS'))
+    with index.lock:
+        # Taken before reading, so rows changed during the refresh are read again next time
+        started = timezone.now()
+        if index.loaded and index.synced_at and index.synced_at < started - retention:
+            # Tombstones older than the last refresh may have been pruned
+            logger.info("Resume match index is older than the deletion retention, rebuilding it")
+            index.clear()
+
+        deletions = models.ResumeDeletion.objects.filter(id__gt=index.deleted_after)
+        if not index.loaded:
+            index.deleted_after = deletions.aggregate(latest=Max('id'))['latest'] or index.deleted_after
+            changed = models.Resume.objects.filter(status=models.Resume.Status.DONE)
+        else:
+            tombstones = list(deletions.order_by('id').values_list('id', 'resume_id'))
+            if tombstones:
+                index.remove_many(resume_id for _id, resume_id in tombstones)
+                index.deleted_after = tombstones[-1][0]
+            changed = models.Resume.objects.filter(updated_at__gte=index.synced_at)
+
+        # Walk by primary key so every batch is an index range
+        last_id = 0
+        while True:
+            rows = list(changed.filter(id__gt=last_id).order_by('id').values_list('id', 'status')[:batch_size])
+            if not rows:
+                break
+            index.remove_many([resume_id for resume_id, status in rows if status != models.Resume.Status.DONE])
+            done_ids = [resume_id for resume_id, status in rows if status == models.Resume.Status.DONE]
+            if done_ids:
+                _index_batch(index, done_ids)
+            if len(rows) < batch_size:
+                break
+            last_id = rows[-1][0]
+
+        if not index.loaded:
+            logger.info(f"Built resume match index with {len(index)} resumes")
+        index.loaded = True
+        index.synced_at = started
+        index.checked_at = time.monotonic()
+    return index
+
+
+def prune_resume_deletions() -> int:
+    """
+    Delete tombstones older than DELETION_RETENTION_SECONDS (called by idle workers).
+
+    Returns:
+        Number of deleted tombstones
+    """
+    cutoff = timezone.now() - timedelta(seconds=get_matching_setting('DELETION_RETENTION_SECONDS'))
+    deleted, _ = models.ResumeDeletion.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
+
+
+def get_match_index() -> MatchIndex:
+    """The process-wide index, refreshed at most every REFRESH_INTERVAL seconds."""
+    index = _index
+    if not index.loaded or time.monotonic() - index.checked_at >= get_matching_setting('REFRESH_INTERVAL'):
+        refresh_match_index(index)
+    return index
+
+
+def index_resume(resume: models.Resume) -> None:
+    """
+    Re-index one resume after it was parsed. Only touches an index that is
+    already loaded; a process without one builds it on its first query.
+    """
+    index = _index
+    if not index.loaded:
+        return
+    try:
+        _index_batch(index, [resume.id])
+    except Exception as e:
+        logger.warning(f"Could not update the match index for resume {resume.id}: {str(e)}")
+
+
+def match_resumes(job_description: str, owner_id: Optional[int] = None, top_k: Optional[int] = None) -> List[Match]:
+    """
+    Rank resumes against a job description.
+
+    Args:
+        job_description: Free-text job description
+        owner_id: Only rank resumes of this user (None ranks every resume)
+        top_k: Number of matches (defaults to TOP_K, capped at MAX_TOP_K)
+
+    Returns:
+        Best matches first
+    """
+    top_k = min(max(top_k or get_matching_setting('TOP_K'), 1), get_matching_setting('MAX_TOP_K'))
+    tokens = tokenize(job_description[:get_matching_setting('MAX_QUERY_LENGTH')])
+    return get_match_index().score(tokens, owner_id=owner_id, top_k=top_k)
@@ -0,0 +1,322 @@
+"""
+Pipeline metrics in the Prometheus text format.
+
+Counters and histograms are kept in memory per process and observed with
+a dict update under a lock, so instrumenting hot paths is cheap. A
+background thread writes each process's values to its own file in
+METRICS['DIR'] every FLUSH_INTERVAL seconds (and at exit), named after the
+process id and start time, so a recycled pid is not mistaken for the
+process that wrote the file. The metrics
+endpoint merges the files of every process (web and workers) on the host.
+Files of processes that exited are folded into an archive file, so
+counters keep growing across restarts.
+
+Instrumented:
+    resume_extraction_seconds{extractor}     text extraction per document
+    gemini_request_seconds{model,stream}     Gemini latency (first chunk for streams)
+    gemini_requests_total{model,outcome}
+    gemini_prompt_chars{model} / gemini_response_chars{model}
+    gemini_tokens_total{model,direction}     estimated, about four characters per token
+    gemini_cache_events_total{event}         cache hits (local, db), misses, writes, evictions, errors
+    resume_write_seconds{mode} / resume_write_queries{mode}
+    storage_put_seconds                      storage (R2) writes
+    http_request_duration_seconds{method,view,status}
+"""
+import atexit
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'ENABLED': True,
+    'DIR': None,  # defaults to BASE_DIR / 'var' / 'metrics'
+    'FLUSH_INTERVAL': 5,  # seconds between writes of a process's metrics file
+    'TOKEN': '',  # bearer token of the endpoint; without one only loopback clients are served
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (250, 500, 1000, 2500, 5000, 10000, 20000, 40000, 80000)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+# name -> (type, help, buckets)
+METRICS = {
+    'resume_extraction_seconds': ('histogram', 'Text extraction time per document.', LATENCY_BUCKETS),
+    'gemini_request_seconds': ('histogram', 'Gemini call latency; time to the first chunk for streamed calls.', LATENCY_BUCKETS),
+    'gemini_requests_total': ('counter', 'Gemini calls by outcome.', None),
+    'gemini_prompt_chars': ('histogram', 'Gemini prompt size in characters.', SIZE_BUCKETS),
+    'gemini_response_chars': ('histogram', 'Gemini response size in characters.', SIZE_BUCKETS),
+    'gemini_tokens_total': ('counter', 'Estimated Gemini tokens (about four characters per token).', None),
+    'gemini_cache_events_total': ('counter', 'Gemini response cache lookups and writes by event.', None),
+    'resume_write_seconds': ('histogram', 'Time to write a parsed resume graph.', LATENCY_BUCKETS),
+    'resume_write_queries': ('histogram', 'Queries issued to write a parsed resume graph.', QUERY_BUCKETS),
+    'storage_put_seconds': ('histogram', 'Time to write a file to storage.', LATENCY_BUCKETS),
+    'http_request_duration_seconds': ('histogram', 'Request latency per endpoint.', LATENCY_BUCKETS),
+}
+
+# Response content type of render()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+_lock = threading.Lock()
+_values: Dict[Key, object] = {}  # counter: float, histogram: [bucket counts..., sum, count]
+_pid = None
+_file_name = None
+_dirty = False
+
+
+def get_metrics_setting(name: str):
+    """Read a value from settings.METRICS, falling back to defaults."""
+    return getattr(settings, 'METRICS', {}).get(name, DEFAULT_SETTINGS[name])
+
+
+def get_metrics_dir() -> Path:
+    path = get_metrics_setting('DIR')
+    return Path(path) if path else Path(settings.BASE_DIR) / 'var' / 'metrics'
+
+
+def _check_process() -> None:
+    """Start from empty values (and a new file) in a forked child; called with _lock held."""
+    global _pid, _file_name, _dirty
+    if _pid == os.getpid():
+        return
+    _pid = os.getpid()
+    _file_name = f'{_pid}-{_process_start_time(_pid)}.json'
+    _values.clear()
+    _dirty = False
+    threading.Thread(target=_flush_loop, args=(_pid,), name='metrics-flush', daemon=True).start()
+
+
+def _key(name: str, labels: dict) -> Key:
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+def inc(name: str, amount: float = 1, **labels) -> None:
+    """Increase a counter."""
+    global _dirty
+    if not get_metrics_setting('ENABLED'):
+        return
+    key = _key(name, labels)
+    with _lock:
+        _check_process()
+        _values[key] = _values.get(key, 0) + amount
+        _dirty = True
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """Record one observation of a histogram."""
+    global _dirty
+    if not get_metrics_setting('ENABLED'):
+        return
+    buckets = METRICS[name][2]
+    key = _key(name, labels)
+    with _lock:
+        _check_process()
+        row = _values.get(key)
+        if row is None:
+            row = _values[key] = [0] * (len(buckets) + 2)
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                row[index] += 1
+                break
+        row[-2] += value
+        row[-1] += 1
+        _dirty = True
+
+
+@contextmanager
+def timer(name: str, **labels):
+    """Observe the duration of the block in seconds (also when it raises)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def observe_gemini_text(model: str, direction: str, text: str) -> None:
+    """Record the size and estimated tokens of a Gemini prompt or response."""
+    from .text_normalizer import estimate_tokens
+
+    observe(f'gemini_{direction}_chars', len(text), model=model)
+    inc('gemini_tokens_total', estimate_tokens(text), model=model, direction=direction)
+
+
+def _snapshot() -> list:
+    with _lock:
+        return [[name, dict(labels), value if isinstance(value, (int, float)) else list(value)]
+                for (name, labels), value in _values.items()]
+
+
+def _write_json(path: Path, data) -> None:
+    temporary = path.with_suffix('.tmp')
+    with open(temporary, 'w') as metrics_file:
+        json.dump(data, metrics_file)
+    os.replace(temporary, path)
+
+
+def flush() -> None:
+    """Write this process's values to its metrics file, if anything changed."""
+    global _dirty
+    with _lock:
+        if not _dirty or _pid != os.getpid():
+            return
+        _dirty = False
+        file_name = _file_name
+    try:
+        root = get_metrics_dir()
+        root.mkdir(parents=True, exist_ok=True)
+        _write_json(root / file_name, _snapshot())
+    except Exception as e:
+        logger.warning(f"Could not write metrics: {str(e)}")
+
+
+def _flush_loop(pid: int) -> None:
+    while pid == os.getpid():
+        time.sleep(get_metrics_setting('FLUSH_INTERVAL'))
+        flush()
+
+
+def _reset_lock_in_child() -> None:
+    """A fork can happen while another thread holds the lock; the child gets a fresh one."""
+    global _lock
+    _lock = threading.Lock()
+
+
+atexit.register(flush)
+os.register_at_fork(after_in_child=_reset_lock_in_child)
+
+
+def _process_start_time(pid: int) -> Optional[int]:
+    """
+    Start time of a process in clock ticks since boot, or None if it is not
+    running. Without /proc (not Linux) only the pid is checked and 0 returned.
+    """
+    try:
+        with open(f'/proc/{pid}/stat') as stat_file:
+            stat = stat_file.read()
+    except FileNotFoundError:
+        if os.path.isdir('/proc'):
+            return None
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return None
+        except PermissionError:
+            pass
+        return 0
+    # Fields after the command name, which may contain spaces; starttime is field 22
+    return int(stat.rsplit(')', 1)[1].split()[19])
+
+
+def _process_alive(pid: int, start_time: int) -> bool:
+    """True if the process that wrote a metrics file is still running."""
+    return _process_start_time(pid) == start_time
+
+
+def _merge(into: Dict[Key, object], samples: Iterable[list]) -> None:
+    for name, labels, value in samples:
+        if name not in METRICS:
+            continue
+        key = _key(name, labels)
+        if isinstance(value, list):
+            row = into.get(key)
+            if row is None or len(row) != len(value):
+                into[key] = list(value)
+            else:
+                into[key] = [mine + theirs for mine, theirs in zip(row, value)]
+        else:
+            into[key] = into.get(key, 0) + value
+
+
+def collect() -> Dict[Key, object]:
+    """
+    Merge the values of every process. Files of exited processes are folded
+    into archive.json (under a file lock, as several processes may scrape).
+    """
+    merged: Dict[Key, object] = {}
+    _merge(merged, _snapshot())
+    root = get_metrics_dir()
+    if not root.is_dir():
+        return merged
+
+    with open(root / '.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            archive_path = root / 'archive.json'
+            archive: Dict[Key, object] = {}
+            if archive_path.exists():
+                _merge(archive, json.loads(archive_path.read_text()))
+            archived = []
+            for path in root.glob('*-*.json'):
+                try:
+                    pid, start_time = (int(part) for part in path.stem.split('-'))
+                except ValueError:
+                    continue
+                if path.name == _file_name and pid == os.getpid():
+                    continue  # live values were merged above
+                try:
+                    samples = json.loads(path.read_text())
+                except (OSError, ValueError):
+                    continue
+                if _process_alive(pid, start_time):
+                    _merge(merged, samples)
+                else:
+                    _merge(archive, samples)
+                    archived.append(path)
+            if archived:
+                _write_json(archive_path, [[name, dict(labels), value] for (name, labels), value in archive.items()])
+                for path in archived:
+                    path.unlink()
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    _merge(merged, [[name, dict(labels), value] for (name, labels), value in archive.items()])
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels: Iterable[Tuple[str, str]]) -> str:
+    pairs = [f'{label}="{_escape(value)}"' for label, value in labels]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(values: Optional[Dict[Key, object]] = None) -> str:
+    """Metrics in the Prometheus text exposition format (version 0.0.4)."""
+    values = collect() if values is None else values
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        series = sorted((labels, value) for (metric, labels), value in values.items() if metric == name)
+        if not series:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in series:
+            if kind == 'counter':
+                lines.append(f'{name}{_labels(labels)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, value):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels + (("le", _number(bound)),))} {cumulative}')
+            lines.append(f'{name}_bucket{_labels(labels + (("le", "+Inf"),))} {value[-1]}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(value[-2])}')
+            lines.append(f'{name}_count{_labels(labels)} {value[-1]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,48 @@
+"""
+Request latency metrics per endpoint (see apply/metrics.py).
+"""
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from . import metrics
+
+
+class RequestMetricsMiddleware:
+    """
+    Observe http_request_duration_seconds for every request, labelled with
+    the URL name of the view (not the path, which would explode the number
+    of series). Supports both the WSGI and the ASGI (async) stack without
+    an adapter thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, started)
+        return response
+
+    def observe(self, request, response, started: float) -> None:
+        match = request.resolver_match
+        # view_name falls back to the view's dotted path for unnamed URL patterns
+        view = match.view_name if match else 'unmatched'
+        metrics.observe(
+            'http_request_duration_seconds', time.perf_counter() - started,
+            method=request.method, view=view, status=response.status_code,
+        )
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.9 on 2026-10-17 10:12
+
+from django.db import migrations, models
+
+
+def mark_existing_resumes_done(apps, schema_editor):
+    """Resumes uploaded before the queue existed were processed synchronously."""
+    Resume = apps.get_model('apply', 'Resume')
+    Resume.objects.update(status='done', attempts=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apply', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resume',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='resume',
+            name='locked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='resume',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('extracting', 'Extracting'), ('parsing', 'Parsing'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='queued', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='resume',
+            name='status_message',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='resume',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name='resume',
+            name='text_extracted',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(mark_existing_resumes_done, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-17 02:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apply', '0004_gemini_response_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resume',
+            name='extraction_score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='resume',
+            name='extractor',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+    ]
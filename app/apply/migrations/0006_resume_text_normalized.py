@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-17 02:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apply', '0005_resume_extractor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resume',
+            name='text_normalized',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='resume',
+            name='tokens_normalized',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='resume',
+            name='tokens_raw',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.9 on 2026-10-17 02:11
+
+from django.db import migrations, models
+
+
+def mark_processed_resumes_gemini(apps, schema_editor):
+    """Resumes processed before the local parser existed were all parsed by Gemini."""
+    Resume = apps.get_model('apply', 'Resume')
+    Resume.objects.filter(status='done').update(parse_source='gemini', parse_confidence=1.0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apply', '0006_resume_text_normalized'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resume',
+            name='parse_confidence',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='resume',
+            name='parse_source',
+            field=models.CharField(blank=True, choices=[('gemini', 'Gemini'), ('local', 'Local parser')], default='', max_length=20),
+        ),
+        migrations.RunPython(mark_processed_resumes_gemini, migrations.RunPython.noop),
+    ]
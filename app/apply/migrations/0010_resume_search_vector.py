@@ -0,0 +1,26 @@
+# Generated by Django 5.2.9 on 2026-10-17 02:20
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apply', '0009_resume_user_created_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resume',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='resume',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='resume_search_vector_idx'),
+        ),
+    ]
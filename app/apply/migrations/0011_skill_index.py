@@ -0,0 +1,101 @@
+# Generated by Django 5.2.9 on 2026-10-17 02:21
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Canonical name -> aliases seeded into the dictionary. The list and the key
+# normalization (apply.skill_index.skill_key when this migration was written)
+# are frozen here, so later changes to the app code do not change this migration.
+SEED_SKILLS = {
+    'JavaScript': ['js', 'javascript', 'ecmascript', 'es6'],
+    'TypeScript': ['ts', 'typescript'],
+    'Python': ['python', 'py'],
+    'Go': ['go', 'golang'],
+    'C++': ['c++', 'cpp'],
+    'C#': ['c#', 'csharp', 'c sharp'],
+    'Node.js': ['node', 'nodejs', 'node.js', 'node js'],
+    'React': ['react', 'reactjs', 'react.js'],
+    'Vue.js': ['vue', 'vuejs', 'vue.js'],
+    'Angular': ['angular', 'angularjs'],
+    'Django': ['django'],
+    'PostgreSQL': ['postgres', 'postgresql', 'psql'],
+    'MySQL': ['mysql'],
+    'MongoDB': ['mongo', 'mongodb'],
+    'Kubernetes': ['kubernetes', 'k8s'],
+    'Docker': ['docker'],
+    'AWS': ['aws', 'amazon web services'],
+    'Google Cloud': ['gcp', 'google cloud', 'google cloud platform'],
+    'Azure': ['azure', 'microsoft azure'],
+    'Machine Learning': ['machine learning', 'ml'],
+    'Artificial Intelligence': ['artificial intelligence', 'ai'],
+    'SQL': ['sql'],
+    'Git': ['git'],
+    'CI/CD': ['ci/cd', 'ci cd', 'cicd'],
+    'REST APIs': ['rest', 'rest api', 'rest apis', 'restful apis'],
+}
+
+
+def skill_key(name):
+    key = unicodedata.normalize('NFKC', name or '').lower()
+    return re.sub(r'\s+', ' ', key).strip(' .,;:-*')[:100]
+
+
+def seed_skills(apps, schema_editor):
+    """Load the seed canonical skills and aliases."""
+    CanonicalSkill = apps.get_model('apply', 'CanonicalSkill')
+    SkillAlias = apps.get_model('apply', 'SkillAlias')
+    CanonicalSkill.objects.bulk_create(
+        [CanonicalSkill(name=name, key=skill_key(name)) for name in SEED_SKILLS],
+        ignore_conflicts=True,
+    )
+    skill_ids = dict(CanonicalSkill.objects.filter(name__in=list(SEED_SKILLS)).values_list('name', 'id'))
+    SkillAlias.objects.bulk_create(
+        [
+            SkillAlias(key=skill_key(alias), skill_id=skill_ids[name])
+            for name, aliases in SEED_SKILLS.items() for alias in set(aliases + [name])
+        ],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apply', '0010_resume_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CanonicalSkill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SkillAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('skill', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='apply.canonicalskill')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResumeSkill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resume', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='skill_links', to='apply.resume')),
+                ('skill', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='resume_links', to='apply.canonicalskill')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('skill', 'resume'), name='resume_skill_posting')],
+            },
+        ),
+        migrations.RunPython(seed_skills, migrations.RunPython.noop),
+    ]
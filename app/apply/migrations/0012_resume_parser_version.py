@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-17 02:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apply', '0011_skill_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resume',
+            name='parser_version',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+    ]
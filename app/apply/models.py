@@ -1,11 +1,55 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.conf import settings
 
 class Resume(models.Model):
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        EXTRACTING = "extracting", "Extracting"
+        PARSING = "parsing", "Parsing"
+        DONE = "done", "Done"
+        FAILED = "failed", "Failed"
+
+    class ParseSource(models.TextChoices):
+        GEMINI = "gemini", "Gemini"
+        LOCAL = "local", "Local parser"  # offline fallback, see apply/section_segmenter.py
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     file = models.FileField(upload_to="resumes/")
     text_extracted = models.TextField(blank=True, default="")  # raw text extraction
+    text_normalized = models.TextField(blank=True, default="")  # cleaned text sent to Gemini
+    tokens_raw = models.PositiveIntegerField(null=True, blank=True)  # token estimate of text_extracted
+    tokens_normalized = models.PositiveIntegerField(null=True, blank=True)  # token estimate of text_normalized
+    extractor = models.CharField(max_length=50, blank=True, default="")  # extractor that produced text_extracted
+    extraction_score = models.FloatField(null=True, blank=True)  # text quality score of text_extracted
+    content_hash = models.CharField(max_length=64, blank=True, default="", db_index=True)  # sha256 of file bytes
+    parse_source = models.CharField(max_length=20, choices=ParseSource.choices, blank=True, default="")
+    parse_confidence = models.FloatField(null=True, blank=True)  # 1.0 for Gemini, lower for the local parser
+    parser_version = models.CharField(max_length=20, blank=True, default="")  # PARSER_VERSION of the parsed rows
+    search_vector = SearchVectorField(null=True, editable=False)  # PostgreSQL only, see apply/resume_search.py
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Processing queue state (see apply/resume_queue.py)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.QUEUED, db_index=True)
+    status_message = models.TextField(blank=True, default="")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    locked_at = models.DateTimeField(null=True, blank=True)  # set while a worker owns the row
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of a user's resumes (apply/pagination.py)
+            models.Index(fields=['user', 'created_at', 'id'], name='resume_user_created_idx'),
+            # Incremental refresh of the in-memory match index (apply/matching.py)
+            models.Index(fields=['updated_at'], name='resume_updated_idx'),
+            GinIndex(fields=['search_vector'], name='resume_search_vector_idx'),
+        ]
+
+    @property
+    def prompt_text(self):
+        """Text to send to Gemini: the normalized text, or the raw text for older rows."""
+        return self.text_normalized or self.text_extracted
 
 
 class Experience(models.Model):
@@ -54,4 +98,60 @@ class Project(models.Model):
     url = models.URLField(blank=True)
     technologies = models.TextField(blank=True)
     role = models.CharField(max_length=255, blank=True)
-    achievements = models.TextField(blank=True)
\ No newline at end of file
+    achievements = models.TextField(blank=True)
+
+class GeminiResponseCache(models.Model):
+    """Parsed Gemini responses keyed by normalized resume text, model and prompt version."""
+    key = models.CharField(max_length=64, unique=True)  # sha256, see apply/gemini_cache.py
+    model_name = models.CharField(max_length=100)
+    prompt_version = models.CharField(max_length=50, db_index=True)
+    response = models.JSONField()
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+
+class ResumeDeletion(models.Model):
+    """Tombstone of a deleted resume, read by the in-process indexes to drop it (see apply/matching.py)."""
+    resume_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+class ResumeEvent(models.Model):
+    """Processing progress of a resume, streamed to clients (see apply/resume_events.py)."""
+    class Kind(models.TextChoices):
+        STATUS = "status", "Status"
+        ITEM = "item", "Item"  # one parsed experience/education/skill/...
+
+    resume = models.ForeignKey(Resume, related_name="events", on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+class CanonicalSkill(models.Model):
+    """Skill dictionary entry that free-text skill names map to (see apply/skill_index.py)."""
+    name = models.CharField(max_length=100)
+    key = models.CharField(max_length=100, unique=True)  # normalized name
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class SkillAlias(models.Model):
+    """Normalized spelling of a skill ("k8s", "python3") and the canonical skill it means."""
+    key = models.CharField(max_length=100, unique=True)
+    skill = models.ForeignKey(CanonicalSkill, related_name="aliases", on_delete=models.CASCADE)
+
+
+class ResumeSkill(models.Model):
+    """Inverted index entry: the (skill, resume) unique index is the posting list of a skill."""
+    skill = models.ForeignKey(CanonicalSkill, related_name="resume_links", on_delete=models.CASCADE, db_index=False)
+    resume = models.ForeignKey(Resume, related_name="skill_links", on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['skill', 'resume'], name='resume_skill_posting'),
+        ]
@@ -0,0 +1,150 @@
+"""
+Keyset pagination for resume listings.
+
+Pages are ordered by (created_at, id), newest first, and the cursor holds
+the (created_at, id) of the last row served. Every page is a range scan
+on the Resume(user, created_at, id) index, so deep pages cost the same as
+the first one, unlike OFFSET pagination.
+"""
+import base64
+import binascii
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+# Cursor: (created_at, id, reverse) where reverse means "the page before this row"
+Cursor = Tuple[datetime, int, bool]
+
+
+def encode_cursor(created_at, pk: int, reverse: bool = False) -> str:
+    raw = f"{created_at.isoformat()}|{pk}|{int(reverse)}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(value: str) -> Optional[Cursor]:
+    """Decode a cursor query parameter, or return None if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode()
+        created_at, pk, reverse = raw.split('|')
+        created_at = parse_datetime(created_at)
+        if created_at is None:
+            return None
+        return created_at, int(pk), reverse == '1'
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def keyset_page(queryset: QuerySet, cursor: Optional[Cursor], page_size: int) -> Tuple[list, bool]:
+    """
+    Fetch one page of a queryset after (or before) a cursor.
+
+    Args:
+        queryset: Unordered queryset to page through
+        cursor: Decoded cursor, or None for the first page
+        page_size: Rows per page
+
+    Returns:
+        (rows newest first, whether more rows exist in the paging direction)
+    """
+    reverse = bool(cursor and cursor[2])
+    if cursor:
+        created_at, pk, _reverse = cursor
+        # The created_at bound outside the OR (redundant for the result) lets the
+        # planner use it as the index range condition instead of a filter
+        if reverse:
+            queryset = queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk),
+                created_at__gte=created_at,
+            )
+        else:
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk),
+                created_at__lte=created_at,
+            )
+    ordering = ('created_at', 'id') if reverse else ('-created_at', '-id')
+    rows = list(queryset.order_by(*ordering)[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if reverse:
+        rows.reverse()
+    return rows, has_more
+
+
+class ResumeKeysetPagination(BasePagination):
+    """
+    Cursor pagination over (created_at, id), newest first.
+
+    Responses look like DRF's CursorPagination: ``next``, ``previous`` and
+    ``results``. The page size can be lowered or raised (up to
+    max_page_size) with ``?page_size=``.
+    """
+    cursor_query_param = 'cursor'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_page_size(self, request) -> int:
+        try:
+            requested = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(requested, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None) -> List:
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        raw_cursor = request.query_params.get(self.cursor_query_param)
+        cursor = decode_cursor(raw_cursor) if raw_cursor else None
+        if raw_cursor and cursor is None:
+            raise NotFound('Invalid cursor')
+
+        rows, has_more = keyset_page(queryset, cursor, self.get_page_size(request))
+        reverse = bool(cursor and cursor[2])
+        # Going forward there is a previous page whenever we started from a cursor,
+        # going backward there is a next page for the same reason
+        self.has_next = has_more if not reverse else True
+        self.has_previous = has_more if reverse else cursor is not None
+        self.page = rows
+        return rows
+
+    def _link(self, row, reverse: bool) -> str:
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encode_cursor(row.created_at, row.pk, reverse)
+        )
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self) -> Optional[str]:
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self._link(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,107 @@
+"""
+Per-resume progress events.
+
+Workers and the inline upload path record events in the ResumeEvent table;
+the events endpoint (apply/views.py) streams them to the client as
+server-sent events. The table works across processes, so the web server
+sees events written by the resume worker.
+"""
+import logging
+from datetime import timedelta
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'STREAM_GEMINI': True,
+    'RETENTION_SECONDS': 60 * 60,
+    'POLL_INTERVAL_SECONDS': 0.5,
+    'KEEPALIVE_SECONDS': 15,
+    'STREAM_TIMEOUT_SECONDS': 300,
+}
+
+TERMINAL_STATUSES = (models.Resume.Status.DONE, models.Resume.Status.FAILED)
+
+
+def get_events_setting(name: str):
+    """Read a value from settings.RESUME_EVENTS, falling back to defaults."""
+    return getattr(settings, 'RESUME_EVENTS', {}).get(name, DEFAULT_SETTINGS[name])
+
+
+def publish_event(resume_id: int, kind: str, data: Optional[dict] = None) -> None:
+    """
+    Record a progress event for a resume.
+    Failures are logged and swallowed: progress reporting must never break processing.
+    The insert runs in its own savepoint, so a failure inside a caller's
+    transaction rolls back only the event and the transaction stays usable.
+
+    Args:
+        resume_id: Resume id
+        kind: One of ResumeEvent.Kind
+        data: JSON-serializable payload
+    """
+    try:
+        with transaction.atomic():
+            models.ResumeEvent.objects.create(resume_id=resume_id, kind=kind, data=data or {})
+    except Exception as e:
+        logger.error(f"Error publishing {kind} event for resume {resume_id}: {str(e)}")
+
+
+def status_data(resume: models.Resume) -> dict:
+    return {'status': resume.status, 'status_message': resume.status_message}
+
+
+def publish_status(resume: models.Resume) -> None:
+    """Record the current status of a resume."""
+    publish_event(resume.id, models.ResumeEvent.Kind.STATUS, status_data(resume))
+
+
+async def apublish_status(resume: models.Resume) -> None:
+    """Async variant of publish_status."""
+    try:
+        await models.ResumeEvent.objects.acreate(
+            resume_id=resume.id, kind=models.ResumeEvent.Kind.STATUS, data=status_data(resume)
+        )
+    except Exception as e:
+        logger.error(f"Error publishing status event for resume {resume.id}: {str(e)}")
+
+
+def publish_statuses(resumes: List[models.Resume]) -> None:
+    """Record the current status of several resumes with one insert."""
+    try:
+        with transaction.atomic():
+            models.ResumeEvent.objects.bulk_create([
+                models.ResumeEvent(resume_id=resume.id, kind=models.ResumeEvent.Kind.STATUS, data=status_data(resume))
+                for resume in resumes
+            ])
+    except Exception as e:
+        logger.error(f"Error publishing status events for {len(resumes)} resumes: {str(e)}")
+
+
+def publish_item(resume_id: int, section: str, item) -> None:
+    """Record one parsed item (experience, education, skill, ...)."""
+    publish_event(resume_id, models.ResumeEvent.Kind.ITEM, {'section': section, 'item': item})
+
+
+def is_terminal_event(event: models.ResumeEvent) -> bool:
+    return event.kind == models.ResumeEvent.Kind.STATUS and event.data.get('status') in TERMINAL_STATUSES
+
+
+def prune_events() -> int:
+    """
+    Delete events older than RETENTION_SECONDS.
+
+    Returns:
+        Number of deleted events
+    """
+    cutoff = timezone.now() - timedelta(seconds=get_events_setting('RETENTION_SECONDS'))
+    deleted, _ = models.ResumeEvent.objects.filter(created_at__lt=cutoff).delete()
+    if deleted:
+        logger.info(f"Pruned {deleted} resume events")
+    return deleted
@@ -0,0 +1,408 @@
+"""
+Bulk import of historical resumes from a directory or a zip archive.
+
+Used by ``manage.py import_resumes``. Documents go through four stages,
+one batch at a time:
+
+    extract  text extraction and normalization in a process pool
+    parse    batched Gemini prompts, several batches in flight at once
+             (local parser fallback), alongside
+    upload   storage (R2) writes in the storage thread pool
+    write    one transaction per batch: bulk insert of the resumes, COPY
+             of the parsed rows on PostgreSQL, search and skill indexes
+
+Progress is checkpointed in a JSON lines file after every committed batch,
+so an interrupted import resumes where it stopped.
+"""
+import io
+import json
+import logging
+import os
+import time
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set
+
+from django.core.files.base import ContentFile, File
+from django.db import connection, transaction
+
+from . import models, semantic_index
+from .direct_upload import ALLOWED_TYPES
+from .gemini_batch import get_batch_setting, parse_resumes_with_gemini
+from .resume_parser import PARSER_VERSION, parse_locally
+from .resume_search import update_search_vectors
+from .resume_writer import SECTIONS, ResumeGraphWriter
+from .skill_index import link_resume_skills
+from .text_normalizer import normalize_resume_text
+from .utils import SharedBuffer, extract_document
+
+logger = logging.getLogger(__name__)
+
+Status = models.Resume.Status
+
+
+@dataclass
+class ExtractedDocument:
+    """Result of the extract stage for one source file (picklable, crosses process boundaries)."""
+    path: str
+    content_hash: str = ''
+    text_extracted: str = ''
+    text_normalized: str = ''
+    tokens_raw: Optional[int] = None
+    tokens_normalized: Optional[int] = None
+    extractor: str = ''
+    extraction_score: Optional[float] = None
+    error: str = ''
+
+    @property
+    def prompt_text(self) -> str:
+        return self.text_normalized or self.text_extracted
+
+
+@dataclass
+class StageStats:
+    """Documents and wall-clock seconds spent per stage."""
+    documents: Dict[str, int] = field(default_factory=dict)
+    seconds: Dict[str, float] = field(default_factory=dict)
+
+    def add(self, stage: str, documents: int, seconds: float) -> None:
+        self.documents[stage] = self.documents.get(stage, 0) + documents
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def rates(self) -> Dict[str, float]:
+        """Documents per second of every stage."""
+        return {
+            stage: self.documents[stage] / seconds if seconds else 0.0
+            for stage, seconds in self.seconds.items()
+        }
+
+
+class ImportSource:
+    """Resume files of a directory (recursive) or a zip archive, by relative path."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.is_zip = zipfile.is_zipfile(path) if os.path.isfile(path) else False
+        if not self.is_zip and not os.path.isdir(path):
+            raise ValueError(f"{path} is neither a directory nor a zip archive")
+        self._zip = None
+
+    def list_files(self) -> List[str]:
+        if self.is_zip:
+            with zipfile.ZipFile(self.path) as archive:
+                names = [info.filename for info in archive.infolist() if not info.is_dir()]
+        else:
+            names = [
+                os.path.relpath(os.path.join(root, name), self.path)
+                for root, _dirs, files in os.walk(self.path) for name in files
+            ]
+        return sorted(name for name in names if os.path.splitext(name.lower())[1] in ALLOWED_TYPES)
+
+    def open(self, name: str):
+        """Binary file object of one source file (read it before opening the next zip member)."""
+        if self.is_zip:
+            if self._zip is None:
+                self._zip = zipfile.ZipFile(self.path)
+            return ContentFile(self._zip.read(name), name=os.path.basename(name))
+        return open(os.path.join(self.path, name), 'rb')
+
+
+# Source opened by an extraction process, kept for the following files
+_worker_source: Optional[ImportSource] = None
+
+
+def extract_file(source_path: str, name: str) -> ExtractedDocument:
+    """
+    Extract stage for one file. Runs in a pool process started with
+    django.setup as its initializer.
+    """
+    global _worker_source
+    if _worker_source is None or _worker_source.path != source_path:
+        _worker_source = ImportSource(source_path)
+    try:
+        with _worker_source.open(name) as source_file, SharedBuffer(source_file) as buffer:
+            reader = buffer.open()
+            reader.name = name
+            extraction = extract_document(reader)
+            content_hash = buffer.sha256()
+        normalization = normalize_resume_text(extraction.text)
+    except Exception as e:
+        return ExtractedDocument(path=name, error=f"Could not read file: {str(e)}")
+    if not extraction.text or not extraction.text.strip():
+        return ExtractedDocument(path=name, content_hash=content_hash, error="No text could be extracted from the file")
+    return ExtractedDocument(
+        path=name,
+        content_hash=content_hash,
+        text_extracted=extraction.text,
+        text_normalized=normalization.text,
+        tokens_raw=normalization.tokens_before,
+        tokens_normalized=normalization.tokens_after,
+        extractor=extraction.extractor,
+        extraction_score=extraction.score,
+    )
+
+
+def parse_documents(documents: List[ExtractedDocument], concurrency: int) -> Dict[str, tuple]:
+    """
+    Parse stage: batched Gemini prompts with at most ``concurrency`` calls in
+    flight, falling back to the local parser for documents Gemini could not parse.
+
+    Returns:
+        Mapping of path to (parsed data or None, parse source, confidence)
+    """
+    group_size = get_batch_setting('MAX_DOCUMENTS')
+    groups = [documents[start:start + group_size] for start in range(0, len(documents), group_size)]
+
+    def parse_group(group):
+        return parse_resumes_with_gemini({document.path: document.prompt_text for document in group})
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='import-gemini') as executor:
+        for parsed in executor.map(parse_group, groups):
+            results.update(parsed)
+
+    parse_results = {}
+    for document in documents:
+        parsed_data = results.get(document.path)
+        if parsed_data:
+            parse_results[document.path] = (parsed_data, models.Resume.ParseSource.GEMINI, 1.0)
+            continue
+        parsed_data = parse_locally(document.prompt_text)
+        confidence = parsed_data['confidence'] if parsed_data else None
+        parse_results[document.path] = (parsed_data, models.Resume.ParseSource.LOCAL, confidence)
+    return parse_results
+
+
+def upload_documents(source: ImportSource, paths: Iterable[str], executor: ThreadPoolExecutor) -> Dict[str, object]:
+    """
+    Upload stage: start the storage writes, returning a future per path.
+    Each future's result is (storage name, time.monotonic() when the write finished),
+    so the stage can be timed apart from the parse stage it overlaps with.
+    """
+    from .resume_queue import save_to_storage
+    storage_field = models.Resume._meta.get_field('file')
+
+    def upload(path):
+        with source.open(path) as source_file:
+            name = storage_field.generate_filename(None, os.path.basename(path))
+            return save_to_storage(name, File(source_file, name=name)), time.monotonic()
+
+    return {path: executor.submit(upload, path) for path in paths}
+
+
+def _copy_value(value) -> str:
+    """A value in PostgreSQL's COPY text format."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return (
+        str(value).replace('\\', '\\\\').replace('\t', '\\t')
+        .replace('\n', '\\n').replace('\r', '\\r')
+    )
+
+
+def copy_rows(model, rows: List[dict]) -> int:
+    """
+    Insert many rows of a model: COPY FROM STDIN on PostgreSQL, bulk_create elsewhere.
+
+    Args:
+        model: Model class
+        rows: Field values by attribute name (e.g. resume_id), without the primary key;
+            missing fields get their defaults
+
+    Returns:
+        Number of inserted rows
+    """
+    if not rows:
+        return 0
+    if connection.vendor != 'postgresql':
+        model.objects.bulk_create([model(**row) for row in rows], batch_size=1000)
+        return len(rows)
+
+    fields = [model_field for model_field in model._meta.concrete_fields if not model_field.primary_key]
+    buffer = io.StringIO()
+    for row in rows:
+        instance = model(**row)  # applies field defaults
+        buffer.write('\t'.join(_copy_value(getattr(instance, model_field.attname)) for model_field in fields))
+        buffer.write('\n')
+    buffer.seek(0)
+    columns = ', '.join(connection.ops.quote_name(model_field.column) for model_field in fields)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {connection.ops.quote_name(model._meta.db_table)} ({columns}) FROM STDIN", buffer)
+    return len(rows)
+
+
+def write_documents(user, documents: List[ExtractedDocument], parse_results: Dict[str, tuple], file_names: Dict[str, str]) -> Dict[str, models.Resume]:
+    """
+    Write stage: insert the resumes and their parsed rows in one transaction.
+
+    Resumes that could not be parsed are stored with their text and queued
+    for the resume worker.
+
+    Returns:
+        Mapping of path to the created resume
+    """
+    resumes = {}
+    for document in documents:
+        parsed_data, source, confidence = parse_results[document.path]
+        resumes[document.path] = models.Resume(
+            user=user,
+            file=file_names[document.path],
+            content_hash=document.content_hash,
+            text_extracted=document.text_extracted,
+            text_normalized=document.text_normalized,
+            tokens_raw=document.tokens_raw,
+            tokens_normalized=document.tokens_normalized,
+            extractor=document.extractor,
+            extraction_score=document.extraction_score,
+            parse_source=source if parsed_data else '',
+            parse_confidence=confidence if parsed_data else None,
+            parser_version=PARSER_VERSION if parsed_data else '',
+            status=Status.DONE if parsed_data else Status.QUEUED,
+            status_message='' if parsed_data else 'Imported, parsing failed',
+            attempts=1 if parsed_data else 0,
+        )
+
+    with transaction.atomic():
+        models.Resume.objects.bulk_create(resumes.values(), batch_size=1000)
+        section_rows = {section: [] for section in SECTIONS}
+        builder = ResumeGraphWriter(None)
+        for path, resume in resumes.items():
+            parsed_data = parse_results[path][0]
+            if not parsed_data:
+                continue
+            for section, rows in builder.build_rows(parsed_data).items():
+                section_rows[section] += [dict(row, resume_id=resume.id) for row in rows]
+        for section, (model, _builder, _required) in SECTIONS.items():
+            copy_rows(model, section_rows[section])
+
+        done = [resume for resume in resumes.values() if resume.status == Status.DONE]
+        update_search_vectors(models.Resume.objects.filter(id__in=[resume.id for resume in done]))
+        skill_names = defaultdict(list)
+        for row in section_rows['skills']:
+            skill_names[row['resume_id']].append(row['name'])
+        link_resume_skills(skill_names)
+
+    try:
+        semantic_index.append_vectors(semantic_index.embed_resumes([resume.id for resume in done]))
+    except Exception as e:
+        logger.warning(f"Could not add imported resumes to the semantic index: {str(e)}")
+    return resumes
+
+
+
+class Checkpoint:
+    """
+    Append-only JSON lines record of the imported files, written after every
+    committed batch. Files committed but not yet recorded when a run is killed
+    are recognised by content hash on the next run.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Dict[str, dict]:
+        """Recorded entries by path; cuts off a torn last line so appends start on a fresh line."""
+        entries = {}
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path, 'rb+') as checkpoint_file:
+            complete = 0
+            for line in checkpoint_file:
+                if not line.endswith(b'\n'):
+                    break
+                complete += len(line)
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                entries[entry['path']] = entry
+            checkpoint_file.truncate(complete)
+        return entries
+
+    def record(self, entries: List[dict]) -> None:
+        with open(self.path, 'a') as checkpoint_file:
+            for entry in entries:
+                checkpoint_file.write(json.dumps(entry) + '\n')
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+
+
+def existing_hashes(user, content_hashes: Set[str]) -> Dict[str, int]:
+    """Resume id per content hash the user already has (re-runs and repeated files)."""
+    rows = models.Resume.objects.filter(user=user, content_hash__in=content_hashes).values_list('content_hash', 'id')
+    return dict(rows)
+
+
+def import_batch(source: ImportSource, user, paths: List[str], pool, concurrency: int, stats: StageStats) -> List[dict]:
+    """
+    Run one batch of files through every stage.
+
+    Args:
+        source: Files to import
+        user: Owner of the imported resumes
+        paths: Paths of this batch
+        pool: Process pool for the extract stage
+        concurrency: Gemini calls in flight
+        stats: Per-stage counters, updated in place
+
+    Returns:
+        Checkpoint entries ({'path', 'status', 'resume', 'error'}) for every path
+    """
+    entries = []
+
+    started = time.monotonic()
+    documents = list(pool.map(extract_file, [source.path] * len(paths), paths))
+    stats.add('extract', len(paths), time.monotonic() - started)
+
+    known = existing_hashes(user, {document.content_hash for document in documents if document.content_hash})
+    new = []
+    for document in documents:
+        if document.error:
+            entries.append({'path': document.path, 'status': 'failed', 'error': document.error})
+        elif document.content_hash in known:
+            entries.append({'path': document.path, 'status': 'duplicate', 'resume': known[document.content_hash]})
+        else:
+            known[document.content_hash] = None  # repeated within the batch
+            new.append(document)
+    if not new:
+        return entries
+
+    from .resume_queue import get_storage_executor
+    started = time.monotonic()
+    uploads = upload_documents(source, [document.path for document in new], get_storage_executor())
+    parse_results = parse_documents(new, concurrency)
+    stats.add('parse', len(new), time.monotonic() - started)
+
+    # Uploads run alongside parsing: the stage lasts until the last write finished
+    file_names = {}
+    upload_finished = started
+    for document in new:
+        try:
+            file_names[document.path], finished = uploads[document.path].result()
+        except Exception as e:
+            logger.error(f"Could not store {document.path}: {str(e)}")
+            entries.append({'path': document.path, 'status': 'failed', 'error': f"Could not store file: {str(e)}"})
+            continue
+        upload_finished = max(upload_finished, finished)
+    stats.add('upload', len(new), upload_finished - started)
+    new = [document for document in new if document.path in file_names]
+
+    started = time.monotonic()
+    try:
+        resumes = write_documents(user, new, parse_results, file_names)
+    except Exception:
+        storage = models.Resume._meta.get_field('file').storage
+        for name in file_names.values():
+            storage.delete(name)
+        raise
+    stats.add('write', len(new), time.monotonic() - started)
+
+    for path, resume in resumes.items():
+        entries.append({'path': path, 'status': 'done' if resume.status == Status.DONE else 'queued', 'resume': resume.id})
+    return entries
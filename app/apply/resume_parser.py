@@ -2,111 +2,145 @@
 Service to populate resume-related models from Gemini parsed data.
 """
 import logging
+from typing import Optional, Tuple
+from asgiref.sync import sync_to_async
 from django.db import transaction
-from . import models
-from .gemini_service import parse_resume_with_gemini, parse_date
+from . import matching, models, semantic_index
+from .gemini_service import PROMPT_VERSION, aparse_resume_with_gemini, parse_resume_with_gemini
+from .gemini_stream import ItemCallback, stream_resume_with_gemini
+from .resume_events import get_events_setting, publish_item
+from .resume_search import update_search_vector
+from .skill_index import sync_resume_skills
+from .resume_writer import MAPPING_VERSION, MODE_APPEND, MODE_REPLACE, SECTIONS, ResumeGraphWriter
+from .section_segmenter import Segmentation, parse_resume_locally, segment_resume
 
 logger = logging.getLogger(__name__)
 
+# Stamped on every parsed resume; resumes with another version are re-parsed
+# by manage.py reparse_resumes
+PARSER_VERSION = f"{PROMPT_VERSION}.{MAPPING_VERSION}"
 
-def populate_resume_data(resume: models.Resume, parsed_data: dict) -> bool:
+
+def populate_resume_data(resume: models.Resume, parsed_data: dict, mode: str = MODE_REPLACE) -> bool:
     """
     Populate all related models from parsed Gemini data.
+    Rows are written with one bulk insert per model; in replace mode the
+    existing rows are diffed so processing the same data twice is a no-op.
     
     Args:
         resume: Resume instance
         parsed_data: Dictionary with parsed data from Gemini
+        mode: MODE_REPLACE (default) or MODE_APPEND
         
     Returns:
         True if successful, False otherwise
     """
     try:
-        with transaction.atomic():
-            # Populate Experiences
-            if parsed_data.get('experiences'):
-                for exp_data in parsed_data['experiences']:
-                    models.Experience.objects.create(
-                        resume=resume,
-                        title=exp_data.get('title', ''),
-                        company=exp_data.get('company', ''),
-                        start_date=parse_date(exp_data.get('start_date')),
-                        end_date=parse_date(exp_data.get('end_date')),
-                        description=exp_data.get('description', ''),
-                        achievements=exp_data.get('achievements', '')
-                    )
-                logger.info(f"Created {len(parsed_data['experiences'])} experiences")
-            
-            # Populate Educations
-            if parsed_data.get('educations'):
-                for edu_data in parsed_data['educations']:
-                    models.Education.objects.create(
-                        resume=resume,
-                        institution=edu_data.get('institution', ''),
-                        degree=edu_data.get('degree', ''),
-                        start_date=parse_date(edu_data.get('start_date')),
-                        end_date=parse_date(edu_data.get('end_date')),
-                        description=edu_data.get('description', '')
-                    )
-                logger.info(f"Created {len(parsed_data['educations'])} educations")
-            
-            # Populate Skills
-            if parsed_data.get('skills'):
-                for skill_name in parsed_data['skills']:
-                    if skill_name and skill_name.strip():
-                        models.Skill.objects.create(
-                            resume=resume,
-                            name=skill_name.strip()
-                        )
-                logger.info(f"Created {len(parsed_data['skills'])} skills")
-            
-            # Populate Languages
-            if parsed_data.get('languages'):
-                for lang_data in parsed_data['languages']:
-                    models.LanguageProficiency.objects.create(
-                        resume=resume,
-                        language=lang_data.get('language', ''),
-                        level=lang_data.get('level', '')
-                    )
-                logger.info(f"Created {len(parsed_data['languages'])} languages")
-            
-            # Populate Certifications
-            if parsed_data.get('certifications'):
-                for cert_data in parsed_data['certifications']:
-                    models.Certification.objects.create(
-                        resume=resume,
-                        name=cert_data.get('name', ''),
-                        issuer=cert_data.get('issuer', ''),
-                        date_obtained=parse_date(cert_data.get('date_obtained'))
-                    )
-                logger.info(f"Created {len(parsed_data['certifications'])} certifications")
-            
-            # Populate Projects
-            if parsed_data.get('projects'):
-                for proj_data in parsed_data['projects']:
-                    models.Project.objects.create(
-                        resume=resume,
-                        name=proj_data.get('name', ''),
-                        description=proj_data.get('description', ''),
-                        start_date=parse_date(proj_data.get('start_date')),
-                        end_date=parse_date(proj_data.get('end_date')),
-                        url=proj_data.get('url', ''),
-                        technologies=proj_data.get('technologies', ''),
-                        role=proj_data.get('role', ''),
-                        achievements=proj_data.get('achievements', '')
-                    )
-                logger.info(f"Created {len(parsed_data['projects'])} projects")
-            
-            logger.info(f"Successfully populated all data for resume {resume.id}")
-            return True
-            
+        result = ResumeGraphWriter(resume).write(parsed_data, mode=mode)
     except Exception as e:
         logger.error(f"Error populating resume data: {str(e)}")
         return False
 
+    logger.info(
+        f"Successfully populated all data for resume {resume.id}: "
+        f"created {result.created}, deleted {result.deleted}, "
+        f"{result.rows_written} rows written in {result.queries} queries"
+    )
+    return True
+
+
+def parse_locally(text: str, segmentation: Optional[Segmentation] = None) -> Optional[dict]:
+    """
+    Parse a resume with the local rule-based parser.
+
+    Returns:
+        Parsed data with a 'confidence' key, or None if no section produced any rows
+    """
+    parsed_data = parse_resume_locally(text, segmentation)
+    if not any(parsed_data.get(section) for section in SECTIONS):
+        return None
+    return parsed_data
+
+
+def parse_resume_text(text: str, on_item: Optional[ItemCallback] = None) -> Tuple[Optional[dict], str, Optional[float]]:
+    """
+    Parse resume text, preferring Gemini and falling back to the local parser.
+
+    When the text segments cleanly, sections that never hold parsed data
+    (hobbies, references) are left out of the prompt. Gemini is always asked
+    for every section, since the segmenter can miss headings it does not know.
+
+    Args:
+        text: Resume text (normalized when available)
+        on_item: Optional callback; when given (and STREAM_GEMINI is on) the
+            Gemini response is streamed and every completed item is passed to it
+
+    Returns:
+        (parsed data or None, parse source, confidence)
+    """
+    segmentation, prompt_text = _gemini_request(text)
+    if on_item is not None and get_events_setting('STREAM_GEMINI'):
+        parsed_data = stream_resume_with_gemini(prompt_text, on_item)
+    else:
+        parsed_data = parse_resume_with_gemini(prompt_text)
+    return _parse_result(text, segmentation, parsed_data)
+
+
+async def aparse_resume_text(text: str) -> Tuple[Optional[dict], str, Optional[float]]:
+    """Async variant of parse_resume_text (no streaming)."""
+    segmentation, prompt_text = _gemini_request(text)
+    parsed_data = await aparse_resume_with_gemini(prompt_text)
+    return _parse_result(text, segmentation, parsed_data)
+
+
+def _gemini_request(text: str) -> Tuple[Segmentation, str]:
+    """Segment the text and pick the Gemini prompt text."""
+    segmentation = segment_resume(text)
+    if segmentation.is_confident:
+        return segmentation, segmentation.prompt_text()
+    return segmentation, text
+
+
+def _parse_result(text: str, segmentation: Segmentation, parsed_data: Optional[dict]):
+    if parsed_data:
+        return parsed_data, models.Resume.ParseSource.GEMINI, 1.0
+
+    parsed_data = parse_locally(text, segmentation)
+    if parsed_data:
+        logger.info(f"Gemini unavailable, using local parse (confidence {parsed_data['confidence']})")
+        return parsed_data, models.Resume.ParseSource.LOCAL, parsed_data['confidence']
+    return None, "", None
+
+
+def index_parsed_resume(resume: models.Resume) -> None:
+    """Add a freshly parsed resume to the match and semantic indexes."""
+    matching.index_resume(resume)
+    semantic_index.index_resume(resume)
+
+
+def save_parse_result(resume: models.Resume, parsed_data: dict, source: str, confidence: Optional[float]) -> bool:
+    """
+    Populate the related models and record where the data came from.
+
+    Returns:
+        True if successful, False otherwise
+    """
+    if not populate_resume_data(resume, parsed_data):
+        return False
+    resume.parse_source = source
+    resume.parse_confidence = confidence
+    resume.parser_version = PARSER_VERSION
+    resume.save(update_fields=['parse_source', 'parse_confidence', 'parser_version', 'updated_at'])
+    index_parsed_resume(resume)
+    return True
+
 
 def process_resume_with_gemini(resume: models.Resume) -> bool:
     """
     Complete workflow: Send text to Gemini, parse response, and populate models.
+    The response is streamed: each completed item is written right away and
+    published as a progress event. If Gemini is unavailable the local parser
+    fills in the models instead, recorded with a lower parse_confidence.
     
     Args:
         resume: Resume instance with text_extracted field populated
@@ -118,13 +152,148 @@ def process_resume_with_gemini(resume: models.Resume) -> bool:
         logger.warning(f"Resume {resume.id} has no extracted text, skipping Gemini processing")
         return False
     
-    # Parse with Gemini
-    parsed_data = parse_resume_with_gemini(resume.text_extracted)
+    # Streamed items are written and published as they complete
+    writer = ResumeGraphWriter(resume)
+
+    def on_item(section, item):
+        # Search vector and skill index are rebuilt once by the final write
+        writer.write({section: [item]}, mode=MODE_APPEND, update_indexes=False)
+        publish_item(resume.id, section, item)
+
+    # Parse with Gemini (normalized text keeps the prompt small)
+    parsed_data, source, confidence = parse_resume_text(resume.prompt_text, on_item=on_item)
     
     if not parsed_data:
-        logger.warning(f"Failed to parse resume {resume.id} with Gemini")
+        logger.warning(f"Failed to parse resume {resume.id} with Gemini or the local parser")
         return False
     
-    # Populate models
-    return populate_resume_data(resume, parsed_data)
+    # Populate models; replace mode keeps the streamed rows and drops stale ones
+    return save_parse_result(resume, parsed_data, source, confidence)
+
 
+async def aprocess_resume_with_gemini(resume: models.Resume) -> bool:
+    """
+    Async variant of process_resume_with_gemini: awaits Gemini without
+    holding a thread and writes the rows in one sync_to_async call.
+
+    Args:
+        resume: Resume instance with text_extracted field populated
+
+    Returns:
+        True if successful, False otherwise
+    """
+    if not resume.text_extracted or not resume.text_extracted.strip():
+        logger.warning(f"Resume {resume.id} has no extracted text, skipping Gemini processing")
+        return False
+
+    parsed_data, source, confidence = await aparse_resume_text(resume.prompt_text)
+    if not parsed_data:
+        logger.warning(f"Failed to parse resume {resume.id} with Gemini or the local parser")
+        return False
+    return await sync_to_async(save_parse_result)(resume, parsed_data, source, confidence)
+
+
+def find_processed_duplicate(content_hash: str, user_id: int, exclude_id: Optional[int] = None) -> Optional[models.Resume]:
+    """
+    Find an already processed resume the same user uploaded with the same file content.
+
+    Duplicates are only looked up among the user's own resumes: reusing another
+    user's stored object would tie the two uploads' files together, and the
+    parsed rows would reveal that someone else uploaded the same document.
+
+    Args:
+        content_hash: SHA-256 digest of the file bytes
+        user_id: Owner of the upload
+        exclude_id: Resume id to ignore (usually the resume being processed)
+
+    Returns:
+        The oldest matching resume in the done state, or None
+    """
+    if not content_hash:
+        return None
+    duplicates = models.Resume.objects.filter(
+        user_id=user_id,
+        content_hash=content_hash,
+        status=models.Resume.Status.DONE,
+    )
+    if exclude_id is not None:
+        duplicates = duplicates.exclude(id=exclude_id)
+    return duplicates.order_by('created_at', 'id').first()
+
+
+def _stored_copies(content_hash: str, user_id: int):
+    return models.Resume.objects.filter(user_id=user_id, content_hash=content_hash).exclude(file='').order_by('id')
+
+
+def find_stored_copy(content_hash: str, user_id: int) -> Optional[models.Resume]:
+    """
+    Find an earlier upload of the user with the same file content whose stored file can be reused.
+
+    Returns:
+        A processed duplicate if there is one, otherwise the oldest upload
+        with a stored file, or None
+    """
+    if not content_hash:
+        return None
+    return find_processed_duplicate(content_hash, user_id) or _stored_copies(content_hash, user_id).first()
+
+
+async def afind_stored_copy(content_hash: str, user_id: int) -> Optional[models.Resume]:
+    """Async variant of find_stored_copy."""
+    if not content_hash:
+        return None
+    processed = await models.Resume.objects.filter(
+        user_id=user_id,
+        content_hash=content_hash,
+        status=models.Resume.Status.DONE,
+    ).order_by('created_at', 'id').afirst()
+    return processed or await _stored_copies(content_hash, user_id).afirst()
+
+
+def clone_resume_data(source: models.Resume, target: models.Resume) -> bool:
+    """
+    Copy the extracted text and all parsed related rows from one resume to another.
+    Used for duplicate uploads so they skip extraction and the Gemini call.
+
+    Args:
+        source: Processed resume to copy from
+        target: Resume instance to populate
+
+    Returns:
+        True if successful, False otherwise
+    """
+    related_models = [
+        models.Experience,
+        models.Education,
+        models.Skill,
+        models.LanguageProficiency,
+        models.Certification,
+        models.Project,
+    ]
+    try:
+        with transaction.atomic():
+            copied_fields = [
+                'text_extracted', 'text_normalized', 'tokens_raw', 'tokens_normalized',
+                'extractor', 'extraction_score', 'parse_source', 'parse_confidence', 'parser_version',
+            ]
+            for field_name in copied_fields:
+                setattr(target, field_name, getattr(source, field_name))
+            target.save(update_fields=copied_fields + ['updated_at'])
+
+            for model in related_models:
+                copies = []
+                for row in model.objects.filter(resume=source).order_by('id'):
+                    row.pk = None
+                    row.resume = target
+                    copies.append(row)
+                model.objects.bulk_create(copies)
+            update_search_vector(target)
+            sync_resume_skills(target)
+        index_parsed_resume(target)
+
+        logger.info(f"Cloned parsed data from resume {source.id} to resume {target.id}")
+        return True
+
+    except Exception as e:
+        logger.error(f"Error cloning resume data from {source.id} to {target.id}: {str(e)}")
+        return False
@@ -0,0 +1,540 @@
+"""
+Database-backed queue for asynchronous resume processing.
+
+Uploads are stored with status ``queued``; workers started with
+``manage.py process_resumes`` claim rows, extract the text, parse it with
+Gemini and populate the related models.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.base import File
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+
+from . import metrics, models
+from .resume_events import apublish_status, publish_status, publish_statuses
+from .text_normalizer import NormalizationResult, normalize_resume_text
+from .utils import BufferReader, ExtractionResult, SharedBuffer, extract_document
+from .gemini_batch import parse_resumes_with_gemini
+from .resume_parser import (
+    aprocess_resume_with_gemini,
+    clone_resume_data,
+    find_processed_duplicate,
+    parse_locally,
+    parse_resume_text,
+    process_resume_with_gemini,
+    save_parse_result,
+)
+
+logger = logging.getLogger(__name__)
+
+Status = models.Resume.Status
+
+DEFAULT_SETTINGS = {
+    'MODE': 'queue',
+    'MAX_ATTEMPTS': 3,
+    'STALE_AFTER_SECONDS': 600,
+    'POLL_INTERVAL_SECONDS': 2,
+    'ASYNC_STORAGE_WORKERS': 16,
+}
+
+
+def get_processing_setting(name: str):
+    """Read a value from settings.RESUME_PROCESSING, falling back to defaults."""
+    return getattr(settings, 'RESUME_PROCESSING', {}).get(name, DEFAULT_SETTINGS[name])
+
+
+# Storage backends (boto3 for R2) are blocking; uploads run here instead of a
+# shared pool so slow uploads cannot starve other work
+_storage_executor = None
+
+
+def get_storage_executor() -> ThreadPoolExecutor:
+    """Bounded thread pool for storage (R2) writes, shared by the upload paths."""
+    global _storage_executor
+    if _storage_executor is None:
+        _storage_executor = ThreadPoolExecutor(
+            max_workers=get_processing_setting('ASYNC_STORAGE_WORKERS'),
+            thread_name_prefix='resume-storage',
+        )
+    return _storage_executor
+
+
+def save_to_storage(name: str, content) -> str:
+    """
+    Write a file to the resume storage backend (R2), recording the put time.
+
+    Returns:
+        The stored file name
+    """
+    with metrics.timer('storage_put_seconds'):
+        return models.Resume._meta.get_field('file').storage.save(name, content)
+
+
+def store_upload(upload: SharedBuffer) -> str:
+    """
+    Write an upload to the resume storage backend under a generated name.
+
+    Returns:
+        The stored file name
+    """
+    field = models.Resume._meta.get_field('file')
+    return save_to_storage(field.generate_filename(None, upload.name), File(upload.open(), name=upload.name))
+
+
+class StorageUnavailable(APIException):
+    status_code = 503
+    default_detail = 'Could not store the file, please try again.'
+    default_code = 'storage_unavailable'
+
+
+def set_status(resume: models.Resume, status: str, message: str = "") -> None:
+    """
+    Persist a status transition for a resume.
+
+    Args:
+        resume: Resume instance
+        status: One of Resume.Status
+        message: Optional human readable detail (e.g. failure reason)
+    """
+    resume.save(update_fields=_apply_status(resume, status, message))
+    publish_status(resume)
+
+
+async def aset_status(resume: models.Resume, status: str, message: str = "") -> None:
+    """Async variant of set_status."""
+    await resume.asave(update_fields=_apply_status(resume, status, message))
+    await apublish_status(resume)
+
+
+def _apply_status(resume: models.Resume, status: str, message: str) -> List[str]:
+    """Set the status fields on the instance and return the fields to save."""
+    resume.status = status
+    resume.status_message = message
+    update_fields = ['status', 'status_message', 'updated_at']
+    if status in (Status.DONE, Status.FAILED, Status.QUEUED):
+        resume.locked_at = None
+        update_fields.append('locked_at')
+    return update_fields
+
+
+def claim_resumes(limit: int = 1) -> List[models.Resume]:
+    """
+    Claim the oldest queued resumes for processing.
+
+    Uses SELECT ... FOR UPDATE SKIP LOCKED so several workers can poll
+    the same table without handing out the same row twice.
+
+    Args:
+        limit: Maximum number of resumes to claim
+
+    Returns:
+        The claimed resumes (already marked as extracting), oldest first
+    """
+    with transaction.atomic():
+        resumes = list(
+            models.Resume.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=Status.QUEUED)
+            .order_by('created_at', 'id')[:limit]
+        )
+        now = timezone.now()
+        for resume in resumes:
+            resume.status = Status.EXTRACTING
+            resume.status_message = ""
+            resume.attempts += 1
+            resume.locked_at = now
+            resume.updated_at = now
+        models.Resume.objects.bulk_update(
+            resumes, ['status', 'status_message', 'attempts', 'locked_at', 'updated_at']
+        )
+    publish_statuses(resumes)
+    return resumes
+
+
+def claim_next_resume() -> Optional[models.Resume]:
+    """
+    Claim the oldest queued resume for processing.
+
+    Returns:
+        The claimed Resume (already marked as extracting), or None if the queue is empty
+    """
+    resumes = claim_resumes(limit=1)
+    return resumes[0] if resumes else None
+
+
+def requeue_stale_resumes() -> int:
+    """
+    Return resumes abandoned by a crashed worker to the queue.
+
+    Rows that stayed in an in-progress state longer than STALE_AFTER_SECONDS
+    are queued again, or marked as failed once they used all their attempts.
+
+    Returns:
+        Number of resumes that were reset
+    """
+    cutoff = timezone.now() - timedelta(seconds=get_processing_setting('STALE_AFTER_SECONDS'))
+    max_attempts = get_processing_setting('MAX_ATTEMPTS')
+    stale = models.Resume.objects.filter(
+        status__in=[Status.EXTRACTING, Status.PARSING],
+        locked_at__lt=cutoff,
+    )
+
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status=Status.FAILED,
+        status_message="Processing timed out",
+        locked_at=None,
+        updated_at=timezone.now(),
+    )
+    requeued = stale.filter(attempts__lt=max_attempts).update(
+        status=Status.QUEUED,
+        locked_at=None,
+        updated_at=timezone.now(),
+    )
+
+    if failed or requeued:
+        logger.warning(f"Reset stale resumes: {requeued} requeued, {failed} failed")
+    return failed + requeued
+
+
+def reuse_duplicate(resume: models.Resume) -> bool:
+    """
+    Finish a resume by cloning an already processed upload of the same file.
+
+    Returns:
+        True if a duplicate was found and its data copied
+    """
+    duplicate = find_processed_duplicate(resume.content_hash, resume.user_id, exclude_id=resume.id)
+    if duplicate and clone_resume_data(duplicate, resume):
+        set_status(resume, Status.DONE)
+        logger.info(f"Resume {resume.id} is a duplicate of resume {duplicate.id}, reused parsed data")
+        return True
+    return False
+
+
+EXTRACTION_FIELDS = [
+    'text_extracted', 'text_normalized', 'tokens_raw', 'tokens_normalized',
+    'extractor', 'extraction_score', 'updated_at',
+]
+
+
+def read_resume_text(resume: models.Resume, file=None) -> Tuple[ExtractionResult, NormalizationResult]:
+    """
+    CPU-bound part of the extraction stage: extract and normalize the text.
+    Does not touch the database, so it can run in any thread.
+
+    Args:
+        resume: Resume instance
+        file: Optional already-open file to extract from. When omitted the
+            stored file is read back from the storage backend.
+    """
+    if isinstance(file, BufferReader):
+        extraction = extract_document(file)  # already mapped
+    elif file is not None:
+        with SharedBuffer(file) as buffer:
+            extraction = extract_document(buffer.open())
+    else:
+        with resume.file.open('rb') as stored_file, SharedBuffer(stored_file) as buffer:
+            extraction = extract_document(buffer.open())
+    return extraction, normalize_resume_text(extraction.text)
+
+
+def _apply_extraction(resume: models.Resume, extraction: ExtractionResult, normalization: NormalizationResult) -> None:
+    resume.text_extracted = extraction.text
+    resume.text_normalized = normalization.text
+    resume.tokens_raw = normalization.tokens_before
+    resume.tokens_normalized = normalization.tokens_after
+    resume.extractor = extraction.extractor
+    resume.extraction_score = extraction.score
+    logger.info(
+        f"Resume {resume.id} extracted with {extraction.extractor} (quality {extraction.score}), "
+        f"~{normalization.tokens_before} tokens normalized to ~{normalization.tokens_after}"
+    )
+
+
+def extract_resume_text(resume: models.Resume, file=None) -> bool:
+    """
+    Extraction stage: read the file and store its text on the resume.
+
+    Args:
+        resume: Resume instance
+        file: Optional already-open file to extract from. When omitted the
+            stored file is read back from the storage backend.
+
+    Returns:
+        True if text was extracted, False if the resume was failed or requeued
+    """
+    if resume.status != Status.EXTRACTING:
+        set_status(resume, Status.EXTRACTING)
+    try:
+        extraction, normalization = read_resume_text(resume, file=file)
+    except Exception as e:
+        logger.error(f"Error reading file for resume {resume.id}: {str(e)}")
+        _fail_or_retry(resume, f"Could not read file: {str(e)}")
+        return False
+
+    _apply_extraction(resume, extraction, normalization)
+    resume.save(update_fields=EXTRACTION_FIELDS)
+
+    if not extraction.text or not extraction.text.strip():
+        logger.warning(f"Text extraction returned empty for resume {resume.id}")
+        set_status(resume, Status.FAILED, "No text could be extracted from the file")
+        return False
+    return True
+
+
+async def aextract_resume_text(resume: models.Resume, file=None) -> bool:
+    """
+    Async variant of extract_resume_text. Extraction runs in a worker thread
+    outside the sync_to_async thread shared by the ORM calls.
+    """
+    if resume.status != Status.EXTRACTING:
+        await aset_status(resume, Status.EXTRACTING)
+    try:
+        extraction, normalization = await sync_to_async(read_resume_text, thread_sensitive=False)(
+            resume, file=file
+        )
+    except Exception as e:
+        logger.error(f"Error reading file for resume {resume.id}: {str(e)}")
+        await _afail_or_retry(resume, f"Could not read file: {str(e)}")
+        return False
+
+    _apply_extraction(resume, extraction, normalization)
+    await resume.asave(update_fields=EXTRACTION_FIELDS)
+
+    if not extraction.text or not extraction.text.strip():
+        logger.warning(f"Text extraction returned empty for resume {resume.id}")
+        await aset_status(resume, Status.FAILED, "No text could be extracted from the file")
+        return False
+    return True
+
+
+def process_resume(resume: models.Resume, file=None) -> bool:
+    """
+    Run the full processing pipeline for a resume: extraction, Gemini parsing
+    and population of the related models.
+
+    Args:
+        resume: Resume instance
+        file: Optional already-open file to extract from. When omitted the
+            stored file is read back from the storage backend.
+
+    Returns:
+        True if the resume reached the done state, False otherwise
+    """
+    # Same file content already processed (e.g. finished while this one was queued)
+    if reuse_duplicate(resume):
+        return True
+
+    if not extract_resume_text(resume, file=file):
+        return False
+
+    # Parsing
+    set_status(resume, Status.PARSING)
+    try:
+        success = process_resume_with_gemini(resume)
+    except Exception as e:
+        logger.error(f"Error processing resume {resume.id} with Gemini: {str(e)}")
+        success = False
+
+    if not success:
+        _fail_or_retry(resume, "Gemini parsing failed")
+        return False
+
+    set_status(resume, Status.DONE)
+    logger.info(f"Resume {resume.id} processed successfully")
+    return True
+
+
+def _timed(timings: dict, stage: str, function, *args, **kwargs):
+    started = time.monotonic()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        timings[stage] = time.monotonic() - started
+
+
+def process_upload(validated_data: dict, upload: SharedBuffer) -> models.Resume:
+    """
+    Inline create path: store, extract and parse a new upload concurrently.
+
+    The storage (R2) write runs in the storage pool while this thread
+    extracts the text and calls Gemini, so the request takes about as long
+    as the slowest of the two instead of their sum. Nothing is written to
+    the database until both are finished; the resume and its parsed rows
+    are then committed in one transaction.
+
+    Partial failures:
+        - storage write fails: nothing is saved and StorageUnavailable (503) is raised
+        - no text extracted: the resume is saved as failed, as in process_resume
+        - parsing fails (Gemini and the local parser): the resume is saved with
+          its text and marked failed. Inline mode has no worker to retry it and
+          the Gemini client already retried transient errors (see _can_retry)
+        - the commit fails: the stored file is deleted and the error re-raised
+
+    Args:
+        validated_data: Resume fields from the serializer, without the file
+        upload: The uploaded file, mapped once and read by both stages
+
+    Returns:
+        The saved resume
+    """
+    timings = {}
+    started = time.monotonic()
+    field = models.Resume._meta.get_field('file')
+    # Each stage gets its own reader (own position) over the same mapping, no copies
+    stored = get_storage_executor().submit(_timed, timings, 'upload', store_upload, upload)
+
+    extraction = _timed(timings, 'extraction', extract_document, upload.open())
+    normalization = normalize_resume_text(extraction.text)
+    parsed_data, source, confidence, parse_error = None, '', None, ''
+    if extraction.text and extraction.text.strip():
+        try:
+            parsed_data, source, confidence = _timed(
+                timings, 'parsing', parse_resume_text, normalization.text or extraction.text,
+            )
+        except Exception as e:
+            parse_error = str(e)
+            logger.error(f"Error parsing new upload {upload.name}: {parse_error}")
+
+    try:
+        stored_name = stored.result()
+    except Exception as e:
+        logger.error(f"Storing upload {upload.name} failed after {time.monotonic() - started:.2f}s: {str(e)}")
+        raise StorageUnavailable()
+
+    try:
+        with transaction.atomic():
+            resume = models.Resume.objects.create(
+                file=stored_name, status=Status.PARSING, attempts=1, **validated_data,
+            )
+            _apply_extraction(resume, extraction, normalization)
+            resume.save(update_fields=EXTRACTION_FIELDS)
+            if not extraction.text or not extraction.text.strip():
+                set_status(resume, Status.FAILED, "No text could be extracted from the file")
+            elif parsed_data and save_parse_result(resume, parsed_data, source, confidence):
+                set_status(resume, Status.DONE)
+            else:
+                _fail_or_retry(resume, f"Gemini parsing failed{': ' + parse_error if parse_error else ''}")
+    except Exception:
+        # No row points at the stored object: remove it instead of leaving an orphan
+        field.storage.delete(stored_name)
+        raise
+
+    stages = ', '.join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items())
+    logger.info(
+        f"Resume {resume.id} created as {resume.status} in {time.monotonic() - started:.2f}s "
+        f"({stages}; sequential would take ~{sum(timings.values()):.2f}s)"
+    )
+    return resume
+
+
+async def aprocess_resume(resume: models.Resume, file=None) -> bool:
+    """
+    Async variant of process_resume, used by the ASGI upload view in inline mode.
+    The Gemini call is awaited instead of blocking a thread.
+
+    Returns:
+        True if the resume reached the done state, False otherwise
+    """
+    if await sync_to_async(reuse_duplicate)(resume):
+        return True
+
+    if not await aextract_resume_text(resume, file=file):
+        return False
+
+    await aset_status(resume, Status.PARSING)
+    try:
+        success = await aprocess_resume_with_gemini(resume)
+    except Exception as e:
+        logger.error(f"Error processing resume {resume.id} with Gemini: {str(e)}")
+        success = False
+
+    if not success:
+        await _afail_or_retry(resume, "Gemini parsing failed")
+        return False
+
+    await aset_status(resume, Status.DONE)
+    logger.info(f"Resume {resume.id} processed successfully")
+    return True
+
+
+def process_resume_batch(resumes: List[models.Resume]) -> int:
+    """
+    Process several claimed resumes, parsing them with batched Gemini prompts.
+
+    Args:
+        resumes: Claimed Resume instances
+
+    Returns:
+        Number of resumes that reached the done state
+    """
+    done = 0
+    to_parse = {}
+    for resume in resumes:
+        if reuse_duplicate(resume):
+            done += 1
+        elif extract_resume_text(resume):
+            set_status(resume, Status.PARSING)
+            to_parse[resume.id] = resume
+
+    if not to_parse:
+        return done
+
+    parsed = parse_resumes_with_gemini(
+        {resume_id: resume.prompt_text for resume_id, resume in to_parse.items()}
+    )
+    for resume_id, resume in to_parse.items():
+        parsed_data = parsed.get(resume_id)
+        if parsed_data:
+            saved = save_parse_result(resume, parsed_data, models.Resume.ParseSource.GEMINI, 1.0)
+        else:
+            # Gemini unavailable: fall back to the local parser
+            parsed_data = parse_locally(resume.prompt_text)
+            saved = parsed_data is not None and save_parse_result(
+                resume, parsed_data, models.Resume.ParseSource.LOCAL, parsed_data['confidence']
+            )
+        if saved:
+            set_status(resume, Status.DONE)
+            done += 1
+        else:
+            _fail_or_retry(resume, "Gemini parsing failed")
+
+    logger.info(f"Processed batch of {len(resumes)} resumes, {done} done")
+    return done
+
+
+def _can_retry(resume: models.Resume) -> bool:
+    # Inline mode has no worker to pick a requeued resume up; the Gemini client
+    # already retried transient errors within the request
+    return get_processing_setting('MODE') != 'inline' and resume.attempts < get_processing_setting('MAX_ATTEMPTS')
+
+
+def _fail_or_retry(resume: models.Resume, message: str) -> None:
+    """
+    Queue the resume again if it has attempts left, otherwise mark it as failed.
+    In inline mode it is always marked as failed.
+    """
+    max_attempts = get_processing_setting('MAX_ATTEMPTS')
+    if _can_retry(resume):
+        logger.info(f"Requeueing resume {resume.id} (attempt {resume.attempts}/{max_attempts}): {message}")
+        set_status(resume, Status.QUEUED, message)
+    else:
+        set_status(resume, Status.FAILED, message)
+
+
+async def _afail_or_retry(resume: models.Resume, message: str) -> None:
+    """Async variant of _fail_or_retry."""
+    max_attempts = get_processing_setting('MAX_ATTEMPTS')
+    if _can_retry(resume):
+        logger.info(f"Requeueing resume {resume.id} (attempt {resume.attempts}/{max_attempts}): {message}")
+        await aset_status(resume, Status.QUEUED, message)
+    else:
+        await aset_status(resume, Status.FAILED, message)
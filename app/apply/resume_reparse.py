@@ -0,0 +1,149 @@
+"""
+Re-parse resumes written by an older parser.
+
+Every parsed resume carries the PARSER_VERSION it was written with (prompt
+version + row mapping version). ``manage.py reparse_resumes`` walks the
+stale resumes in primary key order and re-parses them with bounded
+concurrency and a request rate limit. The child rows of each resume are
+replaced in one transaction with ResumeGraphWriter's replace mode, so rows
+that did not change are kept.
+
+Several processes can run the command at once: a chunk is claimed with
+SELECT ... FOR UPDATE SKIP LOCKED and leased through locked_at, the same
+way the resume worker claims queued uploads.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.db import transaction
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from . import models
+from .gemini_client import RateLimiter
+from .resume_parser import PARSER_VERSION, index_parsed_resume, parse_resume_text
+from .resume_queue import get_processing_setting
+from .resume_writer import MODE_REPLACE, ResumeGraphWriter
+
+logger = logging.getLogger(__name__)
+
+Status = models.Resume.Status
+ParseSource = models.Resume.ParseSource
+
+
+@dataclass
+class ReparseStats:
+    """Outcome counts of a re-parse run."""
+    counts: Dict[str, int] = field(default_factory=dict)
+
+    def add(self, outcome: str) -> None:
+        self.counts[outcome] = self.counts.get(outcome, 0) + 1
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+
+def stale_resumes(include_local: bool = False) -> QuerySet:
+    """
+    Processed resumes whose parsed rows come from another parser version.
+
+    Args:
+        include_local: Also return current resumes parsed by the local
+            parser, to retry them with Gemini
+    """
+    stale = ~Q(parser_version=PARSER_VERSION)
+    if include_local:
+        stale |= Q(parse_source=ParseSource.LOCAL)
+    return models.Resume.objects.filter(stale, status=Status.DONE)
+
+
+def claim_stale_resumes(after_id: int, limit: int, include_local: bool = False) -> List[models.Resume]:
+    """
+    Claim the next chunk of stale resumes after a keyset cursor.
+
+    Rows locked or leased by another process are skipped; a lease older than
+    STALE_AFTER_SECONDS (crashed process) can be claimed again.
+
+    Returns:
+        The claimed resumes, in primary key order
+    """
+    now = timezone.now()
+    lease_expired = now - timedelta(seconds=get_processing_setting('STALE_AFTER_SECONDS'))
+    with transaction.atomic():
+        resumes = list(
+            stale_resumes(include_local)
+            .filter(Q(locked_at__isnull=True) | Q(locked_at__lt=lease_expired), id__gt=after_id)
+            .select_for_update(skip_locked=True)
+            .order_by('id')[:limit]
+        )
+        for resume in resumes:
+            resume.locked_at = now
+        models.Resume.objects.bulk_update(resumes, ['locked_at'])
+    return resumes
+
+
+def release_resume(resume: models.Resume) -> None:
+    """Give up the lease of a resume without changing it."""
+    models.Resume.objects.filter(id=resume.id, locked_at=resume.locked_at).update(locked_at=None)
+
+
+def save_reparse_result(resume: models.Resume, parsed_data: dict, source: str, confidence: Optional[float]) -> bool:
+    """
+    Replace the parsed rows of a claimed resume and stamp the current version.
+
+    The row is locked for the whole write, so it cannot interleave with a
+    reprocess of the same resume. Resumes that changed state since they
+    were claimed are left alone.
+
+    Returns:
+        True if the resume was updated
+    """
+    with transaction.atomic():
+        locked = models.Resume.objects.select_for_update().filter(
+            id=resume.id, status=Status.DONE, locked_at=resume.locked_at,
+        ).first()
+        if locked is None:
+            return False
+        ResumeGraphWriter(locked).write(parsed_data, mode=MODE_REPLACE)
+        locked.parse_source = source
+        locked.parse_confidence = confidence
+        locked.parser_version = PARSER_VERSION
+        locked.locked_at = None
+        locked.save(update_fields=['parse_source', 'parse_confidence', 'parser_version', 'locked_at', 'updated_at'])
+    index_parsed_resume(locked)
+    return True
+
+
+def reparse_chunk(resumes: List[models.Resume], executor: ThreadPoolExecutor, limiter: Optional[RateLimiter], stats: ReparseStats) -> None:
+    """
+    Re-parse claimed resumes: parsing runs on the executor, writes happen
+    on the calling thread as results come in (in claim order).
+    """
+    def parse(resume):
+        if limiter is not None:
+            limiter.acquire()
+        return parse_resume_text(resume.prompt_text)
+
+    futures = [executor.submit(parse, resume) for resume in resumes]
+    for resume, future in zip(resumes, futures):
+        try:
+            parsed_data, source, confidence = future.result()
+            if not parsed_data:
+                outcome = 'failed'
+            elif source == ParseSource.LOCAL and resume.parse_source == ParseSource.GEMINI:
+                # Gemini is unavailable; keep the Gemini rows rather than downgrade them
+                outcome = 'skipped'
+            elif save_reparse_result(resume, parsed_data, source, confidence):
+                outcome = 'reparsed'
+            else:
+                outcome = 'changed'
+        except Exception as e:
+            logger.error(f"Re-parse of resume {resume.id} failed: {str(e)}")
+            outcome = 'failed'
+        if outcome != 'reparsed':
+            release_resume(resume)
+        stats.add(outcome)
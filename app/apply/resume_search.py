@@ -0,0 +1,121 @@
+"""
+PostgreSQL full-text search over resumes and their parsed sections.
+
+Resume.search_vector holds a weighted tsvector built from the parsed
+sections and the extracted text. It is rebuilt by the graph writer after
+every write (see ResumeGraphWriter.write) and served by a GIN index.
+Other database backends have no tsvector; there search is unavailable and
+the vector is not maintained.
+"""
+import logging
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, OuterRef, QuerySet, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    # 'simple' does no stemming: keeps skill tokens (C++, Node.js) and non-English resumes intact
+    'CONFIG': 'simple',
+    'HEADLINE_FRAGMENTS': 2,
+    'HEADLINE_WORDS': 25,
+}
+
+# (model, field, weight): A ranks highest, D lowest
+WEIGHTED_FIELDS = [
+    (models.Skill, 'name', 'A'),
+    (models.Experience, 'title', 'A'),
+    (models.Project, 'technologies', 'B'),
+    (models.Experience, 'description', 'C'),
+]
+
+
+def get_search_setting(name: str):
+    """Read a value from settings.RESUME_SEARCH, falling back to defaults."""
+    return getattr(settings, 'RESUME_SEARCH', {}).get(name, DEFAULT_SETTINGS[name])
+
+
+def search_available() -> bool:
+    """True if the database supports full-text search."""
+    return connection.vendor == 'postgresql'
+
+
+def _section_text(model, field: str):
+    """Subquery concatenating one field of a section for the outer resume."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(resume=OuterRef('pk'))
+            .values('resume')
+            .annotate(text=StringAgg(field, ' '))
+            .values('text')[:1],
+            output_field=TextField(),
+        ),
+        Value(''),
+        output_field=TextField(),
+    )
+
+
+def search_vector_expression():
+    """Weighted tsvector expression for a resume row."""
+    config = get_search_setting('CONFIG')
+    vector = SearchVector('text_extracted', weight='D', config=config)
+    for model, field, weight in WEIGHTED_FIELDS:
+        vector = vector + SearchVector(_section_text(model, field), weight=weight, config=config)
+    return vector
+
+
+def update_search_vectors(queryset: QuerySet) -> int:
+    """
+    Rebuild the search vector of the resumes in a queryset with one UPDATE.
+
+    Returns:
+        Number of updated resumes (0 when search is unavailable)
+    """
+    if not search_available():
+        return 0
+    return queryset.update(search_vector=search_vector_expression())
+
+
+def update_search_vector(resume: models.Resume) -> None:
+    """Rebuild the search vector of one resume."""
+    update_search_vectors(models.Resume.objects.filter(pk=resume.pk))
+
+
+def search_resumes(queryset: QuerySet, terms: str) -> QuerySet:
+    """
+    Full-text search a resume queryset.
+
+    Args:
+        queryset: Resumes to search (e.g. the user's resumes)
+        terms: Search terms in web search syntax ("python -java", "\"data engineer\"")
+
+    Returns:
+        Matching resumes ordered by rank, annotated with ``rank`` and a
+        highlighted ``snippet`` of the extracted text
+    """
+    config = get_search_setting('CONFIG')
+    query = SearchQuery(terms, search_type='websearch', config=config)
+    return (
+        queryset
+        .filter(search_vector=query)
+        .annotate(
+            rank=SearchRank(F('search_vector'), query),
+            snippet=SearchHeadline(
+                'text_extracted',
+                query,
+                config=config,
+                start_sel='<mark>',
+                stop_sel='</mark>',
+                max_fragments=get_search_setting('HEADLINE_FRAGMENTS'),
+                max_words=get_search_setting('HEADLINE_WORDS'),
+            ),
+        )
+        .defer('text_extracted', 'text_normalized', 'search_vector')
+        .order_by('-rank', '-id')
+    )
@@ -0,0 +1,218 @@
+"""
+Bulk writer that persists a parsed resume graph (experiences, educations,
+skills, languages, certifications and projects) for one resume.
+"""
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Tuple
+
+from django.db import connection, transaction
+
+from . import metrics, models
+from .gemini_service import parse_date
+from .resume_search import update_search_vector
+from .skill_index import sync_resume_skills
+
+logger = logging.getLogger(__name__)
+
+MODE_APPEND = 'append'
+MODE_REPLACE = 'replace'
+
+# Bump when the row builders below change how parsed data is mapped
+MAPPING_VERSION = "1"
+
+
+def _text(value: Any, max_length: int = None) -> str:
+    """Coerce a parsed value to a string field value (None becomes '')."""
+    if value is None:
+        return ''
+    value = str(value).strip()
+    return value[:max_length] if max_length else value
+
+
+def _date(value: Any):
+    """Parse a date string into a date (DateField) value."""
+    parsed = parse_date(value) if isinstance(value, str) else None
+    return parsed.date() if parsed else None
+
+
+def _experience(data: dict) -> dict:
+    return {
+        'title': _text(data.get('title'), 255),
+        'company': _text(data.get('company'), 255),
+        'start_date': _date(data.get('start_date')),
+        'end_date': _date(data.get('end_date')),
+        'description': _text(data.get('description')),
+        'achievements': _text(data.get('achievements')),
+    }
+
+
+def _education(data: dict) -> dict:
+    return {
+        'institution': _text(data.get('institution'), 255),
+        'degree': _text(data.get('degree'), 255),
+        'start_date': _date(data.get('start_date')),
+        'end_date': _date(data.get('end_date')),
+        'description': _text(data.get('description')),
+    }
+
+
+def _skill(data: Any) -> dict:
+    return {'name': _text(data, 100)}
+
+
+def _language(data: dict) -> dict:
+    return {
+        'language': _text(data.get('language'), 50),
+        'level': _text(data.get('level'), 50),
+    }
+
+
+def _certification(data: dict) -> dict:
+    return {
+        'name': _text(data.get('name'), 255),
+        'issuer': _text(data.get('issuer'), 255),
+        'date_obtained': _date(data.get('date_obtained')),
+    }
+
+
+def _project(data: dict) -> dict:
+    return {
+        'name': _text(data.get('name'), 255),
+        'description': _text(data.get('description')),
+        'start_date': _date(data.get('start_date')),
+        'end_date': _date(data.get('end_date')),
+        'url': _text(data.get('url'), 200),
+        'technologies': _text(data.get('technologies')),
+        'role': _text(data.get('role'), 255),
+        'achievements': _text(data.get('achievements')),
+    }
+
+
+# Parsed data key -> (model, row builder, field that must be non-empty)
+SECTIONS: Dict[str, Tuple[Any, Callable[[Any], dict], str]] = {
+    'experiences': (models.Experience, _experience, 'title'),
+    'educations': (models.Education, _education, 'institution'),
+    'skills': (models.Skill, _skill, 'name'),
+    'languages': (models.LanguageProficiency, _language, 'language'),
+    'certifications': (models.Certification, _certification, 'name'),
+    'projects': (models.Project, _project, 'name'),
+}
+
+
+@dataclass
+class WriteResult:
+    """Summary of a ResumeGraphWriter.write call."""
+    created: Dict[str, int] = field(default_factory=dict)
+    deleted: Dict[str, int] = field(default_factory=dict)
+    unchanged: Dict[str, int] = field(default_factory=dict)
+    queries: int = 0
+
+    @property
+    def rows_written(self) -> int:
+        return sum(self.created.values()) + sum(self.deleted.values())
+
+
+class ResumeGraphWriter:
+    """
+    Persist parsed resume data with one bulk insert per child model.
+
+    In ``append`` mode every parsed row is inserted. In ``replace`` mode the
+    parsed rows are diffed against the rows already stored for the resume:
+    identical rows are kept, missing ones are inserted and stale ones deleted,
+    so processing the same data twice writes nothing.
+    """
+
+    def __init__(self, resume: models.Resume):
+        self.resume = resume
+
+    def build_rows(self, parsed_data: dict) -> Dict[str, List[dict]]:
+        """Map parsed Gemini data to field dicts per section, dropping empty entries."""
+        rows = {}
+        for section, (model, builder, required_field) in SECTIONS.items():
+            items = parsed_data.get(section) or []
+            section_rows = []
+            for item in items:
+                if section != 'skills' and not isinstance(item, dict):
+                    continue
+                row = builder(item)
+                if row[required_field]:
+                    section_rows.append(row)
+            rows[section] = section_rows
+        return rows
+
+    def write(self, parsed_data: dict, mode: str = MODE_REPLACE, update_indexes: bool = True) -> WriteResult:
+        """
+        Write the parsed graph in a single transaction.
+
+        Args:
+            parsed_data: Dictionary with parsed data from Gemini
+            mode: MODE_APPEND or MODE_REPLACE
+            update_indexes: Rebuild the resume's full-text search vector and
+                skill index entries afterwards
+
+        Returns:
+            WriteResult with per-section row counts and the number of queries issued
+        """
+        if mode not in (MODE_APPEND, MODE_REPLACE):
+            raise ValueError(f"Unknown write mode: {mode}")
+
+        started = time.perf_counter()
+        result = WriteResult()
+        rows = self.build_rows(parsed_data)
+
+        def count_queries(execute, sql, params, many, context):
+            result.queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_queries), transaction.atomic():
+            for section, (model, _builder, _required) in SECTIONS.items():
+                new_rows = rows[section]
+                if mode == MODE_REPLACE:
+                    new_rows, stale_ids, unchanged = self._diff(model, new_rows)
+                    if stale_ids:
+                        model.objects.filter(id__in=stale_ids).delete()
+                    result.deleted[section] = len(stale_ids)
+                    result.unchanged[section] = unchanged
+
+                if new_rows:
+                    model.objects.bulk_create([model(resume=self.resume, **row) for row in new_rows])
+                result.created[section] = len(new_rows)
+
+            # Keep the full-text search vector and skill postings in step with the parsed sections
+            if update_indexes:
+                update_search_vector(self.resume)
+                sync_resume_skills(self.resume)
+
+        metrics.observe('resume_write_seconds', time.perf_counter() - started, mode=mode)
+        metrics.observe('resume_write_queries', result.queries, mode=mode)
+        return result
+
+    def _diff(self, model, new_rows: List[dict]) -> Tuple[List[dict], List[int], int]:
+        """
+        Compare parsed rows with the stored rows of one model.
+
+        Returns:
+            (rows to insert, ids of stored rows to delete, number of unchanged rows)
+        """
+        field_names = [f.name for f in model._meta.concrete_fields if f.name not in ('id', 'resume')]
+        stored_ids_by_key = defaultdict(list)
+        for stored in model.objects.filter(resume=self.resume).order_by('id').values('id', *field_names):
+            key = tuple(stored[name] for name in field_names)
+            stored_ids_by_key[key].append(stored['id'])
+
+        to_insert = []
+        unchanged = 0
+        for row in new_rows:
+            key = tuple(row[name] for name in field_names)
+            if stored_ids_by_key.get(key):
+                # Keep one stored copy per parsed copy
+                stored_ids_by_key[key].pop(0)
+                unchanged += 1
+            else:
+                to_insert.append(row)
+
+        stale_ids = [pk for ids in stored_ids_by_key.values() for pk in ids]
+        return to_insert, stale_ids, unchanged
@@ -0,0 +1,377 @@
+"""
+Local rule-based resume segmenter and offline parser.
+
+Splits resume text into sections by heading detection, then extracts
+structured entries with date-range regexes and list heuristics. Sections
+that never hold parsed data (hobbies, references) are left out of the
+Gemini prompt; the local parse is the fallback when Gemini is unavailable.
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Section -> headings that open it (lowercase, without trailing colon)
+SECTION_HEADINGS = {
+    'experiences': [
+        'experience', 'work experience', 'professional experience', 'employment',
+        'employment history', 'work history', 'career history', 'relevant experience',
+        'experiencia', 'experiencia laboral', 'experiencia profesional',
+    ],
+    'educations': [
+        'education', 'academic background', 'education and training', 'academic qualifications',
+        'educación', 'formación', 'formación académica',
+    ],
+    'skills': [
+        'skills', 'technical skills', 'core skills', 'key skills', 'core competencies',
+        'competencies', 'technologies', 'tech stack', 'tools', 'habilidades', 'competencias',
+    ],
+    'languages': ['languages', 'language skills', 'idiomas'],
+    'certifications': [
+        'certifications', 'certificates', 'certification', 'licenses and certifications',
+        'licenses & certifications', 'courses', 'courses and certifications', 'certificaciones',
+    ],
+    'projects': [
+        'projects', 'personal projects', 'selected projects', 'side projects', 'key projects',
+        'portfolio', 'proyectos',
+    ],
+}
+
+# Headings that end the current section without starting a parsed one.
+# Their text stays in the Gemini prompt (a summary can name skills, volunteering
+# can be experience)
+OTHER_HEADINGS = [
+    'summary', 'professional summary', 'profile', 'about me', 'contact', 'personal information',
+    'awards', 'publications', 'volunteering', 'volunteer experience', 'perfil', 'resumen',
+]
+
+# Headings of sections that never hold parsed data; left out of the Gemini prompt
+SKIPPED_HEADINGS = ['objective', 'career objective', 'interests', 'hobbies', 'references']
+
+SECTIONS = list(SECTION_HEADINGS)
+
+_heading_lookup = {
+    heading: section for section, headings in SECTION_HEADINGS.items() for heading in headings
+}
+_heading_lookup.update({heading: 'other' for heading in OTHER_HEADINGS})
+_heading_lookup.update({heading: 'skipped' for heading in SKIPPED_HEADINGS})
+
+MONTHS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+    'ene': 1, 'abr': 4, 'ago': 8, 'dic': 12,
+}
+_month = r'(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec|ene|abr|ago|dic)[a-z]*\.?'
+_date = rf'(?:{_month}\s+\d{{4}}|\d{{1,2}}[/.-]\d{{4}}|\d{{4}}[/.-]\d{{1,2}}|\d{{4}})'
+_present = r'(?:present|current|now|today|actualidad|presente)'
+DATE_RANGE_RE = re.compile(
+    rf'(?P<start>{_date})\s*(?:-|–|—|to|until|hasta|a)\s*(?P<end>{_date}|{_present})',
+    re.IGNORECASE,
+)
+SINGLE_DATE_RE = re.compile(_date, re.IGNORECASE)
+URL_RE = re.compile(r'(?:https?://|www\.)\S+', re.IGNORECASE)
+_list_split_re = re.compile(r'\s*[,;|•·]\s*|\s+-\s+|\n')
+_language_re = re.compile(
+    r'^(?P<language>[A-Za-zÀ-ÿ]+(?:\s[A-Za-zÀ-ÿ]+)?)\s*(?:[:(\-–—,]\s*(?P<level>[^)]*)\)?)?$'
+)
+
+INSTITUTION_WORDS = ('university', 'universidad', 'college', 'school', 'institute', 'instituto', 'academy', 'polytechnic')
+DEGREE_WORDS = (
+    'bachelor', 'master', 'phd', 'ph.d', 'doctor', 'bsc', 'msc', 'b.s', 'm.s', 'b.a', 'm.a', 'mba',
+    'degree', 'diploma', 'engineering', 'licenciatura', 'ingeniería', 'grado', 'associate',
+)
+
+# Confidence reported for local parses (Gemini parses are 1.0)
+LOCAL_CONFIDENCE_SEGMENTED = 0.5
+LOCAL_CONFIDENCE_UNSEGMENTED = 0.2
+
+
+def _heading_section(line: str) -> Optional[str]:
+    """Return the section a heading line opens, or None if the line is not a heading."""
+    stripped = line.strip().strip(':').strip()
+    if not stripped or len(stripped) > 40 or len(stripped.split()) > 5:
+        return None
+    key = re.sub(r'\s+', ' ', stripped.lower().strip('#*-_ '))
+    return _heading_lookup.get(key)
+
+
+class Segmentation:
+    """Result of segment_resume(): text per section, in document order."""
+
+    def __init__(self, header: str, sections: Dict[str, str], blocks: List[Tuple[str, str, str]] = ()):
+        self.header = header  # text before the first heading (name, contact details)
+        self.sections = sections
+        self.blocks = list(blocks)  # (section, heading line, text) in document order
+
+    @property
+    def found_sections(self) -> List[str]:
+        return [section for section in SECTIONS if self.sections.get(section, '').strip()]
+
+    @property
+    def is_confident(self) -> bool:
+        """True when enough known headings were found to trust the split."""
+        return len(self.found_sections) >= 2
+
+    def prompt_text(self) -> str:
+        """
+        Resume text without the skipped sections: the header and every other
+        block under its original heading. Text under a heading the segmenter
+        does not know stays in the block above it, so nothing else is lost.
+        """
+        parts = [self.header] + [
+            f"{heading}\n{text}" for section, heading, text in self.blocks if section != 'skipped'
+        ]
+        return "\n\n".join(part for part in parts if part.strip())
+
+
+def segment_resume(text: str) -> Segmentation:
+    """
+    Split resume text into sections by detecting heading lines.
+
+    Args:
+        text: Resume text
+
+    Returns:
+        Segmentation with the text of every recognised section
+    """
+    header_lines: List[str] = []
+    collected: Dict[str, List[str]] = {}
+    blocks: List[Tuple[str, str, List[str]]] = []
+    current = None
+    for line in (text or '').splitlines():
+        section = _heading_section(line)
+        if section is not None:
+            current = section
+            collected.setdefault(current, [])
+            blocks.append((section, line.strip(), []))
+            continue
+        if current is None:
+            header_lines.append(line)
+        else:
+            collected[current].append(line)
+            blocks[-1][2].append(line)
+
+    sections = {
+        section: "\n".join(lines).strip()
+        for section, lines in collected.items() if section not in ('other', 'skipped')
+    }
+    blocks = [(section, heading, "\n".join(lines).strip()) for section, heading, lines in blocks]
+    return Segmentation("\n".join(header_lines).strip(), sections, blocks)
+
+
+def normalize_date(value: str) -> Optional[str]:
+    """Convert a matched resume date ("Mar 2020", "03/2020", "2020") to YYYY-MM-DD."""
+    if not value:
+        return None
+    value = value.strip().lower()
+    if re.fullmatch(_present, value):
+        return None
+    match = re.fullmatch(rf'({_month})\s+(\d{{4}})', value)
+    if match:
+        return f"{match.group(2)}-{MONTHS[match.group(1)[:3]]:02d}-01"
+    match = re.fullmatch(r'(\d{1,2})[/.-](\d{4})', value)
+    if match and 1 <= int(match.group(1)) <= 12:
+        return f"{match.group(2)}-{int(match.group(1)):02d}-01"
+    match = re.fullmatch(r'(\d{4})[/.-](\d{1,2})', value)
+    if match and 1 <= int(match.group(2)) <= 12:
+        return f"{match.group(1)}-{int(match.group(2)):02d}-01"
+    if re.fullmatch(r'\d{4}', value):
+        return f"{value}-01-01"
+    return None
+
+
+def _split_entries(text: str) -> List[Tuple[List[str], Optional[re.Match]]]:
+    """
+    Split a section into entries. A line with a date range starts a new entry
+    (together with the heading line just above it, if that line has no dates).
+    """
+    lines = [line.strip() for line in text.splitlines()]
+    entries: List[Tuple[List[str], Optional[re.Match]]] = []
+    current: List[str] = []
+    current_dates = None
+    for line in lines:
+        dates = DATE_RANGE_RE.search(line)
+        if dates:
+            carried = []
+            if current and current_dates is None:
+                carried = current  # title lines written above the first dates
+            elif current and current_dates is not None and current[-1] and not DATE_RANGE_RE.search(current[-1]) \
+                    and len(current[-1]) < 80 and not current[-1].startswith(('-', '•')):
+                carried = [current.pop()]
+            if current and current is not carried:
+                entries.append((current, current_dates))
+            current = carried + [line]
+            current_dates = dates
+        elif line:
+            current.append(line)
+    if current:
+        entries.append((current, current_dates))
+    return [(lines_, dates) for lines_, dates in entries if any(lines_)]
+
+
+def _split_title_company(line: str) -> Tuple[str, str]:
+    for separator in (' at ', ' @ ', ' | ', ' - ', ' – ', ' — ', ', '):
+        if separator in line:
+            title, company = line.split(separator, 1)
+            return title.strip(' ,|-'), company.strip(' ,|-')
+    return line.strip(), ''
+
+
+def _strip_dates(line: str) -> str:
+    return DATE_RANGE_RE.sub('', line).strip(' ,|-–—()')
+
+
+def parse_experiences(text: str) -> List[dict]:
+    experiences = []
+    for lines, dates in _split_entries(text):
+        heading = [_strip_dates(line) for line in lines[:2] if _strip_dates(line)]
+        title, company = _split_title_company(heading[0]) if heading else ('', '')
+        body_start = 1
+        if not company and len(heading) > 1 and not heading[1].startswith(('-', '•')):
+            company = heading[1]
+            body_start = 2
+        description = "\n".join(line for line in lines[body_start:] if line and _strip_dates(line))
+        if not title:
+            continue
+        experiences.append({
+            'title': title,
+            'company': company,
+            'start_date': normalize_date(dates.group('start')) if dates else None,
+            'end_date': normalize_date(dates.group('end')) if dates else None,
+            'description': description,
+            'achievements': '',
+        })
+    return experiences
+
+
+def parse_educations(text: str) -> List[dict]:
+    educations = []
+    for lines, dates in _split_entries(text):
+        cleaned = [_strip_dates(line) for line in lines if _strip_dates(line)]
+        institution = next((line for line in cleaned if any(w in line.lower() for w in INSTITUTION_WORDS)), '')
+        degree = next((line for line in cleaned if any(w in line.lower() for w in DEGREE_WORDS)), '')
+        if not institution:
+            institution = cleaned[0] if cleaned else ''
+        if not institution:
+            continue
+        educations.append({
+            'institution': institution,
+            'degree': degree if degree != institution else '',
+            'start_date': normalize_date(dates.group('start')) if dates else None,
+            'end_date': normalize_date(dates.group('end')) if dates else None,
+            'description': "\n".join(line for line in cleaned if line not in (institution, degree)),
+        })
+    return educations
+
+
+def parse_skills(text: str) -> List[str]:
+    skills = []
+    seen = set()
+    for line in text.splitlines():
+        # "Languages: Python, Go" -> drop the category label
+        if ':' in line and len(line.split(':', 1)[0]) < 30:
+            line = line.split(':', 1)[1]
+        for item in _list_split_re.split(line):
+            item = item.strip(' .-*')
+            if not item or len(item) > 50 or len(item.split()) > 5:
+                continue
+            if item.lower() not in seen:
+                seen.add(item.lower())
+                skills.append(item)
+    return skills
+
+
+def parse_languages(text: str) -> List[dict]:
+    languages = []
+    for item in re.split(r'\s*[,;|•·]\s*|\n', text):
+        match = _language_re.match(item.strip(' -*'))
+        if match:
+            languages.append({
+                'language': match.group('language').strip(),
+                'level': (match.group('level') or '').strip(),
+            })
+    return languages
+
+
+def parse_certifications(text: str) -> List[dict]:
+    certifications = []
+    for line in text.splitlines():
+        line = line.strip(' -•*')
+        if not line:
+            continue
+        date = SINGLE_DATE_RE.search(line)
+        name = SINGLE_DATE_RE.sub('', line).strip(' ,|-–—()')
+        issuer = ''
+        for separator in (' - ', ' – ', ' | ', ', ', ' by '):
+            if separator in name:
+                name, issuer = (part.strip() for part in name.split(separator, 1))
+                break
+        if name:
+            certifications.append({
+                'name': name,
+                'issuer': issuer,
+                'date_obtained': normalize_date(date.group(0)) if date else None,
+            })
+    return certifications
+
+
+def parse_projects(text: str) -> List[dict]:
+    projects = []
+    blocks = [block for block in re.split(r'\n\s*\n', text) if block.strip()]
+    for block in blocks:
+        lines = [line.strip() for line in block.splitlines() if line.strip()]
+        dates = DATE_RANGE_RE.search(block)
+        url = URL_RE.search(block)
+        technologies = ''
+        description_lines = []
+        for line in lines[1:]:
+            label, _, rest = line.partition(':')
+            if rest and label.lower().strip(' -•') in ('technologies', 'tech', 'stack', 'tech stack', 'tools', 'built with'):
+                technologies = rest.strip()
+            else:
+                description_lines.append(line)
+        name = _strip_dates(URL_RE.sub('', lines[0]))
+        if not name:
+            continue
+        projects.append({
+            'name': name,
+            'description': "\n".join(description_lines),
+            'start_date': normalize_date(dates.group('start')) if dates else None,
+            'end_date': normalize_date(dates.group('end')) if dates else None,
+            'url': url.group(0) if url else '',
+            'technologies': technologies,
+            'role': '',
+            'achievements': '',
+        })
+    return projects
+
+
+SECTION_PARSERS = {
+    'experiences': parse_experiences,
+    'educations': parse_educations,
+    'skills': parse_skills,
+    'languages': parse_languages,
+    'certifications': parse_certifications,
+    'projects': parse_projects,
+}
+
+
+def parse_resume_locally(text: str, segmentation: Optional[Segmentation] = None) -> dict:
+    """
+    Parse a resume without Gemini.
+
+    Args:
+        text: Resume text
+        segmentation: Optional precomputed segment_resume() result
+
+    Returns:
+        Dict in the same shape as the Gemini response, plus a 'confidence'
+        key between 0 and 1
+    """
+    segmentation = segmentation or segment_resume(text)
+    parsed = {
+        section: parser(segmentation.sections.get(section, ''))
+        for section, parser in SECTION_PARSERS.items()
+    }
+    parsed['confidence'] = (
+        LOCAL_CONFIDENCE_SEGMENTED if segmentation.is_confident else LOCAL_CONFIDENCE_UNSEGMENTED
+    )
+    return parsed
@@ -0,0 +1,589 @@
+"""
+Memory-mapped approximate nearest-neighbour index for semantic resume search.
+
+Every processed resume gets a fixed-size embedding: the terms of its text,
+skills and experience titles are feature-hashed into DIM signed buckets
+(a sparse random projection) and L2-normalized, so the dot product of two
+embeddings is their cosine similarity. The embedding is computed locally,
+with no model or API call.
+
+Embeddings live in flat files in SEMANTIC_INDEX['DIR'] and are accessed
+through numpy memmaps. Every process maps the same pages from the OS page
+cache, so nothing is copied. The files of one generation are:
+
+    vectors.f32   capacity x dim embeddings
+    ids.i64       resume id per row, 0 for removed rows
+    owners.i64    user id per row
+    lists.i32     inverted list of each row
+    centroids.f32 nlist x dim k-means centroids
+    offsets.i64   nlist + 1 row offsets of the inverted lists
+
+The index is an IVF (inverted file). Compaction clusters the live rows
+with k-means and stores them grouped by nearest centroid. A query then
+scans only the NPROBE lists closest to it, plus the unsorted tail of rows
+appended since the last compaction. Appends and in-place removals happen
+under a file lock; deleted resumes are removed when the deletion commits,
+and idle workers catch up on ResumeDeletion tombstones missed that way
+(apply_deletions). meta.json is replaced atomically after the rows are
+written, so readers never see a partial row. Compaction writes a new
+generation and switches meta.json over to it.
+"""
+import fcntl
+import hashlib
+import json
+import logging
+import math
+import os
+import shutil
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from . import models
+from .matching import load_documents, tokenize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'DIR': None,  # defaults to BASE_DIR / 'var' / 'semantic_index'
+    'DIM': 256,
+    'HASHES_PER_TERM': 3,  # signed buckets per term (density of the random projection)
+    'FIELD_WEIGHTS': {'text': 1.0, 'skills': 2.0, 'titles': 1.5},
+    'NPROBE': 8,  # inverted lists scanned per query
+    'MAX_LISTS': 4096,
+    'MIN_TRAIN_ROWS': 1000,  # below this the index stays a flat (exact) scan
+    'KMEANS_ITERATIONS': 10,
+    'KMEANS_SAMPLE': 100000,
+    'TAIL_RATIO': 0.1,  # compact when the unsorted tail exceeds this share of the rows
+    'TOMBSTONE_RATIO': 0.2,  # ... or when this share of the rows was removed
+    'MIN_CAPACITY': 1024,
+    'DEFAULT_LIMIT': 10,
+    'MAX_LIMIT': 100,
+}
+
+ARRAYS = {
+    # name: (dtype, has a dim axis)
+    'vectors.f32': (np.float32, True),
+    'ids.i64': (np.int64, False),
+    'owners.i64': (np.int64, False),
+    'lists.i32': (np.int32, False),
+}
+SCAN_CHUNK_ROWS = 65536
+
+
+def get_semantic_setting(name: str):
+    """Read a value from settings.SEMANTIC_INDEX, falling back to defaults."""
+    return getattr(settings, 'SEMANTIC_INDEX', {}).get(name, DEFAULT_SETTINGS[name])
+
+
+def get_index_dir() -> Path:
+    path = get_semantic_setting('DIR')
+    return Path(path) if path else Path(settings.BASE_DIR) / 'var' / 'semantic_index'
+
+
+@lru_cache(maxsize=200000)
+def _term_buckets(term: str, dim: int, hashes: int) -> Tuple[Tuple[int, float], ...]:
+    """Signed buckets of a term: a fixed sparse random projection of its one-hot vector."""
+    digest = hashlib.blake2b(term.encode(), digest_size=4 * hashes).digest()
+    buckets = []
+    for position in range(hashes):
+        value = int.from_bytes(digest[4 * position:4 * position + 4], 'little')
+        buckets.append((value % dim, 1.0 if value & 0x80000000 else -1.0))
+    return tuple(buckets)
+
+
+def embed_fields(fields: Dict[str, List[str]], dim: int) -> np.ndarray:
+    """
+    Embed tokenized fields (text, skills, titles) into a unit vector.
+
+    Terms are weighted by 1 + log(tf) and the field weight.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    field_weights = get_semantic_setting('FIELD_WEIGHTS')
+    hashes = get_semantic_setting('HASHES_PER_TERM')
+    for name, tokens in fields.items():
+        field_weight = field_weights.get(name, 0.0)
+        if not field_weight:
+            continue
+        for term, count in Counter(tokens).items():
+            weight = field_weight * (1.0 + math.log(count))
+            for bucket, sign in _term_buckets(term, dim, hashes):
+                vector[bucket] += sign * weight
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def embed_text(text: str, dim: int) -> np.ndarray:
+    """Embed free text (e.g. a job post) into the resume embedding space."""
+    tokens = tokenize(text)
+    return embed_fields({'text': tokens, 'skills': [], 'titles': []}, dim)
+
+
+def _read_meta(root: Path) -> Optional[dict]:
+    try:
+        with open(root / 'meta.json') as meta_file:
+            return json.load(meta_file)
+    except FileNotFoundError:
+        return None
+
+
+def _write_meta(root: Path, meta: dict) -> None:
+    """Atomically replace meta.json."""
+    temp_path = root / 'meta.json.tmp'
+    with open(temp_path, 'w') as meta_file:
+        json.dump(meta, meta_file)
+        meta_file.flush()
+        os.fsync(meta_file.fileno())
+    os.replace(temp_path, root / 'meta.json')
+
+
+def _generation_dir(root: Path, generation: int) -> Path:
+    return root / f'gen-{generation}'
+
+
+def _open_arrays(root: Path, meta: dict, mode: str) -> Dict[str, np.memmap]:
+    """Map the row arrays and IVF structures of the current generation."""
+    directory = _generation_dir(root, meta['generation'])
+    arrays = {}
+    for name, (dtype, has_dim) in ARRAYS.items():
+        shape = (meta['capacity'], meta['dim']) if has_dim else (meta['capacity'],)
+        arrays[name] = np.memmap(directory / name, dtype=dtype, mode=mode, shape=shape)
+    if meta['nlist']:
+        centroids = np.fromfile(directory / 'centroids.f32', dtype=np.float32)
+        arrays['centroids'] = centroids.reshape(meta['nlist'], meta['dim'])
+        arrays['offsets'] = np.fromfile(directory / 'offsets.i64', dtype=np.int64)
+    return arrays
+
+
+def _create_generation(root: Path, meta: dict) -> None:
+    """Create zero-filled row files of meta['capacity'] rows."""
+    directory = _generation_dir(root, meta['generation'])
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, (dtype, has_dim) in ARRAYS.items():
+        size = meta['capacity'] * np.dtype(dtype).itemsize * (meta['dim'] if has_dim else 1)
+        with open(directory / name, 'wb') as array_file:
+            array_file.truncate(size)
+
+
+@contextmanager
+def _write_lock(root: Path):
+    """Exclusive inter-process lock for appends and compaction."""
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / '.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _new_meta(root: Path) -> dict:
+    meta = {
+        'dim': get_semantic_setting('DIM'),
+        'generation': 1,
+        'capacity': get_semantic_setting('MIN_CAPACITY'),
+        'count': 0,
+        'sorted': 0,  # rows [0, sorted) are grouped by inverted list
+        'removed': 0,
+        'nlist': 0,
+        'deleted_after': 0,  # last ResumeDeletion applied, see apply_deletions
+    }
+    _create_generation(root, meta)
+    _write_meta(root, meta)
+    return meta
+
+
+def _assign_lists(vectors: np.ndarray, centroids: Optional[np.ndarray]) -> np.ndarray:
+    if centroids is None or not len(vectors):
+        return np.full(len(vectors), -1, dtype=np.int32)
+    return np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+
+def append_vectors(items: List[Tuple[int, int, np.ndarray]]) -> int:
+    """
+    Append (resume id, owner id, embedding) rows, removing older rows of the same resumes.
+
+    Returns:
+        Number of appended rows
+    """
+    if not items:
+        return 0
+    root = get_index_dir()
+    with _write_lock(root):
+        meta = _read_meta(root) or _new_meta(root)
+        count, needed = meta['count'], meta['count'] + len(items)
+        if needed > meta['capacity']:
+            # Grow the files in place: existing mappings in other processes stay valid
+            meta['capacity'] = max(2 * meta['capacity'], needed)
+            directory = _generation_dir(root, meta['generation'])
+            for name, (dtype, has_dim) in ARRAYS.items():
+                os.truncate(directory / name, meta['capacity'] * np.dtype(dtype).itemsize * (meta['dim'] if has_dim else 1))
+
+        arrays = _open_arrays(root, meta, 'r+')
+        resume_ids = np.array([item[0] for item in items], dtype=np.int64)
+        stale = np.flatnonzero(np.isin(arrays['ids.i64'][:count], resume_ids))
+        arrays['ids.i64'][stale] = 0
+
+        vectors = np.stack([item[2] for item in items]).astype(np.float32)
+        arrays['vectors.f32'][count:needed] = vectors
+        arrays['owners.i64'][count:needed] = [item[1] for item in items]
+        arrays['lists.i32'][count:needed] = _assign_lists(vectors, arrays.get('centroids'))
+        # Ids last: a row is only visible once its id is set and meta counts it
+        arrays['ids.i64'][count:needed] = resume_ids
+        for name in ARRAYS:
+            arrays[name].flush()
+
+        meta['count'] = needed
+        meta['removed'] += len(stale)
+        _write_meta(root, meta)
+    return len(items)
+
+
+def remove_resumes(resume_ids: Iterable[int], deleted_after: Optional[int] = None) -> int:
+    """
+    Mark the rows of some resumes as removed.
+
+    Args:
+        resume_ids: Resumes to remove
+        deleted_after: ResumeDeletion id up to which tombstones are applied
+            (stored in meta.json, see apply_deletions)
+
+    Returns:
+        The number of removed rows
+    """
+    root = get_index_dir()
+    resume_ids = np.fromiter(resume_ids, dtype=np.int64)
+    with _write_lock(root):
+        meta = _read_meta(root)
+        if meta is None:
+            return 0
+        arrays = _open_arrays(root, meta, 'r+')
+        stale = np.flatnonzero(np.isin(arrays['ids.i64'][:meta['count']], resume_ids))
+        arrays['ids.i64'][stale] = 0
+        arrays['ids.i64'].flush()
+        meta['removed'] += len(stale)
+        if deleted_after is not None:
+            meta['deleted_after'] = max(deleted_after, meta.get('deleted_after', 0))
+        if len(stale) or deleted_after is not None:
+            _write_meta(root, meta)
+    return len(stale)
+
+
+def remove_resume(resume_id: int) -> None:
+    """Drop a deleted resume from the index (called once its deletion is committed)."""
+    try:
+        remove_resumes([resume_id])
+    except Exception as e:
+        logger.warning(f"Could not remove resume {resume_id} from the semantic index: {str(e)}")
+
+
+def apply_deletions() -> int:
+    """
+    Remove the resumes of ResumeDeletion tombstones not applied yet, e.g.
+    deleted while the index was being rebuilt or by a process on another host.
+
+    Returns:
+        The number of removed rows
+    """
+    meta = _read_meta(get_index_dir())
+    if meta is None:
+        return 0
+    tombstones = list(
+        models.ResumeDeletion.objects.filter(id__gt=meta.get('deleted_after', 0))
+        .order_by('id').values_list('id', 'resume_id')
+    )
+    if not tombstones:
+        return 0
+    return remove_resumes((resume_id for _id, resume_id in tombstones), deleted_after=tombstones[-1][0])
+
+
+def _kmeans(vectors: np.ndarray, nlist: int, iterations: int, seed: int = 0) -> np.ndarray:
+    """Spherical k-means: unit-length centroids maximizing cosine similarity."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        empty = ~sums.any(axis=1)
+        # Reseed empty lists with random rows
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.where(norms > 0, norms, 1.0)
+    return centroids.astype(np.float32)
+
+
+def needs_compaction(meta: Optional[dict]) -> bool:
+    """True if the tail or the removed rows have grown past their thresholds."""
+    if not meta or not meta['count']:
+        return False
+    tail = meta['count'] - meta['sorted']
+    untrained = meta['nlist'] == 0 and meta['count'] - meta['removed'] >= get_semantic_setting('MIN_TRAIN_ROWS')
+    return (
+        untrained
+        or tail > get_semantic_setting('TAIL_RATIO') * max(meta['sorted'], get_semantic_setting('MIN_TRAIN_ROWS'))
+        or meta['removed'] > get_semantic_setting('TOMBSTONE_RATIO') * meta['count']
+    )
+
+
+def compact(keep_ids: Optional[set] = None) -> dict:
+    """
+    Rewrite the index without removed rows and with retrained inverted lists.
+
+    Args:
+        keep_ids: If given, rows of resumes outside this set are dropped too
+            (e.g. the ids of all processed resumes, to drop deleted ones)
+
+    Returns:
+        The new meta data
+    """
+    root = get_index_dir()
+    with _write_lock(root):
+        meta = _read_meta(root) or _new_meta(root)
+        arrays = _open_arrays(root, meta, 'r')
+        ids = np.array(arrays['ids.i64'][:meta['count']])
+        live = ids != 0
+        if keep_ids is not None:
+            live &= np.isin(ids, np.fromiter(keep_ids, dtype=np.int64))
+        rows = np.flatnonzero(live)
+
+        # Train on a sample, then assign every live row in chunks
+        nlist = 0
+        centroids = None
+        if len(rows) >= get_semantic_setting('MIN_TRAIN_ROWS'):
+            nlist = min(int(math.sqrt(len(rows))), get_semantic_setting('MAX_LISTS'))
+            rng = np.random.default_rng(meta['generation'])
+            sample = np.sort(rng.choice(rows, min(len(rows), get_semantic_setting('KMEANS_SAMPLE')), replace=False))
+            centroids = _kmeans(
+                np.asarray(arrays['vectors.f32'][sample]), nlist,
+                get_semantic_setting('KMEANS_ITERATIONS'), seed=meta['generation'],
+            )
+        lists = np.concatenate([
+            _assign_lists(np.asarray(arrays['vectors.f32'][rows[start:start + SCAN_CHUNK_ROWS]]), centroids)
+            for start in range(0, len(rows), SCAN_CHUNK_ROWS)
+        ] or [np.zeros(0, dtype=np.int32)])
+        order = np.argsort(lists, kind='stable')
+        rows, lists = rows[order], lists[order]
+
+        new_meta = dict(
+            meta,
+            generation=meta['generation'] + 1,
+            capacity=max(int(len(rows) * 1.25), get_semantic_setting('MIN_CAPACITY')),
+            count=len(rows), sorted=len(rows), removed=0, nlist=nlist,
+        )
+        _create_generation(root, new_meta)
+        # Centroids are written below, map only the row arrays
+        new_arrays = _open_arrays(root, dict(new_meta, nlist=0), 'r+')
+        for start in range(0, len(rows), SCAN_CHUNK_ROWS):
+            chunk = rows[start:start + SCAN_CHUNK_ROWS]
+            end = start + len(chunk)
+            new_arrays['vectors.f32'][start:end] = arrays['vectors.f32'][chunk]
+            new_arrays['owners.i64'][start:end] = arrays['owners.i64'][chunk]
+            new_arrays['ids.i64'][start:end] = ids[chunk]
+        new_arrays['lists.i32'][:len(rows)] = lists
+        for name in ARRAYS:
+            new_arrays[name].flush()
+        if nlist:
+            directory = _generation_dir(root, new_meta['generation'])
+            centroids.tofile(directory / 'centroids.f32')
+            offsets = np.zeros(nlist + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum(np.bincount(lists, minlength=nlist))
+            offsets.tofile(directory / 'offsets.i64')
+        _write_meta(root, new_meta)
+
+        # Keep the previous generation for readers still switching over
+        for path in root.glob('gen-*'):
+            if int(path.name.split('-')[1]) < meta['generation']:
+                shutil.rmtree(path, ignore_errors=True)
+    logger.info(
+        f"Compacted semantic index: {len(rows)} rows, {nlist} lists "
+        f"(generation {new_meta['generation']})"
+    )
+    return new_meta
+
+
+class SemanticIndexReader:
+    """
+    Read-only view of the index, remapped when meta.json changes.
+    One instance per process; the mapped pages are shared between processes.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.lock = threading.Lock()
+        self.meta = None
+        self.arrays = None
+        self._meta_mtime = None
+
+    def _refresh(self) -> bool:
+        try:
+            mtime = os.stat(self.root / 'meta.json').st_mtime_ns
+        except FileNotFoundError:
+            self.meta = self.arrays = None
+            return False
+        if mtime != self._meta_mtime:
+            meta = _read_meta(self.root)
+            if meta is None:
+                return False
+            current = self.meta or {}
+            if (meta['generation'], meta['capacity'], meta['nlist']) != (
+                current.get('generation'), current.get('capacity'), current.get('nlist')
+            ):
+                try:
+                    self.arrays = _open_arrays(self.root, meta, 'r')
+                except FileNotFoundError:
+                    # Compacted again while switching over: retry on the next query
+                    return self.arrays is not None
+            self.meta = meta
+            self._meta_mtime = mtime
+        return True
+
+    def search(
+        self,
+        vector: np.ndarray,
+        limit: int,
+        owner_id: Optional[int] = None,
+        exclude_id: Optional[int] = None,
+        nprobe: Optional[int] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Nearest resumes to a unit vector.
+
+        Args:
+            vector: Query embedding
+            limit: Number of results
+            owner_id: Only search resumes of this user (exact scan of their rows)
+            exclude_id: Resume id to leave out (the query resume itself)
+            nprobe: Inverted lists to scan (defaults to NPROBE)
+
+        Returns:
+            (resume id, cosine similarity) pairs, most similar first
+        """
+        with self.lock:
+            if not self._refresh():
+                return []
+            meta, arrays = self.meta, self.arrays
+        count = meta['count']
+        ids = arrays['ids.i64']
+        vectors = arrays['vectors.f32']
+
+        if owner_id is not None:
+            rows = np.flatnonzero(arrays['owners.i64'][:count] == owner_id)
+            ranges = [(rows, None)]
+        else:
+            ranges = []
+            if meta['nlist']:
+                probes = np.argsort(-(arrays['centroids'] @ vector))[:nprobe or get_semantic_setting('NPROBE')]
+                offsets = arrays['offsets']
+                ranges += [(None, (offsets[probe], offsets[probe + 1])) for probe in probes]
+                start = meta['sorted']
+            else:
+                start = 0
+            # Unsorted tail (and the whole index while it is untrained), scanned in chunks
+            ranges += [
+                (None, (chunk, min(chunk + SCAN_CHUNK_ROWS, count)))
+                for chunk in range(start, count, SCAN_CHUNK_ROWS)
+            ]
+
+        found_ids, found_scores = [], []
+        for rows, span in ranges:
+            if span is not None:
+                rows = np.arange(*span)
+                # Contiguous slices are views of the mapped pages, no copy
+                block_ids, block_vectors = ids[span[0]:span[1]], vectors[span[0]:span[1]]
+            else:
+                block_ids, block_vectors = ids[rows], vectors[rows]
+            if not len(rows):
+                continue
+            scores = block_vectors @ vector
+            keep = (block_ids != 0) & (block_ids != (exclude_id or 0))
+            if len(scores) > limit:
+                keep &= scores >= np.partition(scores, -limit)[-limit]
+            found_ids.append(np.asarray(block_ids[keep]))
+            found_scores.append(scores[keep])
+        if not found_ids:
+            return []
+        found_ids, found_scores = np.concatenate(found_ids), np.concatenate(found_scores)
+        order = np.lexsort((-found_ids, -found_scores))[:limit]
+        return [(int(found_ids[i]), round(float(found_scores[i]), 4)) for i in order]
+
+
+_readers: Dict[str, SemanticIndexReader] = {}
+_readers_lock = threading.Lock()
+
+
+def get_reader() -> SemanticIndexReader:
+    """The process-wide reader of the configured index directory."""
+    root = get_index_dir()
+    with _readers_lock:
+        reader = _readers.get(str(root))
+        if reader is None:
+            reader = _readers[str(root)] = SemanticIndexReader(root)
+    return reader
+
+
+def index_dim() -> int:
+    """Dimension of the existing index (embeddings must match it), else DIM."""
+    meta = _read_meta(get_index_dir())
+    return meta['dim'] if meta else get_semantic_setting('DIM')
+
+
+def embed_resumes(resume_ids: Iterable[int]) -> List[Tuple[int, int, np.ndarray]]:
+    """(resume id, owner id, embedding) rows for some resumes."""
+    dim = index_dim()
+    return [
+        (resume_id, owner_id, embed_fields(fields, dim))
+        for resume_id, (owner_id, fields) in load_documents(resume_ids).items()
+    ]
+
+
+def index_resume(resume: models.Resume) -> None:
+    """Embed a parsed resume and append it to the index (replacing its old row)."""
+    try:
+        append_vectors(embed_resumes([resume.id]))
+    except Exception as e:
+        logger.warning(f"Could not update the semantic index for resume {resume.id}: {str(e)}")
+
+
+def maybe_compact() -> bool:
+    """
+    Apply pending deletions and compact the index if needed (called by idle
+    workers). Returns True if it was compacted.
+    """
+    try:
+        apply_deletions()
+        if not needs_compaction(_read_meta(get_index_dir())):
+            return False
+        compact()
+        return True
+    except Exception as e:
+        logger.error(f"Semantic index compaction failed: {str(e)}")
+        return False
+
+
+def similar_resumes(
+    vector: np.ndarray,
+    limit: Optional[int] = None,
+    owner_id: Optional[int] = None,
+    exclude_id: Optional[int] = None,
+) -> List[Tuple[int, float]]:
+    """
+    Resumes most similar to an embedding.
+
+    Args:
+        vector: Query embedding (see embed_resumes and embed_text)
+        limit: Number of results (defaults to DEFAULT_LIMIT, capped at MAX_LIMIT)
+        owner_id: Only search resumes of this user (None searches all)
+        exclude_id: Resume id to leave out
+
+    Returns:
+        (resume id, cosine similarity) pairs, most similar first
+    """
+    limit = min(max(limit or get_semantic_setting('DEFAULT_LIMIT'), 1), get_semantic_setting('MAX_LIMIT'))
+    return get_reader().search(vector, limit, owner_id=owner_id, exclude_id=exclude_id)
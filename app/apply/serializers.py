@@ -1,7 +1,9 @@
 from rest_framework import serializers
 from . import models
-from .utils import extract_text_from_file
-from .resume_parser import process_resume_with_gemini
+from .direct_upload import ALLOWED_TYPES, get_upload_setting
+from .utils import SharedBuffer
+from .resume_parser import clone_resume_data, find_stored_copy
+from .resume_queue import get_processing_setting, process_resume, process_upload, set_status, store_upload
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,16 +12,22 @@ logger = logging.getLogger(__name__)
 class ResumeSerializer(serializers.ModelSerializer):
     """
     Serializer for Resume model.
-    Automatically handles user assignment, text extraction, and file upload to R2.
+    Automatically handles user assignment, file upload to R2 and queueing for processing.
     """
     user = serializers.PrimaryKeyRelatedField(read_only=True)
     file_url = serializers.SerializerMethodField(read_only=True)
     
     class Meta:
         model = models.Resume
-        fields = ['id', 'user', 'file', 'file_url', 'text_extracted', 'created_at']
-        read_only_fields = ['id', 'user', 'created_at', 'file_url', 'text_extracted']
+        fields = ['id', 'user', 'file', 'file_url', 'text_extracted', 'status', 'status_message', 'created_at']
+        read_only_fields = ['id', 'user', 'created_at', 'file_url', 'text_extracted', 'status', 'status_message']
     
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Listings leave out the (large) extracted text, which their queryset defers
+        if self.context.get('omit_text'):
+            self.fields.pop('text_extracted')
+
     def get_file_url(self, obj):
         """Return the full URL of the uploaded file from R2"""
         if obj.file:
@@ -31,15 +39,15 @@ class ResumeSerializer(serializers.ModelSerializer):
     
     def validate_file(self, value):
         """Validate the uploaded file"""
-        # Check file size (max 10MB)
-        max_size = 10 * 1024 * 1024  # 10MB
+        # Check file size (max 10MB, shared with direct uploads)
+        max_size = get_upload_setting('MAX_FILE_SIZE')
         if value.size > max_size:
             raise serializers.ValidationError(
                 f'File size too large. Maximum size is {max_size / (1024*1024)}MB'
             )
         
         # Check file extension
-        allowed_extensions = ['.pdf', '.doc', '.docx']
+        allowed_extensions = list(ALLOWED_TYPES)
         file_name = value.name.lower()
         if not any(file_name.endswith(ext) for ext in allowed_extensions):
             raise serializers.ValidationError(
@@ -51,65 +59,143 @@ class ResumeSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         """
         Create a new resume instance.
-        Extracts text from the file before saving to R2.
+        The file is saved to R2 and the resume is queued for processing;
+        extraction and Gemini parsing run in the worker (see resume_queue.py).
         """
         # Get the user from the request context
         user = self.context['request'].user
         validated_data['user'] = user
-        
-        # Get the file from validated_data
-        file = validated_data.get('file')
-        
-        # Extract text from the file BEFORE saving
-        # This way if extraction fails, we can still save the file
-        extracted_text = ""
-        if file:
-            try:
-                # Reset file pointer to beginning (in case it was read during validation)
-                file.seek(0)
-                extracted_text = extract_text_from_file(file)
-                
-                # Reset file pointer again after extraction (needed for saving)
-                file.seek(0)
-                
-                if not extracted_text:
-                    logger.warning(f"Text extraction returned empty for file: {file.name}")
-            except Exception as e:
-                logger.error(f"Error during text extraction for {file.name}: {str(e)}")
-                # Continue with empty text - don't break the upload
-                extracted_text = ""
-        
-        # Set the extracted text
-        validated_data['text_extracted'] = extracted_text
-        
-        # File will automatically be saved to R2 via the storage backend
-        # Create the resume instance
+
+        # Large uploads are spooled to disk by Django (FILE_UPLOAD_MAX_MEMORY_SIZE) and
+        # mapped once: hashing, extraction and the R2 upload all read that one buffer
+        with SharedBuffer(validated_data['file']) as upload:
+            return self._create(validated_data, upload)
+
+    def _create(self, validated_data, upload):
+        content_hash = upload.sha256()
+        validated_data['content_hash'] = content_hash
+
+        # The user uploaded identical bytes before: reuse the stored object instead
+        # of writing another copy to R2
+        stored_copy = find_stored_copy(content_hash, validated_data['user'].id)
+        if stored_copy:
+            validated_data['file'] = stored_copy.file.name
+
+        if stored_copy and stored_copy.status == models.Resume.Status.DONE:
+            # Already parsed: copy text and related rows, no extraction or Gemini call
+            resume = super().create(validated_data)
+            if clone_resume_data(stored_copy, resume):
+                set_status(resume, models.Resume.Status.DONE)
+                logger.info(f"Resume {resume.id} is a duplicate of resume {stored_copy.id}, reused parsed data")
+                return resume
+            # Cloning failed, fall back to regular processing
+            logger.warning(f"Could not reuse parsed data for resume {resume.id}, queueing it")
+            if get_processing_setting('MODE') == 'inline':
+                process_resume(resume)
+            return resume
+
+        if get_processing_setting('MODE') == 'inline':
+            # No worker running (e.g. local development): process within the request
+            if not stored_copy:
+                # Overlap the R2 upload with extraction and the Gemini call
+                validated_data.pop('file')
+                return process_upload(validated_data, upload)
+            # The object is already stored: only extraction and parsing are left
+            validated_data['status'] = models.Resume.Status.EXTRACTING
+            validated_data['attempts'] = 1
+            resume = super().create(validated_data)
+            process_resume(resume, file=upload.open())
+            return resume
+
+        if not stored_copy:
+            # Store the file in R2 first (timed), the row then only references it
+            validated_data['file'] = store_upload(upload)
         resume = super().create(validated_data)
-        
-        # Process with Gemini and populate related models
-        # Do this after saving so we have the resume ID
-        if extracted_text and extracted_text.strip():
-            try:
-                # Process in background or async if needed, but for now do it synchronously
-                # This might take a few seconds, but ensures data is populated
-                success = process_resume_with_gemini(resume)
-                if not success:
-                    logger.warning(f"Gemini processing failed for resume {resume.id}, but resume was saved")
-            except Exception as e:
-                logger.error(f"Error processing resume with Gemini: {str(e)}")
-                # Don't fail the upload if Gemini processing fails
-                # The resume is already saved, we just couldn't parse it
-        else:
-            logger.info(f"Resume {resume.id} has no extracted text, skipping Gemini processing")
-        
+        logger.info(f"Resume {resume.id} queued for processing")
         return resume
 
+
+class ResumeStatusSerializer(serializers.ModelSerializer):
+    """Lightweight serializer reporting the processing progress of a resume."""
+
+    class Meta:
+        model = models.Resume
+        fields = [
+            'id', 'status', 'status_message', 'attempts', 'extractor', 'extraction_score',
+            'tokens_raw', 'tokens_normalized', 'parse_source', 'parse_confidence', 'created_at', 'updated_at',
+        ]
+        read_only_fields = fields
+
+
+class ResumeSearchResultSerializer(serializers.ModelSerializer):
+    """Full-text search hit: the resume with its rank and a highlighted snippet."""
+    rank = serializers.FloatField(read_only=True)
+    snippet = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = models.Resume
+        fields = ['id', 'status', 'parse_source', 'created_at', 'rank', 'snippet']
+        read_only_fields = fields
+
+
 class ExperienceSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.Experience
         fields = '__all__'
 
+class EducationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.Education
+        fields = '__all__'
+
+class SkillSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.Skill
+        fields = '__all__'
+
+class LanguageProficiencySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.LanguageProficiency
+        fields = '__all__'
+
+class CertificationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.Certification
+        fields = '__all__'
+
 class ProjectSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.Project
-        fields = '__all__' 
\ No newline at end of file
+        fields = '__all__'
+
+
+# Related names of the parsed sections nested by ResumeProfileSerializer
+PROFILE_RELATIONS = ['experiences', 'educations', 'skills', 'languages', 'certifications', 'projects']
+
+
+class ResumeProfileSerializer(ResumeSerializer):
+    """
+    Resume with its parsed sections nested.
+    Querysets must prefetch PROFILE_RELATIONS, otherwise every resume costs
+    one query per section.
+
+    Pass ``expand`` in the context to nest only some of the sections.
+    """
+    experiences = ExperienceSerializer(many=True, read_only=True)
+    educations = EducationSerializer(many=True, read_only=True)
+    skills = SkillSerializer(many=True, read_only=True)
+    languages = LanguageProficiencySerializer(many=True, read_only=True)
+    certifications = CertificationSerializer(many=True, read_only=True)
+    projects = ProjectSerializer(many=True, read_only=True)
+
+    class Meta(ResumeSerializer.Meta):
+        fields = ResumeSerializer.Meta.fields + ['parse_source', 'parse_confidence', 'parser_version'] + PROFILE_RELATIONS
+        read_only_fields = fields
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        expand = self.context.get('expand')
+        if expand is not None:
+            for relation in PROFILE_RELATIONS:
+                if relation not in expand:
+                    self.fields.pop(relation)
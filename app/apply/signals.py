@@ -0,0 +1,20 @@
+"""
+Model signal handlers of the apply app (connected in ApplyConfig.ready).
+"""
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from . import models, semantic_index
+
+
+@receiver(post_delete, sender=models.Resume)
+def record_resume_deletion(sender, instance, **kwargs):
+    """
+    Leave a tombstone so every process drops the resume from its match index,
+    and remove it from the semantic index once the deletion is committed.
+    """
+    models.ResumeDeletion.objects.create(resume_id=instance.id)
+    transaction.on_commit(partial(semantic_index.remove_resume, instance.id))
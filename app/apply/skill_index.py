@@ -0,0 +1,206 @@
+"""
+Canonical skill dictionary and the skill -> resume inverted index.
+
+Free-text skill names ("Python", "python3", "Python (Django)") are mapped
+to canonical skills through SkillAlias. ResumeSkill links every resume to
+its canonical skills; its (skill, resume) unique index is the posting list
+of a skill, so "who knows X and Y" is an index lookup instead of a
+case-insensitive scan over Skill.name.
+"""
+import logging
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db.models import Count, Q, QuerySet
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+_parenthetical_re = re.compile(r'\(([^)]*)\)')
+_version_re = re.compile(r'^(?P<base>[a-z][a-z+#.\- ]{2,}?)\s*v?\d+(?:\.\d+)*$')
+_spaces_re = re.compile(r'\s+')
+
+MAX_NAME_LENGTH = 100
+
+
+def skill_key(name: str) -> str:
+    """Normalized lookup key of a skill name (case, width and spacing folded)."""
+    key = unicodedata.normalize('NFKC', name or '').lower()
+    return _spaces_re.sub(' ', key).strip(' .,;:-*')[:MAX_NAME_LENGTH]
+
+
+def split_skill_name(name: str) -> List[str]:
+    """
+    Split a free-text skill into the skills it names.
+    "Python (Django, Flask)" -> ["Python", "Django", "Flask"]
+    """
+    names = [_parenthetical_re.sub('', name)]
+    for inner in _parenthetical_re.findall(name):
+        names += re.split(r'\s*[,/;]\s*', inner)
+    return [part.strip() for part in names if part and part.strip()]
+
+
+def candidate_keys(name: str) -> List[str]:
+    """Keys to look up for a name: the exact key, then without a trailing version ("python3")."""
+    key = skill_key(name)
+    keys = [key] if key else []
+    match = _version_re.match(key)
+    if match:
+        keys.append(match.group('base').strip())
+    return keys
+
+
+def canonicalize_skills(names: Iterable[str]) -> Dict[str, models.CanonicalSkill]:
+    """
+    Resolve free-text skill names to canonical skills, creating unknown ones.
+
+    Unknown skills get a canonical entry named after their first spelling and
+    an alias for their key. Safe to run concurrently: inserts ignore
+    conflicts and the result is read back.
+
+    Returns:
+        Mapping of normalized key to CanonicalSkill, covering every name
+    """
+    wanted: Dict[str, Tuple[str, List[str]]] = {}  # primary key -> (display name, candidate keys)
+    for name in names:
+        for part in split_skill_name(name or ''):
+            keys = candidate_keys(part)
+            if keys and keys[0] not in wanted:
+                wanted[keys[0]] = (part[:MAX_NAME_LENGTH], keys)
+    if not wanted:
+        return {}
+
+    all_keys = {key for _name, keys in wanted.values() for key in keys}
+    resolved = _lookup_aliases(all_keys)
+
+    missing = {
+        primary: display for primary, (display, keys) in wanted.items()
+        if not any(key in resolved for key in keys)
+    }
+    if missing:
+        models.CanonicalSkill.objects.bulk_create(
+            [models.CanonicalSkill(name=display, key=primary) for primary, display in missing.items()],
+            ignore_conflicts=True,
+        )
+        created = models.CanonicalSkill.objects.filter(key__in=list(missing))
+        models.SkillAlias.objects.bulk_create(
+            [models.SkillAlias(key=skill.key, skill=skill) for skill in created],
+            ignore_conflicts=True,
+        )
+        resolved.update(_lookup_aliases(set(missing)))
+
+    result = {}
+    for primary, (_display, keys) in wanted.items():
+        skill = next((resolved[key] for key in keys if key in resolved), None)
+        if skill is not None:
+            result[primary] = skill
+    return result
+
+
+def _lookup_aliases(keys) -> Dict[str, models.CanonicalSkill]:
+    aliases = models.SkillAlias.objects.filter(key__in=list(keys)).select_related('skill')
+    return {alias.key: alias.skill for alias in aliases}
+
+
+def sync_resume_skills(resume: models.Resume) -> Tuple[int, int]:
+    """
+    Rebuild the posting list entries of one resume from its Skill rows.
+
+    Returns:
+        (links created, links deleted)
+    """
+    names = models.Skill.objects.filter(resume=resume).values_list('name', flat=True)
+    wanted_ids = {skill.id for skill in canonicalize_skills(names).values()}
+    existing_ids = set(models.ResumeSkill.objects.filter(resume=resume).values_list('skill_id', flat=True))
+
+    to_create = wanted_ids - existing_ids
+    to_delete = existing_ids - wanted_ids
+    if to_delete:
+        models.ResumeSkill.objects.filter(resume=resume, skill_id__in=to_delete).delete()
+    if to_create:
+        models.ResumeSkill.objects.bulk_create(
+            [models.ResumeSkill(resume=resume, skill_id=skill_id) for skill_id in to_create],
+            ignore_conflicts=True,
+        )
+    return len(to_create), len(to_delete)
+
+
+def link_resume_skills(names_by_resume: Dict[int, List[str]]) -> int:
+    """
+    Create the posting list entries of many new resumes at once (bulk imports);
+    one dictionary lookup for all names instead of sync_resume_skills per resume.
+
+    Args:
+        names_by_resume: Mapping of resume id to its Skill names
+
+    Returns:
+        Number of links created
+    """
+    resolved = canonicalize_skills(name for names in names_by_resume.values() for name in names)
+    links = set()
+    for resume_id, names in names_by_resume.items():
+        for name in names:
+            for part in split_skill_name(name or ''):
+                keys = candidate_keys(part)
+                if keys and keys[0] in resolved:
+                    links.add((resume_id, resolved[keys[0]].id))
+    models.ResumeSkill.objects.bulk_create(
+        [models.ResumeSkill(resume_id=resume_id, skill_id=skill_id) for resume_id, skill_id in links],
+        ignore_conflicts=True,
+    )
+    return len(links)
+
+
+def resolve_query_skills(names: Iterable[str]) -> Tuple[List[models.CanonicalSkill], List[str]]:
+    """
+    Resolve query skill names without creating anything.
+
+    Returns:
+        (canonical skills found, names that match no known skill)
+    """
+    skills = []
+    unknown = []
+    for name in names:
+        keys = candidate_keys(name)
+        resolved = _lookup_aliases(keys)
+        skill = next((resolved[key] for key in keys if key in resolved), None)
+        if skill is None:
+            unknown.append(name)
+        elif skill not in skills:
+            skills.append(skill)
+    return skills, unknown
+
+
+def resumes_with_skills(
+    resumes: QuerySet,
+    all_skills: List[models.CanonicalSkill],
+    any_skills: Optional[List[models.CanonicalSkill]] = None,
+) -> QuerySet:
+    """
+    Intersect skill posting lists.
+
+    Args:
+        resumes: Resumes to search in (e.g. the user's resumes)
+        all_skills: Every one of these skills is required (AND)
+        any_skills: At least one of these skills is required (OR)
+
+    Returns:
+        Ids of the matching resumes, newest first
+    """
+    any_skills = any_skills or []
+    all_ids = [skill.id for skill in all_skills]
+    any_ids = [skill.id for skill in any_skills]
+    postings = models.ResumeSkill.objects.filter(
+        resume__in=resumes, skill_id__in=all_ids + any_ids,
+    ).values('resume_id')
+    postings = postings.annotate(
+        matched_all=Count('skill_id', filter=Q(skill_id__in=all_ids), distinct=True),
+        matched_any=Count('skill_id', filter=Q(skill_id__in=any_ids), distinct=True),
+    )
+    if all_ids:
+        postings = postings.filter(matched_all=len(all_ids))
+    if any_ids:
+        postings = postings.filter(matched_any__gte=1)
+    return postings.order_by('-resume_id').values_list('resume_id', flat=True)
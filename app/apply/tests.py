@@ -1,3 +1,1369 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+import boto3
+import requests
+from docx import Document
+from google.api_core import exceptions as google_exceptions
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.db import connection
+from django.test import AsyncClient, Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from moto import mock_aws
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import matching, metrics, models, resume_queue, semantic_index
+from .extraction_benchmark import compare_to_baseline, corpus_fingerprint, generate_corpus
+from .gemini_batch import parse_resumes_with_gemini, plan_batches, split_batch_response
+from .gemini_cache import GeminiCache, make_cache_key
+from .gemini_client import CircuitBreaker, CircuitOpenError, GeminiClient
+from .gemini_service import strip_code_fences
+from .gemini_stream import IncrementalResumeParser, stream_resume_with_gemini
+from .resume_parser import PARSER_VERSION, parse_resume_text
+from .resume_queue import StorageUnavailable
+from .resume_search import update_search_vectors
+from .resume_writer import MODE_APPEND, MODE_REPLACE, SECTIONS, ResumeGraphWriter
+from .section_segmenter import (
+    LOCAL_CONFIDENCE_SEGMENTED,
+    LOCAL_CONFIDENCE_UNSEGMENTED,
+    parse_resume_locally,
+    segment_resume,
+)
+from .serializers import PROFILE_RELATIONS
+from .skill_index import canonicalize_skills, sync_resume_skills
+from .text_normalizer import estimate_tokens, normalize_resume_text
+from .text_quality import score_text_quality
+from .utils import PAGE_BREAK, SharedBuffer, compute_file_hash, extract_pdf, iter_pdf_pages, _pypdf2_pages
+
+
+def use_local_storage(test_case) -> str:
+    """Store files in a temporary directory for the duration of a test; returns the directory."""
+    root = tempfile.mkdtemp()
+    test_case.addCleanup(shutil.rmtree, root, ignore_errors=True)
+    settings_override = test_case.settings(STORAGES={
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage', 'OPTIONS': {'location': root}},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    })
+    settings_override.enable()
+    test_case.addCleanup(settings_override.disable)
+    return root
+
+
+def docx_bytes(text: str) -> bytes:
+    document = Document()
+    document.add_paragraph(text)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def fake_pdf_extractor(pages, fail_at=None):
+    """Page generator over a list of page texts, raising at page index fail_at."""
+    def extract(stream, start_page):
+        for index in range(start_page, len(pages)):
+            if index == fail_at:
+                raise ValueError('broken page')
+            yield index, pages[index]
+    return extract
+
+
+class ResumeQueueTests(TestCase):
+    def setUp(self):
+        use_local_storage(self)
+        self.user = get_user_model().objects.create_user(
+            username='owner', email='owner@example.com', password='secret-password',
+        )
+
+    def create_resume(self, **fields):
+        return models.Resume.objects.create(user=self.user, file='resumes/missing.pdf', **fields)
+
+    def test_claim_takes_the_oldest_queued_resumes_once(self):
+        first, second, third = [self.create_resume() for _ in range(3)]
+        self.create_resume(status=models.Resume.Status.DONE)
+
+        claimed = resume_queue.claim_resumes(limit=2)
+        self.assertEqual([resume.id for resume in claimed], [first.id, second.id])
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.attempts), (models.Resume.Status.EXTRACTING, 1))
+        self.assertIsNotNone(first.locked_at)
+
+        self.assertEqual([resume.id for resume in resume_queue.claim_resumes(limit=2)], [third.id])
+        self.assertEqual(resume_queue.claim_resumes(limit=2), [])
+
+    def test_requeue_stale_resumes(self):
+        abandoned = timezone.now() - timedelta(hours=1)
+        retried = self.create_resume(status=models.Resume.Status.PARSING, attempts=1, locked_at=abandoned)
+        exhausted = self.create_resume(status=models.Resume.Status.EXTRACTING, attempts=3, locked_at=abandoned)
+        running = self.create_resume(status=models.Resume.Status.EXTRACTING, attempts=1, locked_at=timezone.now())
+
+        self.assertEqual(resume_queue.requeue_stale_resumes(), 2)
+        statuses = dict(models.Resume.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[retried.id], models.Resume.Status.QUEUED)
+        self.assertEqual(statuses[exhausted.id], models.Resume.Status.FAILED)
+        self.assertEqual(statuses[running.id], models.Resume.Status.EXTRACTING)
+
+    def test_failed_attempt_is_requeued_by_the_worker(self):
+        self.create_resume()
+        resume = resume_queue.claim_resumes()[0]
+        self.assertFalse(resume_queue.process_resume(resume))
+        resume.refresh_from_db()
+        self.assertEqual(resume.status, models.Resume.Status.QUEUED)
+        self.assertTrue(resume.status_message.startswith('Could not read file'))
+
+    @override_settings(RESUME_PROCESSING={'MODE': 'inline'})
+    def test_failed_attempt_is_not_requeued_inline(self):
+        # No worker would ever pick a requeued resume up
+        resume = self.create_resume(status=models.Resume.Status.EXTRACTING, attempts=1)
+        self.assertFalse(resume_queue.process_resume(resume))
+        resume.refresh_from_db()
+        self.assertEqual(resume.status, models.Resume.Status.FAILED)
+
+
+@override_settings(RESUME_PROCESSING={'MODE': 'queue'})
+class ResumeDeduplicationTests(TestCase):
+    CONTENT = docx_bytes('Jane Doe\nSkills\nPython')
+
+    def setUp(self):
+        self.storage_dir = use_local_storage(self)
+        self.user = get_user_model().objects.create_user(
+            username='owner', email='owner@example.com', password='secret-password',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, user=None):
+        if user is not None:
+            self.client.force_authenticate(user)
+        response = self.client.post('/api/resumes/', {'file': SimpleUploadedFile('cv.docx', self.CONTENT)})
+        self.assertIn(response.status_code, (201, 202))
+        return models.Resume.objects.get(id=response.json()['id'])
+
+    def stored_files(self):
+        return [name for _root, _dirs, names in os.walk(self.storage_dir) for name in names]
+
+    def test_queued_duplicate_reuses_the_stored_file(self):
+        first = self.upload()
+        second = self.upload()
+        self.assertEqual(second.content_hash, hashlib.sha256(self.CONTENT).hexdigest())
+        self.assertEqual((second.file.name, second.status), (first.file.name, models.Resume.Status.QUEUED))
+        self.assertEqual(len(self.stored_files()), 1)
+
+    def test_processed_duplicate_is_cloned(self):
+        first = self.upload()
+        models.Skill.objects.create(resume=first, name='Python')
+        models.Resume.objects.filter(id=first.id).update(
+            status=models.Resume.Status.DONE, text_extracted='Jane Doe', parser_version=PARSER_VERSION,
+        )
+
+        second = self.upload()
+        self.assertEqual(second.status, models.Resume.Status.DONE)
+        self.assertEqual((second.text_extracted, second.parser_version), ('Jane Doe', PARSER_VERSION))
+        self.assertEqual(list(second.skills.values_list('name', flat=True)), ['Python'])
+
+    def test_worker_finishes_a_queued_duplicate_by_cloning(self):
+        first, second = self.upload(), self.upload()
+        models.Resume.objects.filter(id=first.id).update(status=models.Resume.Status.DONE, text_extracted='Jane Doe')
+        self.assertTrue(resume_queue.process_resume(second))
+        second.refresh_from_db()
+        self.assertEqual((second.status, second.text_extracted), (models.Resume.Status.DONE, 'Jane Doe'))
+
+    def test_other_users_uploads_are_not_reused(self):
+        first = self.upload()
+        models.Resume.objects.filter(id=first.id).update(status=models.Resume.Status.DONE, text_extracted='Jane Doe')
+        other = get_user_model().objects.create_user(
+            username='other', email='other@example.com', password='secret-password',
+        )
+        theirs = self.upload(user=other)
+        self.assertEqual((theirs.status, theirs.text_extracted), (models.Resume.Status.QUEUED, ''))
+        self.assertNotEqual(theirs.file.name, first.file.name)
+        self.assertEqual(len(self.stored_files()), 2)
+
+
+class GeminiCacheTests(TestCase):
+    TEXT = 'Jane Doe\nSenior Engineer  at ACME'
+    PARSED = {'skills': ['Python']}
+
+    def setUp(self):
+        self.cache = GeminiCache()
+
+    def events(self, event):
+        return metrics._values.get(metrics._key('gemini_cache_events_total', {'event': event}), 0)
+
+    def test_miss_then_database_then_local_hit(self):
+        misses, db_hits, local_hits = self.events('misses'), self.events('db_hits'), self.events('local_hits')
+        self.assertIsNone(self.cache.get(self.TEXT, 'model', 'v1'))
+        self.cache.set(self.TEXT, 'model', 'v1', self.PARSED)
+
+        # Another process: empty local tier, served from the table
+        self.assertEqual(GeminiCache().get(self.TEXT, 'model', 'v1'), self.PARSED)
+        with self.assertNumQueries(0):
+            cached = self.cache.get(self.TEXT, 'model', 'v1')
+        self.assertEqual(cached, self.PARSED)
+        cached['skills'].append('Go')  # callers get copies
+        self.assertEqual(self.cache.get(self.TEXT, 'model', 'v1'), self.PARSED)
+
+        self.assertEqual(self.events('misses'), misses + 1)
+        self.assertEqual(self.events('db_hits'), db_hits + 1)
+        self.assertEqual(self.events('local_hits'), local_hits + 2)
+
+    def test_key_folds_whitespace_and_unicode_forms_but_not_case(self):
+        key = make_cache_key(self.TEXT, 'model', 'v1')
+        self.assertEqual(make_cache_key(' Jane\u00a0Doe Senior\tEngineer at ACME\n', 'model', 'v1'), key)
+        self.assertNotEqual(make_cache_key(self.TEXT.lower(), 'model', 'v1'), key)
+        self.assertNotEqual(make_cache_key(self.TEXT, 'other-model', 'v1'), key)
+        self.assertNotEqual(make_cache_key(self.TEXT, 'model', 'v2'), key)
+
+    def test_prompt_version_invalidation_and_expiry(self):
+        self.cache.set(self.TEXT, 'model', 'v1', self.PARSED)
+        self.cache.set(self.TEXT, 'model', 'v2', self.PARSED)
+        self.assertEqual(self.cache.invalidate('v1'), 1)
+        self.assertIsNone(self.cache.get(self.TEXT, 'model', 'v1'))
+        self.assertEqual(self.cache.get(self.TEXT, 'model', 'v2'), self.PARSED)
+
+        models.GeminiResponseCache.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertIsNone(GeminiCache().get(self.TEXT, 'model', 'v2'))
+        self.assertEqual(self.cache.evict(), 1)
+
+
+class ResumeGraphWriterTests(TestCase):
+    PARSED = {
+        'experiences': [{'title': 'Engineer', 'company': 'Acme', 'start_date': 'Jan 2020'}],
+        'educations': [{'institution': 'University', 'degree': 'BSc'}],
+        'skills': ['Python', 'Python', ''],
+        'languages': [{'language': 'English', 'level': 'C2'}],
+        'certifications': [],
+        'projects': [{'name': 'Search'}],
+    }
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            username='owner', email='owner@example.com', password='secret-password',
+        )
+        self.resume = models.Resume.objects.create(user=user, file='resumes/cv.pdf')
+
+    def write(self, parsed, mode=MODE_REPLACE):
+        return ResumeGraphWriter(self.resume).write(parsed, mode=mode, update_indexes=False)
+
+    def test_replace_is_idempotent(self):
+        first = self.write(self.PARSED)
+        self.assertEqual(first.created['skills'], 2)
+        self.assertEqual(first.rows_written, 6)
+
+        # One diff query per section and no writes (plus the savepoint of the nested atomic block)
+        with self.assertNumQueries(len(SECTIONS) + 2):
+            second = self.write(self.PARSED)
+        self.assertEqual(second.rows_written, 0)
+        self.assertEqual(second.unchanged['skills'], 2)
+        self.assertEqual(models.Skill.objects.filter(resume=self.resume).count(), 2)
+
+    def test_replace_only_touches_changed_rows(self):
+        self.write(self.PARSED)
+        experience_id = models.Experience.objects.get(resume=self.resume).id
+        result = self.write(dict(self.PARSED, skills=['Python', 'Go']))
+        self.assertEqual(result.created, dict.fromkeys(SECTIONS, 0) | {'skills': 1})
+        self.assertEqual(result.deleted, dict.fromkeys(SECTIONS, 0) | {'skills': 1})
+        self.assertEqual(models.Experience.objects.get(resume=self.resume).id, experience_id)
+        self.assertEqual(
+            sorted(models.Skill.objects.filter(resume=self.resume).values_list('name', flat=True)),
+            ['Go', 'Python'],
+        )
+
+    def test_append_inserts_every_row(self):
+        self.write(self.PARSED, mode=MODE_APPEND)
+        result = self.write(self.PARSED, mode=MODE_APPEND)
+        self.assertEqual(result.created['experiences'], 1)
+        self.assertEqual(models.Experience.objects.filter(resume=self.resume).count(), 2)
+        with self.assertRaises(ValueError):
+            self.write(self.PARSED, mode='merge')
+
+
+class GeminiClientTests(SimpleTestCase):
+    def make_client(self, *side_effect, model_names=('model-a',), max_retries=2):
+        with mock.patch('google.generativeai.configure'):
+            client = GeminiClient(
+                api_key='AIza-test', model_names=model_names, max_retries=max_retries,
+                backoff_base=1.0, backoff_max=4.0, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60),
+            )
+        client._model = mock.Mock()
+        client._model.generate_content.side_effect = side_effect
+        # Real delays are jittered, the retries themselves are what is tested
+        client.backoff_delay = mock.Mock(return_value=0)
+        return client
+
+    def test_breaker_opens_probes_and_closes(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow_request())
+
+        breaker.opened_at -= 60
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())  # one probe at a time
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        breaker.opened_at -= 60
+        self.assertTrue(breaker.allow_request())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(breaker.failures, 0)
+
+    def test_backoff_is_capped_full_jitter(self):
+        client = self.make_client()
+        del client.backoff_delay
+        for attempt, cap in ((0, 1.0), (1, 2.0), (5, 4.0)):
+            with mock.patch('apply.gemini_client.random.uniform', side_effect=lambda low, high: high):
+                self.assertEqual(client.backoff_delay(attempt), cap)
+
+    def test_transient_errors_are_retried_with_backoff(self):
+        response = mock.Mock(text='{}')
+        client = self.make_client(google_exceptions.ServiceUnavailable('busy'), response)
+        self.assertIs(client.generate_content('prompt'), response)
+        client.backoff_delay.assert_called_once_with(0)
+        self.assertEqual(client.breaker.failures, 0)
+
+    def test_exhausted_retries_count_as_one_breaker_failure(self):
+        client = self.make_client(*[google_exceptions.ServiceUnavailable('busy')] * 3)
+        with self.assertRaises(google_exceptions.ServiceUnavailable):
+            client.generate_content('prompt')
+        self.assertEqual(client.backoff_delay.call_count, 2)
+        self.assertEqual(client.breaker.failures, 1)
+
+        client._model.generate_content.side_effect = [google_exceptions.ServiceUnavailable('busy')] * 3
+        with self.assertRaises(google_exceptions.ServiceUnavailable):
+            client.generate_content('prompt')
+        with self.assertRaises(CircuitOpenError):
+            client.generate_content('prompt')
+        self.assertFalse(client.available)
+
+    def test_client_errors_are_not_retried(self):
+        client = self.make_client(google_exceptions.InvalidArgument('bad prompt'))
+        with self.assertRaises(google_exceptions.InvalidArgument):
+            client.generate_content('prompt')
+        client.backoff_delay.assert_not_called()
+        self.assertEqual(client.breaker.failures, 0)
+
+    def test_missing_model_falls_back_to_the_next_one(self):
+        client = self.make_client(google_exceptions.NotFound('no such model'), model_names=('model-a', 'model-b'))
+        with mock.patch('google.generativeai.GenerativeModel') as model_class:
+            response = model_class.return_value.generate_content.return_value
+            self.assertIs(client.generate_content('prompt'), response)
+        model_class.assert_called_once_with('model-b')
+        self.assertEqual(client.model_name, 'model-b')
+        client.backoff_delay.assert_not_called()
+
+    def test_stream_errors_are_recorded_when_read(self):
+        def chunks():
+            yield mock.Mock(text='{"skills": [')
+            raise google_exceptions.ServiceUnavailable('stream reset')
+
+        client = self.make_client(chunks())
+        response = client.generate_content('prompt', stream=True)
+        self.assertEqual(client.breaker.failures, 0)
+        with self.assertRaises(google_exceptions.ServiceUnavailable):
+            list(response)
+        self.assertEqual(client.breaker.failures, 1)
+
+
+@override_settings(GEMINI_BATCH={'MAX_DOCUMENTS': 3, 'MAX_CHARS': 100, 'SINGLE_DOCUMENT_CHARS': 60})
+class GeminiBatchTests(SimpleTestCase):
+    def test_plan_batches(self):
+        documents = {'long': 'x' * 60, 'a': 'x' * 50, 'b': 'x' * 40, 'c': 'x' * 30, 'd': 'x' * 5, 'e': 'x' * 5}
+        self.assertEqual(plan_batches(documents), [['long'], ['a', 'b', 'd'], ['c', 'e']])
+        self.assertEqual(plan_batches({}), [])
+
+    def test_split_batch_response(self):
+        response = '```json\n' + json.dumps([
+            {'id': '1', 'data': {'skills': ['Python']}},
+            {'id': 2, 'data': 'not an object'},
+            {'id': '3', 'data': {'skills': ['Go']}},
+            {'id': '1', 'data': {'skills': ['duplicate']}},
+            {'id': '99', 'data': {}},
+        ]) + '\n```'
+        self.assertEqual(split_batch_response(response, [1, 2, 3]), {1: {'skills': ['Python']}, 3: {'skills': ['Go']}})
+        self.assertEqual(split_batch_response('{"id": 1}', [1]), {})
+        self.assertEqual(split_batch_response('[{"id": 1,', [1]), {})
+
+    @mock.patch('apply.gemini_batch.get_gemini_client', return_value=None)
+    @mock.patch('apply.gemini_batch.parse_resume_with_gemini', side_effect=lambda text, use_cache: {'single': text})
+    @mock.patch('apply.gemini_batch.parse_resume_batch_with_gemini', return_value={1: {'batch': 1}})
+    def test_missing_batch_entries_fall_back_to_single_calls(self, parse_batch, parse_single, _client):
+        results = parse_resumes_with_gemini({1: 'first', 2: 'second', 3: ' ', 4: 'x' * 60}, use_cache=False)
+        self.assertEqual(results, {1: {'batch': 1}, 2: {'single': 'second'}, 3: None, 4: {'single': 'x' * 60}})
+        parse_batch.assert_called_once_with({1: 'first', 2: 'second'})
+        self.assertEqual(parse_single.call_count, 2)
+
+
+class PdfPageBudgetTests(SimpleTestCase):
+    PAGES = ['page one', 'page two', 'page three', 'page four']
+
+    def read(self, extractors, **budgets):
+        return list(iter_pdf_pages(io.BytesIO(b'%PDF-1.4'), extractors=extractors, **budgets))
+
+    def test_page_budget_stops_early(self):
+        pages = self.read([('fast', fake_pdf_extractor(self.PAGES))], max_pages=2, max_chars=0)
+        self.assertEqual([page.number for page in pages], [1, 2])
+        self.assertTrue(all(page.seconds >= 0 for page in pages))
+
+    def test_character_budget_truncates_the_last_page(self):
+        pages = self.read([('fast', fake_pdf_extractor(self.PAGES))], max_pages=0, max_chars=12)
+        self.assertEqual([page.text for page in pages], ['page one', 'page'])
+
+    @override_settings(RESUME_EXTRACTION={'MAX_PAGES': 3, 'MAX_CHARS': 0})
+    def test_budgets_default_to_settings(self):
+        self.assertEqual(len(self.read([('fast', fake_pdf_extractor(self.PAGES))])), 3)
+
+    def test_fallback_resumes_from_the_failing_page(self):
+        fallback = mock.Mock(side_effect=fake_pdf_extractor(['fallback'] * 4))
+        pages = self.read([('fast', fake_pdf_extractor(self.PAGES, fail_at=2)), ('slow', fallback)], max_pages=0, max_chars=0)
+        self.assertEqual(
+            [(page.number, page.extractor, page.text) for page in pages],
+            [(1, 'fast', 'page one'), (2, 'fast', 'page two'), (3, 'slow', 'fallback'), (4, 'slow', 'fallback')],
+        )
+        self.assertEqual(fallback.call_args[0][1], 2)
+
+
+class PdfQualityEscalationTests(SimpleTestCase):
+    CLEAN = '\n'.join(f'Senior Software Engineer at Acme Corporation, {year} - {year + 1}' for year in range(2000, 2015))
+    GARBLED = '\n'.join('S e n i o r (cid:12)(cid:7) E n g i n e e r �' for _ in range(15))
+
+    def extract(self, fast_text, accurate_text):
+        fast = mock.Mock(side_effect=fake_pdf_extractor([fast_text]))
+        accurate = mock.Mock(side_effect=fake_pdf_extractor([accurate_text]))
+        with mock.patch('apply.utils.FAST_PDF_EXTRACTORS', [('pypdf2', fast)]), \
+                mock.patch('apply.utils.ACCURATE_PDF_EXTRACTORS', [('pdfplumber', accurate)]):
+            return extract_pdf(io.BytesIO(b'%PDF-1.4')), accurate
+
+    def test_scores(self):
+        self.assertEqual(score_text_quality(self.CLEAN), 1.0)
+        self.assertLess(score_text_quality(self.GARBLED), 0.5)
+        self.assertLess(score_text_quality(self.CLEAN, page_count=4), score_text_quality(self.CLEAN))
+        self.assertEqual(score_text_quality('  \n'), 0.0)
+
+    def test_clean_text_stays_on_the_fast_path(self):
+        result, accurate = self.extract(self.CLEAN, self.CLEAN)
+        self.assertEqual((result.extractor, result.score), ('pypdf2', 1.0))
+        accurate.assert_not_called()
+
+    def test_poor_text_escalates_to_the_better_extractor(self):
+        result, accurate = self.extract(self.GARBLED, self.CLEAN)
+        self.assertEqual((result.extractor, result.text), ('pdfplumber', self.CLEAN))
+
+        result, accurate = self.extract(self.GARBLED, '')
+        accurate.assert_called_once()
+        self.assertEqual((result.extractor, result.text), ('pypdf2', self.GARBLED))
+
+
+class ExtractionBenchmarkTests(SimpleTestCase):
+    def corpus(self, seed=42):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        with mock.patch('apply.extraction_benchmark.DOCUMENT_SHAPES', [('short', 2, 0.5)]):
+            return generate_corpus(Path(directory), seed=seed, copies=1)
+
+    def test_corpus_is_reproducible_and_extractable(self):
+        corpus = self.corpus()
+        self.assertEqual([path.name for path in corpus], ['short-0.pdf', 'short-0.docx', 'short-0.doc'])
+        self.assertEqual(corpus_fingerprint(corpus), corpus_fingerprint(self.corpus()))
+        self.assertNotEqual(corpus_fingerprint(corpus), corpus_fingerprint(self.corpus(seed=7)))
+
+        pdf = SimpleUploadedFile('short-0.pdf', corpus[0].read_bytes())
+        pages = list(iter_pdf_pages(pdf, max_pages=0, max_chars=0, extractors=[('pypdf2', _pypdf2_pages)]))
+        self.assertEqual(len(pages), 2)
+        self.assertTrue(all(page.text.strip() for page in pages))
+
+    def test_compare_to_baseline(self):
+        baseline = {'docx': {
+            'p50_ms': 10.0, 'p95_ms': 20.0, 'peak_rss_mb': 100.0, 'docs_per_second': 50.0, 'output_chars': 1000,
+        }}
+        within = dict(baseline['docx'], p50_ms=11.0, docs_per_second=45.0)
+        self.assertEqual(compare_to_baseline({'docx': within, 'doc': within}, baseline, tolerance=0.2), [])
+
+        regressed = dict(baseline['docx'], p95_ms=30.0, docs_per_second=30.0, output_chars=900)
+        self.assertEqual(compare_to_baseline({'docx': regressed}, baseline, tolerance=0.2), [
+            'docx: p95_ms 20.0 -> 30.0',
+            'docx: docs_per_second 50.0 -> 30.0',
+            'docx: output_chars 1000 -> 900',
+        ])
+
+
+class TextNormalizerTests(SimpleTestCase):
+    def test_normalize_resume_text(self):
+        pages = [
+            'Jane Doe  jane@example.com\nCURRICULUM VITAE\n• Built a high-per-\nformance ﬁle   indexer\n'
+            'Python | Python | Go\nPython | Python | Go\nPage 1 of 2',
+            'Jane Doe  jane@example.com\nAcme Corp  Engineer\n\n\n\nReferences available upon request\nPage 2 of 2',
+        ]
+        result = normalize_resume_text(PAGE_BREAK.join(pages))
+        self.assertEqual(result.text, (
+            'Jane Doe jane@example.com\n- Built a high-performance file indexer\nPython | Go\n\nAcme Corp Engineer'
+        ))
+        self.assertEqual(result.tokens_after, estimate_tokens(result.text))
+        self.assertLess(result.tokens_after, result.tokens_before)
+
+    def test_single_page_keeps_its_edges(self):
+        self.assertEqual(normalize_resume_text('Jane Doe\nEngineer').text, 'Jane Doe\nEngineer')
+        self.assertEqual(normalize_resume_text(''), ('', 0, 0))
+
+
+class LocalResumeParserTests(SimpleTestCase):
+    RESUME = (
+        'Jane Doe\njane@example.com\n\n'
+        'Summary\nBackend engineer.\n\n'
+        'Work Experience:\nSenior Engineer at Acme Corp\nMar 2020 - Present\n- Built the billing service\n'
+        'Engineer | Globex\n01/2017 - 02/2020\n\n'
+        'EDUCATION\nUniversity of Somewhere\nBSc Computer Science\n2013 - 2017\n\n'
+        'Technical Skills\nLanguages: Python, Go; SQL\nPython | Docker\n\n'
+        'Languages\nEnglish (Native), Spanish - B2\n\n'
+        'Certifications\nAWS Solutions Architect - Amazon 2021\n\n'
+        'Projects\nResume parser https://github.com/jane/parser\nTechnologies: Django, Gemini\n\n'
+        'Hobbies\nChess, climbing\n'
+    )
+
+    def test_segment_resume(self):
+        segmentation = segment_resume(self.RESUME)
+        self.assertEqual(segmentation.header, 'Jane Doe\njane@example.com')
+        self.assertEqual(segmentation.found_sections, [
+            'experiences', 'educations', 'skills', 'languages', 'certifications', 'projects',
+        ])
+        self.assertTrue(segmentation.is_confident)
+        self.assertFalse(segment_resume('Jane Doe\nSkills\nPython').is_confident)
+
+        prompt_text = segmentation.prompt_text()
+        self.assertTrue(prompt_text.startswith('Jane Doe\njane@example.com\n\nSummary\nBackend engineer.'))
+        self.assertIn('Work Experience:\nSenior Engineer at Acme Corp', prompt_text)
+        self.assertNotIn('Chess', prompt_text)
+
+    @mock.patch('apply.resume_parser.parse_resume_with_gemini', return_value={'projects': [{'name': 'Search'}]})
+    def test_gemini_gets_every_section_the_segmenter_missed(self, parse):
+        text = (
+            'Jane Doe\n\nExperience\nEngineer at Acme\n2020 - 2023\n\n'
+            'Skills\nPython\n\nSelected Work\nSearch engine for job posts\n\nInterests\nChess\n'
+        )
+        parsed_data, source, _confidence = parse_resume_text(text)
+        self.assertEqual((parsed_data, source), ({'projects': [{'name': 'Search'}]}, models.Resume.ParseSource.GEMINI))
+        prompt_text = parse.call_args.args[0]
+        self.assertEqual(parse.call_args.kwargs, {})  # the full schema, including projects
+        self.assertIn('Jane Doe', prompt_text)
+        self.assertIn('Selected Work\nSearch engine for job posts', prompt_text)
+        self.assertNotIn('Chess', prompt_text)
+
+    def test_parse_resume_locally(self):
+        parsed = parse_resume_locally(self.RESUME)
+        self.assertEqual(parsed['confidence'], LOCAL_CONFIDENCE_SEGMENTED)
+        self.assertEqual(
+            [(e['title'], e['company'], e['start_date'], e['end_date']) for e in parsed['experiences']],
+            [('Senior Engineer', 'Acme Corp', '2020-03-01', None), ('Engineer', 'Globex', '2017-01-01', '2020-02-01')],
+        )
+        self.assertEqual(parsed['experiences'][0]['description'], '- Built the billing service')
+        self.assertEqual(parsed['educations'][0]['institution'], 'University of Somewhere')
+        self.assertEqual(parsed['educations'][0]['degree'], 'BSc Computer Science')
+        self.assertEqual(parsed['skills'], ['Python', 'Go', 'SQL', 'Docker'])
+        self.assertEqual(parsed['languages'], [
+            {'language': 'English', 'level': 'Native'}, {'language': 'Spanish', 'level': 'B2'},
+        ])
+        self.assertEqual(parsed['certifications'], [
+            {'name': 'AWS Solutions Architect', 'issuer': 'Amazon', 'date_obtained': '2021-01-01'},
+        ])
+        self.assertEqual(parsed['projects'][0]['url'], 'https://github.com/jane/parser')
+        self.assertEqual(parsed['projects'][0]['technologies'], 'Django, Gemini')
+
+    def test_unsegmented_text(self):
+        parsed = parse_resume_locally('Jane Doe, engineer')
+        self.assertEqual(parsed['confidence'], LOCAL_CONFIDENCE_UNSEGMENTED)
+        self.assertEqual(parsed['experiences'], [])
+
+
+class IncrementalResumeParserTests(SimpleTestCase):
+    DATA = {
+        'name': 'Jane "JD" Doe',
+        'experiences': [
+            {'title': 'Engineer {backend}', 'company': 'Acme [EU]', 'description': 'Line\\none\n"quoted"'},
+            {'title': 'Intern', 'company': 'Globex', 'details': {'team': 'Search'}},
+        ],
+        'interests': ['chess'],
+        'skills': ['C++', 'a "quoted" \\ skill', 'Go'],
+    }
+
+    def feed_in_chunks(self, text, size):
+        parser = IncrementalResumeParser()
+        emitted = []
+        for start in range(0, len(text), size):
+            for item in parser.feed(text[start:start + size]):
+                emitted.append((start + size, item))
+        return parser, emitted
+
+    def test_items_are_emitted_once_complete(self):
+        text = '```json\n' + json.dumps(self.DATA, indent=2) + '\n```'
+        for size in (1, 7, len(text)):
+            parser, emitted = self.feed_in_chunks(text, size)
+            self.assertEqual([item for _end, item in emitted], [
+                ('experiences', self.DATA['experiences'][0]),
+                ('experiences', self.DATA['experiences'][1]),
+                ('skills', 'C++'),
+                ('skills', 'a "quoted" \\ skill'),
+                ('skills', 'Go'),
+            ])
+            self.assertEqual(json.loads(strip_code_fences(parser.text)), self.DATA)
+
+        # With one-character chunks every item is emitted by the chunk that closes it
+        _parser, emitted = self.feed_in_chunks(text, 1)
+        first_end = text.index('}', text.index('Acme [EU]')) + 1
+        self.assertEqual(emitted[0][0], first_end)
+
+    @mock.patch('apply.gemini_stream.get_gemini_client')
+    def test_stream_resume_with_gemini(self, get_client):
+        text = json.dumps(self.DATA)
+        get_client.return_value.generate_content.return_value = [
+            mock.Mock(text=text[start:start + 10]) for start in range(0, len(text), 10)
+        ]
+        items = []
+        parsed = stream_resume_with_gemini('Jane Doe resume', lambda section, item: items.append(section), use_cache=False)
+        self.assertEqual(parsed, self.DATA)
+        self.assertEqual(items, ['experiences', 'experiences', 'skills', 'skills', 'skills'])
+        self.assertTrue(get_client.return_value.generate_content.call_args.kwargs['stream'])
+
+
+class ResumeProfileQueryBudgetTests(TestCase):
+    """Nested resume responses must cost a constant number of queries."""
+
+    # 1 query for the resumes + 1 per prefetched section
+    EXPANDED_QUERIES = 1 + len(PROFILE_RELATIONS)
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='owner', email='owner@example.com', password='secret-password',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_resume(self):
+        resume = models.Resume.objects.create(
+            user=self.user, file='resumes/cv.pdf', status=models.Resume.Status.DONE,
+        )
+        for index in range(2):
+            models.Experience.objects.create(resume=resume, title=f'Engineer {index}', company='Acme')
+            models.Education.objects.create(resume=resume, institution=f'University {index}')
+            models.Skill.objects.create(resume=resume, name=f'Skill {index}')
+            models.LanguageProficiency.objects.create(resume=resume, language=f'Language {index}')
+            models.Certification.objects.create(resume=resume, name=f'Certificate {index}')
+            models.Project.objects.create(resume=resume, name=f'Project {index}')
+        return resume
+
+    def test_profile_query_budget(self):
+        resume = self.create_resume()
+        with self.assertNumQueries(self.EXPANDED_QUERIES):
+            response = self.client.get(f'/api/resumes/{resume.id}/profile/')
+        self.assertEqual(response.status_code, 200)
+        for relation in PROFILE_RELATIONS:
+            self.assertEqual(len(response.data[relation]), 2)
+
+    def test_expanded_list_query_budget_is_constant(self):
+        for resume_count in (1, 5):
+            for _ in range(resume_count - models.Resume.objects.count()):
+                self.create_resume()
+            with self.assertNumQueries(self.EXPANDED_QUERIES):
+                response = self.client.get('/api/resumes/?expand=all')
+            self.assertEqual(response.status_code, 200)
+
+    def test_expand_subset(self):
+        self.create_resume()
+        with self.assertNumQueries(1 + 2):
+            response = self.client.get('/api/resumes/?expand=skills,projects')
+        resume_data = response.json()['results'][0]
+        self.assertEqual(len(resume_data['skills']), 2)
+        self.assertEqual(len(resume_data['projects']), 2)
+        self.assertNotIn('experiences', resume_data)
+
+    def test_list_without_expand_is_not_nested(self):
+        self.create_resume()
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/resumes/')
+        self.assertNotIn('experiences', response.json()['results'][0])
+
+
+class ResumeKeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='owner', email='owner@example.com', password='secret-password',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.resumes = [
+            models.Resume.objects.create(user=self.user, file=f'resumes/cv{index}.pdf', text_extracted='text')
+            for index in range(5)
+        ]
+
+    def test_pages_cover_every_resume_newest_first(self):
+        seen = []
+        url = '/api/resumes/?page_size=2'
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            data = response.json()
+            self.assertLessEqual(len(data['results']), 2)
+            self.assertNotIn('text_extracted', data['results'][0])
+            seen += [row['id'] for row in data['results']]
+            url = data['next']
+        expected = sorted(self.resumes, key=lambda resume: (resume.created_at, resume.id), reverse=True)
+        self.assertEqual(seen, [resume.id for resume in expected])
+
+    def test_previous_link_returns_the_earlier_page(self):
+        first = self.client.get('/api/resumes/?page_size=2').json()
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).json()
+        back = self.client.get(second['previous']).json()
+        self.assertEqual(back['results'], first['results'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/resumes/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+
+class ResumeSearchTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='owner', email='owner@example.com', password='secret-password',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_resume(self, text, parsed, user=None):
+        resume = models.Resume.objects.create(
+            user=user or self.user, file='resumes/cv.pdf', status=models.Resume.Status.DONE, text_extracted=text,
+        )
+        # The writer refreshes the search vector after every write
+        ResumeGraphWriter(resume).write(parsed)
+        return resume
+
+    def search(self, query):
+        return self.client.get('/api/resumes/search/', {'q': query})
+
+    def test_missing_terms(self):
+        self.assertEqual(self.search('  ').status_code, 400)
+
+    @skipIf(connection.vendor == 'postgresql', 'search is available on PostgreSQL')
+    def test_unavailable_without_postgresql(self):
+        resume = self.create_resume('Python developer', {'skills': ['Python']})
+        self.assertEqual(update_search_vectors(models.Resume.objects.filter(pk=resume.pk)), 0)
+        response = self.search('python')
+        self.assertEqual(response.status_code, 501)
+        self.assertEqual(response.json(), {'error': 'Full-text search requires PostgreSQL'})
+
+    @skipUnless(connection.vendor == 'postgresql', 'full-text search requires PostgreSQL')
+    def test_weighted_ranking_and_snippets(self):
+        mentioned = self.create_resume('Team lead. Some scripting in Python for reports.', {'skills': ['Excel']})
+        skilled = self.create_resume('Backend engineer building Python services.', {
+            'skills': ['Python', 'Django'], 'experiences': [{'title': 'Python Engineer'}],
+        })
+        self.create_resume('Python Python Python', {'skills': ['Python']}, user=get_user_model().objects.create_user(
+            username='other', email='other@example.com', password='secret-password',
+        ))
+        self.create_resume('Java developer', {'skills': ['Java']})
+
+        results = self.search('python').json()['results']
+        self.assertEqual([result['id'] for result in results], [skilled.id, mentioned.id])
+        self.assertGreater(results[0]['rank'], results[1]['rank'])
+        self.assertIn('<mark>Python</mark>', results[0]['snippet'])
+
+        self.assertEqual([result['id'] for result in self.search('python -excel').json()['results']], [skilled.id])
+
+    @skipUnless(connection.vendor == 'postgresql', 'full-text search requires PostgreSQL')
+    def test_vector_follows_rewrites(self):
+        resume = self.create_resume('Engineer', {'skills': ['Rust']})
+        self.assertEqual(len(self.search('rust').json()['results']), 1)
+        ResumeGraphWriter(resume).write({'skills': ['Go']})
+        self.assertEqual(self.search('rust').json()['results'], [])
+        self.assertEqual(len(self.search('go').json()['results']), 1)
+
+
+class SkillIndexTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='owner', email='owner@example.com', password='secret-password',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_resume(self, *skill_names):
+        resume = models.Resume.objects.create(user=self.user, file='resumes/cv.pdf')
+        for name in skill_names:
+            models.Skill.objects.create(resume=resume, name=name)
+        sync_resume_skills(resume)
+        return resume
+
+    def test_spellings_map_to_one_canonical_skill(self):
+        skills = canonicalize_skills(['python3', 'Python (Django)', 'PY', 'golang'])
+        self.assertEqual({skill.name for skill in skills.values()}, {'Python', 'Django', 'Go'})
+
+    def test_all_and_any_queries(self):
+        both = self.create_resume('Python 3', 'Django', 'AWS')
+        python_only = self.create_resume('python', 'k8s')
+        self.create_resume('Java')
+
+        response = self.client.get('/api/resumes/by-skills/?all=python&any=amazon web services,kubernetes')
+        self.assertEqual([row['id'] for row in response.json()['results']], [python_only.id, both.id])
+
+        response = self.client.get('/api/resumes/by-skills/?all=python,django')
+        self.assertEqual([row['id'] for row in response.json()['results']], [both.id])
+        self.assertEqual(response.json()['skills']['all'], ['Python', 'Django'])
+
+        response = self.client.get('/api/resumes/by-skills/?all=python,cobol')
+        self.assertEqual(response.json()['results'], [])
+        self.assertEqual(response.json()['skills']['unknown'], ['cobol'])
+
+
+class ResumeMatchingTests(TestCase):
+    def setUp(self):
+        matching.reset_match_index()
+        self.user = get_user_model().objects.create_user(
+            username='owner', email='owner@example.com', password='secret-password',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_resume(self, text, skills=(), titles=(), user=None):
+        resume = models.Resume.objects.create(
+            user=user or self.user, file='resumes/cv.pdf', text_normalized=text, status=models.Resume.Status.DONE,
+        )
+        for name in skills:
+            models.Skill.objects.create(resume=resume, name=name)
+        for title in titles:
+            models.Experience.objects.create(resume=resume, title=title, company='Acme')
+        matching.index_resume(resume)
+        return resume
+
+    def match(self, job_description):
+        response = self.client.post('/api/resumes/match/', {'job_description': job_description}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_ranks_resumes_with_score_breakdown(self):
+        backend = self.create_resume('Built APIs in Python and Django', ['Python', 'Django'], ['Backend Engineer'])
+        frontend = self.create_resume('Built user interfaces with React', ['React', 'CSS'], ['Frontend Developer'])
+        results = self.match('Backend engineer: Python, Django, PostgreSQL')
+
+        self.assertEqual([row['resume']['id'] for row in results], [backend.id])
+        self.assertEqual(set(results[0]['breakdown']), {'text', 'skills', 'titles'})
+        self.assertIn('django', results[0]['matched_terms']['skills'])
+        self.assertNotIn(frontend.id, [row['resume']['id'] for row in self.match('Python')])
+
+    def test_new_resumes_are_indexed_incrementally(self):
+        self.create_resume('Python developer', ['Python'])
+        self.assertEqual(len(self.match('Go engineer')), 0)
+        gopher = self.create_resume('Go engineer', ['Go'], ['Go Engineer'])
+        self.assertEqual([row['resume']['id'] for row in self.match('Go engineer')], [gopher.id])
+
+    def test_other_users_resumes_are_not_matched(self):
+        other = get_user_model().objects.create_user(
+            username='other', email='other@example.com', password='secret-password',
+        )
+        self.create_resume('Python developer', ['Python'], user=other)
+        self.assertEqual(self.match('Python developer'), [])
+
+        # Staff users are scoped to their own resumes as well
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.match('Python developer'), [])
+
+    def test_refresh_drops_deleted_and_requeued_resumes(self):
+        deleted, requeued, kept = [self.create_resume('Python developer', ['Python']) for _ in range(3)]
+        index = matching.refresh_match_index()
+        self.assertEqual(len(index), 3)
+
+        deleted.delete()
+        requeued.status = models.Resume.Status.QUEUED
+        requeued.save()
+        # Tombstones and changed rows only, no scan of every processed resume
+        with self.assertNumQueries(2):
+            matching.refresh_match_index()
+        self.assertEqual([row['resume']['id'] for row in self.match('Python developer')], [kept.id])
+
+        # Nothing changed: the refresh reads nothing
+        with self.assertNumQueries(2):
+            matching.refresh_match_index()
+        self.assertEqual(len(index), 1)
+
+
+class SemanticIndexTests(TestCase):
+    BACKEND = ('Python Django REST APIs PostgreSQL backend services', ['Python', 'Django'], ['Backend Engineer'])
+    FRONTEND = ('React TypeScript CSS user interfaces design systems', ['React', 'CSS'], ['Frontend Developer'])
+
+    def setUp(self):
+        index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, index_dir, ignore_errors=True)
+        settings_override = self.settings(SEMANTIC_INDEX={'DIR': index_dir, 'MIN_TRAIN_ROWS': 4, 'NPROBE': 2})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = get_user_model().objects.create_user(
+            username='owner', email='owner@example.com', password='secret-password',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.backend = [self.create_resume(*self.BACKEND) for _ in range(3)]
+        self.frontend = [self.create_resume(*self.FRONTEND) for _ in range(3)]
+
+    def create_resume(self, text, skills, titles, user=None):
+        resume = models.Resume.objects.create(
+            user=user or self.user, file='resumes/cv.pdf', text_normalized=text, status=models.Resume.Status.DONE,
+        )
+        for name in skills:
+            models.Skill.objects.create(resume=resume, name=name)
+        for title in titles:
+            models.Experience.objects.create(resume=resume, title=title, company='Acme')
+        semantic_index.index_resume(resume)
+        return resume
+
+    def similar_ids(self, resume, limit=2):
+        response = self.client.get(f'/api/resumes/{resume.id}/similar/?limit={limit}')
+        self.assertEqual(response.status_code, 200)
+        return {row['resume']['id'] for row in response.json()['results']}
+
+    def test_similar_to_resume(self):
+        self.assertEqual(self.similar_ids(self.backend[0]), {resume.id for resume in self.backend[1:]})
+
+    def test_similar_to_job_post(self):
+        response = self.client.post(
+            '/api/resumes/similar/', {'text': 'Frontend developer: React, TypeScript', 'limit': 3}, format='json',
+        )
+        self.assertEqual({row['resume']['id'] for row in response.json()['results']}, {r.id for r in self.frontend})
+
+    def test_other_users_resumes_are_not_returned(self):
+        other = get_user_model().objects.create_user(
+            username='other', email='other@example.com', password='secret-password',
+        )
+        theirs = self.create_resume(*self.BACKEND, user=other)
+        own = {resume.id for resume in self.backend + self.frontend}
+        self.assertEqual(self.similar_ids(self.backend[0], limit=10), own - {self.backend[0].id})
+
+        # Staff users are scoped to their own resumes as well
+        self.user.is_staff = True
+        self.user.save()
+        self.assertNotIn(theirs.id, self.similar_ids(self.backend[0], limit=10))
+        response = self.client.post('/api/resumes/similar/', {'text': self.BACKEND[0], 'limit': 10}, format='json')
+        self.assertEqual({row['resume']['id'] for row in response.json()['results']}, own)
+
+    def test_reindex_and_compaction(self):
+        semantic_index.index_resume(self.backend[0])
+        meta = semantic_index.compact()
+        self.assertEqual((meta['count'], meta['removed'], meta['nlist']), (6, 0, 2))
+        self.assertEqual(self.similar_ids(self.frontend[0]), {resume.id for resume in self.frontend[1:]})
+
+    def test_deleted_resumes_are_removed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.backend[1].delete()
+        self.assertEqual(self.similar_ids(self.backend[0]), {self.backend[2].id})
+
+        # A deletion the index missed is caught up from its tombstone by the worker
+        models.ResumeDeletion.objects.create(resume_id=self.backend[2].id)
+        self.assertTrue(semantic_index.maybe_compact())
+        self.assertEqual(self.similar_ids(self.backend[0]) & {r.id for r in self.backend}, set())
+
+
+S3_STORAGES = {
+    'default': {
+        'BACKEND': 'storages.backends.s3.S3Storage',
+        'OPTIONS': {
+            'access_key': 'testing',
+            'secret_key': 'testing',
+            'bucket_name': 'resumes-test',
+            'region_name': 'us-east-1',
+            'signature_version': 's3v4',
+        },
+    },
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+@override_settings(STORAGES=S3_STORAGES, RESUME_PROCESSING={'MODE': 'queue'})
+class DirectUploadTests(TestCase):
+    """Presigned uploads against moto's in-memory S3."""
+
+    def setUp(self):
+        aws = mock_aws()
+        aws.start()
+        self.addCleanup(aws.stop)
+        self.s3 = boto3.client('s3', region_name='us-east-1', aws_access_key_id='testing', aws_secret_access_key='testing')
+        self.s3.create_bucket(Bucket='resumes-test')
+
+        self.user = get_user_model().objects.create_user(
+            username='owner', email='owner@example.com', password='secret-password',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, content, content_type='application/pdf', file_name='cv.pdf'):
+        response = self.client.post('/api/resumes/upload-url/', {
+            'file_name': file_name, 'content_type': content_type, 'size': len(content),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        upload = response.json()
+        stored = requests.post(upload['url'], data=upload['fields'], files={'file': (file_name, content)})
+        return upload, stored
+
+    def test_upload_and_finalize(self):
+        upload, stored = self.upload(b'%PDF-1.4 resume')
+        self.assertLess(stored.status_code, 300)
+        key = upload['fields']['key']
+        self.assertTrue(key.startswith('resumes/'))
+
+        response = self.client.post('/api/resumes/finalize/', {'upload_token': upload['upload_token']}, format='json')
+        self.assertEqual(response.status_code, 202)
+        resume = models.Resume.objects.get(id=response.json()['id'])
+        self.assertEqual((resume.file.name, resume.status), (key, models.Resume.Status.QUEUED))
+        self.assertEqual(resume.content_hash, hashlib.sha256(b'%PDF-1.4 resume').hexdigest())
+
+        # Finalizing twice returns the same resume
+        again = self.client.post('/api/resumes/finalize/', {'upload_token': upload['upload_token']}, format='json')
+        self.assertEqual(again.json()['id'], resume.id)
+
+    def test_finalize_rejects_missing_or_foreign_uploads(self):
+        upload = self.client.post('/api/resumes/upload-url/', {'file_name': 'cv.pdf'}, format='json').json()
+        response = self.client.post('/api/resumes/finalize/', {'upload_token': upload['upload_token']}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        other = get_user_model().objects.create_user(
+            username='other', email='other@example.com', password='secret-password',
+        )
+        self.client.force_authenticate(other)
+        response = self.client.post('/api/resumes/finalize/', {'upload_token': upload['upload_token']}, format='json')
+        self.assertEqual(response.json()['error'], 'Invalid upload token')
+
+    def test_invalid_files_are_refused(self):
+        response = self.client.post('/api/resumes/upload-url/', {'file_name': 'cv.exe'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/resumes/upload-url/', {
+            'file_name': 'cv.pdf', 'size': 11 * 1024 * 1024,
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        # Metadata is checked at finalize and invalid objects are deleted
+        upload = self.client.post('/api/resumes/upload-url/', {'file_name': 'cv.pdf'}, format='json').json()
+        key = upload['fields']['key']
+        self.s3.put_object(Bucket='resumes-test', Key=key, Body=b'MZ', ContentType='application/x-msdownload')
+        response = self.client.post('/api/resumes/finalize/', {'upload_token': upload['upload_token']}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.s3.list_objects_v2(Bucket='resumes-test').get('KeyCount'), 0)
+        self.assertFalse(models.Resume.objects.exists())
+
+
+@override_settings(RESUME_PROCESSING={'MODE': 'inline'})
+class ProcessUploadTests(TransactionTestCase):
+    CONTENT = docx_bytes('Jane Doe\nSkills\nPython')
+    PARSED = ({'skills': ['Python']}, models.Resume.ParseSource.GEMINI, 1.0)
+
+    def setUp(self):
+        self.storage_dir = use_local_storage(self)
+        self.user = get_user_model().objects.create_user(
+            username='owner', email='owner@example.com', password='secret-password',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self):
+        return self.client.post('/api/resumes/', {'file': SimpleUploadedFile('cv.docx', self.CONTENT)})
+
+    def stored_files(self):
+        return [name for _root, _dirs, names in os.walk(self.storage_dir) for name in names]
+
+    @mock.patch('apply.resume_queue.parse_resume_text')
+    def test_storage_overlaps_parsing_and_everything_is_committed_once(self, parse):
+        threads = {}
+        save_to_storage = resume_queue.save_to_storage
+
+        def record_thread(stage, function):
+            def run(*args, **kwargs):
+                threads[stage] = threading.current_thread()
+                return function(*args, **kwargs)
+            return run
+
+        parse.side_effect = record_thread('parsing', lambda text: self.PARSED)
+        with mock.patch('apply.resume_queue.save_to_storage', record_thread('upload', save_to_storage)), \
+                mock.patch.object(connection, 'commit', wraps=connection.commit) as commit, \
+                self.assertLogs('apply.resume_queue', 'INFO') as logs:
+            response = self.upload()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(commit.call_count, 1)
+        self.assertNotEqual(threads['upload'], threads['parsing'])
+        resume = models.Resume.objects.get()
+        self.assertEqual(resume.status, models.Resume.Status.DONE)
+        self.assertEqual(self.stored_files(), [os.path.basename(resume.file.name)])
+        self.assertEqual(list(models.Skill.objects.filter(resume=resume).values_list('name', flat=True)), ['Python'])
+        timing = next(line for line in logs.output if 'sequential would take' in line)
+        for stage in ('upload', 'extraction', 'parsing'):
+            self.assertIn(f'{stage} ', timing)
+
+    @mock.patch('apply.resume_queue.parse_resume_text')
+    @mock.patch('apply.resume_queue.save_to_storage', side_effect=OSError('R2 unreachable'))
+    def test_storage_failure_saves_nothing(self, _save, parse):
+        parse.return_value = self.PARSED
+        response = self.upload()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['detail'], StorageUnavailable.default_detail)
+        self.assertFalse(models.Resume.objects.exists())
+
+    @mock.patch('apply.resume_queue.save_parse_result', side_effect=RuntimeError('database went away'))
+    @mock.patch('apply.resume_queue.parse_resume_text')
+    def test_failed_commit_deletes_the_stored_object(self, parse, _save_parse_result):
+        parse.return_value = self.PARSED
+        with self.assertRaises(RuntimeError):
+            self.upload()
+        self.assertFalse(models.Resume.objects.exists())
+        self.assertEqual(self.stored_files(), [])
+
+    @mock.patch('apply.resume_queue.parse_resume_text', return_value=(None, '', None))
+    def test_parse_failure_is_not_left_queued(self, _parse):
+        response = self.upload()
+        self.assertEqual(response.status_code, 202)
+        resume = models.Resume.objects.get()
+        self.assertEqual(resume.status, models.Resume.Status.FAILED)
+        self.assertTrue(resume.text_extracted)
+        self.assertEqual(len(self.stored_files()), 1)
+
+
+class SharedBufferTests(TestCase):
+    CONTENT = b'%PDF-1.4 ' + bytes(range(256)) * 64
+
+    def check_buffer(self, file):
+        with SharedBuffer(file) as buffer:
+            first, second = buffer.open(), buffer.open()
+            self.assertEqual(first.read(9), b'%PDF-1.4 ')
+            # Readers keep their own position over the same mapping
+            self.assertEqual(second.read(), self.CONTENT)
+            self.assertEqual(first.read(), self.CONTENT[9:])
+            self.assertEqual(buffer.sha256(), compute_file_hash(file))
+        return buffer
+
+    def test_in_memory_upload_is_spooled(self):
+        self.assertTrue(self.check_buffer(SimpleUploadedFile('cv.pdf', self.CONTENT)).spooled)
+
+    def test_disk_upload_is_mapped_in_place(self):
+        upload = TemporaryUploadedFile('cv.pdf', 'application/pdf', len(self.CONTENT), None)
+        upload.write(self.CONTENT)
+        self.addCleanup(upload.close)
+        self.assertFalse(self.check_buffer(upload).spooled)
+
+
+class ImportResumesTests(TransactionTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        settings_override = self.settings(
+            STORAGES={
+                'default': {
+                    'BACKEND': 'django.core.files.storage.FileSystemStorage',
+                    'OPTIONS': {'location': os.path.join(self.root, 'media')},
+                },
+                'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+            },
+            SEMANTIC_INDEX={'DIR': os.path.join(self.root, 'index')},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = get_user_model().objects.create_user(
+            username='owner', email='owner@example.com', password='secret-password',
+        )
+
+        self.archive = os.path.join(self.root, 'resumes.zip')
+        with zipfile.ZipFile(self.archive, 'w') as archive:
+            for name, person in [('a/jane.docx', 'Jane'), ('b/john.docx', 'John'), ('b/jane-copy.docx', 'Jane')]:
+                archive.writestr(name, self.docx(person))
+            archive.writestr('broken.pdf', b'%PDF-1.4 no text')
+            archive.writestr('notes.txt', b'not a resume')
+
+    def docx(self, person):
+        document = Document()
+        document.add_paragraph(f'{person} Doe\nExperience\nEngineer at Acme 2019 - 2022\nSkills\nPython, Django')
+        buffer = io.BytesIO()
+        document.save(buffer)
+        return buffer.getvalue()
+
+    def run_import(self, *args):
+        call_command('import_resumes', self.archive, '--user', 'owner', '--workers', '2', *args, stdout=io.StringIO())
+        with open(f'{self.archive}.import.jsonl') as checkpoint_file:
+            return [json.loads(line) for line in checkpoint_file]
+
+    def test_import_and_resume(self):
+        entries = self.run_import()
+        self.assertEqual(
+            {entry['path']: entry['status'] for entry in entries},
+            {'a/jane.docx': 'done', 'b/john.docx': 'done', 'b/jane-copy.docx': 'duplicate', 'broken.pdf': 'failed'},
+        )
+        resumes = models.Resume.objects.filter(user=self.user)
+        self.assertEqual(resumes.filter(status=models.Resume.Status.DONE).count(), 2)
+        self.assertEqual(models.ResumeSkill.objects.filter(resume__in=resumes).count(), 4)
+
+        # Everything is checkpointed: a second run has nothing left to do
+        self.assertEqual(len(self.run_import()), 4)
+        self.assertEqual(len(self.run_import('--retry-failed')), 5)
+        self.assertEqual(resumes.count(), 2)
+
+
+class ReparseResumesTests(TestCase):
+    PARSED = {'skills': ['Python', 'Go'], 'experiences': [{'title': 'Engineer', 'company': 'Acme'}]}
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='owner', email='owner@example.com', password='secret-password',
+        )
+
+    def create_resume(self, parser_version='', **fields):
+        resume = models.Resume.objects.create(
+            user=self.user, file='resumes/cv.pdf', text_normalized='Engineer at Acme, Python',
+            status=models.Resume.Status.DONE, parse_source=models.Resume.ParseSource.GEMINI,
+            parser_version=parser_version, **fields,
+        )
+        models.Experience.objects.create(resume=resume, title='Engineer', company='Acme')
+        models.Skill.objects.create(resume=resume, name='Python')
+        models.Skill.objects.create(resume=resume, name='Perl')
+        return resume
+
+    def reparse(self, result):
+        with mock.patch('apply.resume_reparse.parse_resume_text', return_value=result) as parse:
+            call_command('reparse_resumes', '--rate', '0', '--batch-size', '2', stdout=io.StringIO())
+        return parse.call_count
+
+    def test_only_stale_resumes_are_reparsed(self):
+        stale = [self.create_resume() for _ in range(3)]
+        current = self.create_resume(parser_version=PARSER_VERSION)
+        leased = self.create_resume(locked_at=timezone.now())
+        experience_id = stale[0].experiences.get().id
+
+        self.assertEqual(self.reparse((self.PARSED, models.Resume.ParseSource.GEMINI, 1.0)), 3)
+        for resume in stale:
+            resume.refresh_from_db()
+            self.assertEqual((resume.parser_version, resume.locked_at), (PARSER_VERSION, None))
+            self.assertEqual(sorted(resume.skills.values_list('name', flat=True)), ['Go', 'Python'])
+        # Unchanged rows are kept in place
+        self.assertEqual(stale[0].experiences.get().id, experience_id)
+        self.assertEqual(current.skills.count(), 2)
+        self.assertEqual(models.Resume.objects.get(id=leased.id).parser_version, '')
+
+        self.assertEqual(self.reparse((self.PARSED, models.Resume.ParseSource.GEMINI, 1.0)), 0)
+
+    def test_local_fallback_does_not_replace_gemini_rows(self):
+        resume = self.create_resume()
+        self.reparse((self.PARSED, models.Resume.ParseSource.LOCAL, 0.6))
+        resume.refresh_from_db()
+        self.assertEqual((resume.parser_version, resume.locked_at), ('', None))
+        self.assertEqual(sorted(resume.skills.values_list('name', flat=True)), ['Perl', 'Python'])
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir, ignore_errors=True)
+        settings_override = self.settings(METRICS={'DIR': metrics_dir, 'TOKEN': 'scrape-token'})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def scrape(self, **headers):
+        return self.client.get('/api/internal/metrics/', **headers)
+
+    def test_histogram_exposition(self):
+        # Values are per process: a label of its own keeps other tests' observations out
+        metrics.observe('storage_put_seconds', 0.02, test='exposition')
+        metrics.observe('storage_put_seconds', 3, test='exposition')
+        lines = metrics.render().splitlines()
+        self.assertIn('# TYPE storage_put_seconds histogram', lines)
+        self.assertIn('storage_put_seconds_bucket{test="exposition",le="0.025"} 1', lines)
+        self.assertIn('storage_put_seconds_bucket{test="exposition",le="5"} 2', lines)
+        self.assertIn('storage_put_seconds_bucket{test="exposition",le="+Inf"} 2', lines)
+        self.assertIn('storage_put_seconds_count{test="exposition"} 2', lines)
+
+    def test_endpoint_requires_token_and_records_requests(self):
+        self.assertEqual(self.scrape().status_code, 403)
+        response = self.scrape(HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        self.assertIn('http_request_duration_seconds_count{method="GET",status="403",view="metrics"}', response.content.decode())
+
+    def test_files_of_exited_processes_are_archived(self):
+        root = metrics.get_metrics_dir()
+        root.mkdir(parents=True, exist_ok=True)
+        pid = os.getpid()
+        sample = [['gemini_requests_total', {'model': 'archive-test', 'outcome': 'ok'}, 2]]
+        # Same pid, another start time: a process that exited and whose pid was reused
+        stale = root / f'{pid}-{metrics._process_start_time(pid) + 1}.json'
+        stale.write_text(json.dumps(sample))
+
+        self.assertIn('gemini_requests_total{model="archive-test",outcome="ok"} 2', metrics.render().splitlines())
+        self.assertFalse(stale.exists())
+        self.assertTrue((root / 'archive.json').exists())
+
+
+@override_settings(RESUME_PROCESSING={'MODE': 'queue'})
+class AsyncResumeViewTests(TestCase):
+    def setUp(self):
+        self.storage_dir = use_local_storage(self)
+        self.user = get_user_model().objects.create_user(
+            username='owner', email='owner@example.com', password='secret-password',
+        )
+        self.token = str(AccessToken.for_user(self.user))
+        # Token clients send no CSRF cookie; the views must not require one
+        self.client = Client(enforce_csrf_checks=True, HTTP_AUTHORIZATION=f'JWT {self.token}')
+
+    def upload(self):
+        upload = SimpleUploadedFile('cv.docx', docx_bytes('Jane Doe\nSkills\nPython'))
+        return self.client.post('/api/async/resumes/', {'file': upload})
+
+    def test_upload_detail_and_status(self):
+        response = self.upload()
+        self.assertEqual(response.status_code, 202)
+        resume_id = response.json()['id']
+        self.assertEqual(models.Resume.objects.get(id=resume_id).status, models.Resume.Status.QUEUED)
+
+        response = self.client.get(f'/api/async/resumes/{resume_id}/')
+        self.assertEqual(response.json()['id'], resume_id)
+        response = self.client.get(f'/api/async/resumes/{resume_id}/status/')
+        self.assertEqual(response.json()['status'], models.Resume.Status.QUEUED)
+
+        other = get_user_model().objects.create_user(username='other', email='other@example.com')
+        other_client = Client(HTTP_AUTHORIZATION=f'JWT {AccessToken.for_user(other)}')
+        self.assertEqual(other_client.get(f'/api/async/resumes/{resume_id}/').status_code, 404)
+        self.assertEqual(Client().get(f'/api/async/resumes/{resume_id}/').status_code, 401)
+
+    @override_settings(RESUME_PROCESSING={'MODE': 'queue'})
+    def test_async_and_sync_uploads_share_deduplication(self):
+        content = docx_bytes('Jane Doe\nSkills\nPython')
+        api_client = APIClient()
+        api_client.force_authenticate(self.user)
+        first = api_client.post('/api/resumes/', {'file': SimpleUploadedFile('cv.docx', content)}).json()
+        with mock.patch('apply.async_views.SharedBuffer', wraps=SharedBuffer) as shared_buffer:
+            second = self.client.post('/api/async/resumes/', {'file': SimpleUploadedFile('cv.docx', content)}).json()
+
+        shared_buffer.assert_called_once()
+        first, second = models.Resume.objects.get(id=first['id']), models.Resume.objects.get(id=second['id'])
+        self.assertEqual(second.content_hash, hashlib.sha256(content).hexdigest())
+        self.assertEqual(second.file.name, first.file.name)
+        self.assertEqual(len([name for _root, _dirs, names in os.walk(self.storage_dir) for name in names]), 1)
+
+    async def test_events_with_query_token(self):
+        resume = await models.Resume.objects.acreate(
+            user=self.user, file='resumes/cv.pdf', status=models.Resume.Status.DONE,
+        )
+        client = AsyncClient()
+        self.assertEqual((await client.get(f'/api/resumes/{resume.id}/events/')).status_code, 401)
+
+        response = await client.get(f'/api/resumes/{resume.id}/events/?token={self.token}')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertIn('event: status', body)
+        self.assertIn('"status": "done"', body)
@@ -0,0 +1,139 @@
+"""
+Normalization of extracted resume text before it is sent to Gemini.
+
+Extracted text carries per-page headers and footers, page numbers, runs of
+whitespace, hyphenation breaks and duplicated table cells. None of it helps
+the model, but all of it costs input tokens. The original text stays in
+Resume.text_extracted; the normalized copy goes into Resume.text_normalized.
+"""
+import re
+import unicodedata
+from collections import Counter
+from typing import List, NamedTuple
+
+from .utils import PAGE_BREAK
+
+# Lines within this many non-empty lines of a page edge are header/footer candidates
+EDGE_LINES = 3
+
+# Lines longer than this are content, not headers or footers
+MAX_EDGE_LINE_LENGTH = 100
+
+_page_number_re = re.compile(r'^\s*(?:page\s*)?[-–—]?\s*\d{1,3}\s*(?:(?:of|/)\s*\d{1,3})?\s*[-–—]?\s*$', re.IGNORECASE)
+_hyphen_break_re = re.compile(r'(\w)[-\u00ad]\n[ \t]*([a-z])')
+_spaces_re = re.compile(r'[ \t\u00a0\u2000-\u200b\u202f\u205f\u3000]+')
+_blank_lines_re = re.compile(r'\n{3,}')
+_bullet_re = re.compile(r'^[ \t]*[•●▪■◦○►▶➢✓✔]\s*', re.MULTILINE)
+_digits_re = re.compile(r'\d+')
+
+BOILERPLATE_LINES = {
+    'curriculum vitae',
+    'resume',
+    'résumé',
+    'cv',
+    'confidential',
+    'references available upon request',
+    'references available on request',
+    'references upon request',
+}
+
+
+class NormalizationResult(NamedTuple):
+    text: str
+    tokens_before: int
+    tokens_after: int
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough Gemini token estimate (about four characters per token)."""
+    return (len(text) + 3) // 4
+
+
+def _edge_key(line: str) -> str:
+    """Key used to recognise the same header/footer across pages ("Page 2" == "Page 3")."""
+    return _digits_re.sub('#', line.strip().lower())
+
+
+def _remove_repeated_edges(pages: List[List[str]]) -> List[List[str]]:
+    """Drop header/footer lines that repeat across pages, keeping their first occurrence."""
+    if len(pages) < 2:
+        return pages
+
+    def edge_indexes(lines):
+        content = [i for i, line in enumerate(lines) if line.strip()]
+        return set(content[:EDGE_LINES] + content[-EDGE_LINES:])
+
+    counts = Counter()
+    for lines in pages:
+        counts.update({
+            _edge_key(lines[i]) for i in edge_indexes(lines) if len(lines[i].strip()) <= MAX_EDGE_LINE_LENGTH
+        })
+    threshold = max(2, (len(pages) + 1) // 2)
+    repeated = {key for key, count in counts.items() if count >= threshold}
+
+    seen = set()
+    cleaned = []
+    for lines in pages:
+        edges = edge_indexes(lines)
+        kept = []
+        for i, line in enumerate(lines):
+            key = _edge_key(line)
+            if i in edges and key in repeated:
+                if key in seen:
+                    continue
+                seen.add(key)
+            kept.append(line)
+        cleaned.append(kept)
+    return cleaned
+
+
+def _dedupe_table_cells(line: str) -> str:
+    """Collapse repeated adjacent cells of a table row ("A | A | B" -> "A | B")."""
+    if ' | ' not in line:
+        return line
+    cells = []
+    for cell in line.split(' | '):
+        if not cells or cell != cells[-1]:
+            cells.append(cell)
+    return ' | '.join(cells)
+
+
+def normalize_resume_text(text: str) -> NormalizationResult:
+    """
+    Shrink extracted resume text for the Gemini prompt.
+
+    Steps: Unicode NFKC (ligatures, full-width characters), repeated
+    header/footer removal across pages, page number and boilerplate line
+    removal, hyphenation rejoining, bullet and whitespace collapsing, and
+    duplicate line / table cell removal.
+
+    Args:
+        text: Extracted resume text, pages separated by PAGE_BREAK
+
+    Returns:
+        NormalizationResult with the normalized text and token estimates
+    """
+    if not text:
+        return NormalizationResult("", 0, 0)
+
+    normalized = unicodedata.normalize('NFKC', text).replace('\r\n', '\n').replace('\r', '\n')
+    normalized = _hyphen_break_re.sub(r'\1\2', normalized)
+
+    pages = [page.split('\n') for page in normalized.split(PAGE_BREAK)]
+    pages = _remove_repeated_edges(pages)
+
+    lines = []
+    for page in pages:
+        for line in page:
+            line = _bullet_re.sub('- ', line)
+            line = _spaces_re.sub(' ', line).strip()
+            if _page_number_re.match(line) or line.lower().strip(' :') in BOILERPLATE_LINES:
+                continue
+            line = _dedupe_table_cells(line)
+            if line and lines and line == lines[-1]:
+                continue
+            lines.append(line)
+        lines.append('')
+
+    normalized = _blank_lines_re.sub('\n\n', '\n'.join(lines)).strip()
+    return NormalizationResult(normalized, estimate_tokens(text), estimate_tokens(normalized))
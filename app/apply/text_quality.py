@@ -0,0 +1,101 @@
+"""
+Heuristic quality score for extracted resume text.
+
+Used to decide whether the fast PDF extractor's output is good enough or
+the slower, more accurate one has to run.
+"""
+import re
+import unicodedata
+
+# Non-whitespace characters per page below which a page looks (partly) unreadable
+EXPECTED_CHARS_PER_PAGE = 500
+
+# Line length range (in characters) typical for resume text
+MIN_LINE_LENGTH = 15
+MAX_LINE_LENGTH = 120
+
+# Score weights, summing to 1
+WEIGHTS = {
+    'density': 0.2,
+    'glyphs': 0.3,
+    'words': 0.3,
+    'lines': 0.2,
+}
+
+_cid_re = re.compile(r'\(cid:\d+\)')
+_word_re = re.compile(r'\S+')
+_single_char_words = set('aAI&-–—•|/+·*')
+
+
+def _density_score(text: str, page_count: int) -> float:
+    """Character density: short output for many pages means text was lost."""
+    non_whitespace = len(text) - sum(1 for char in text if char.isspace())
+    return min(1.0, non_whitespace / max(page_count, 1) / EXPECTED_CHARS_PER_PAGE)
+
+
+def _glyph_score(text: str) -> float:
+    """Garbage glyphs: replacement, control, private-use and (cid:N) characters."""
+    garbage = 0
+    for char in text:
+        if char in '\n\r\t\f':
+            continue
+        if char == '\ufffd' or unicodedata.category(char) in ('Cc', 'Co', 'Cn', 'Cs'):
+            garbage += 1
+    garbage += sum(len(match) for match in _cid_re.findall(text))
+    # 10% garbage or more scores zero
+    return max(0.0, 1.0 - 10 * garbage / max(len(text), 1))
+
+
+def _word_score(text: str) -> float:
+    """
+    Word-length distribution: letter-spaced text ("P y t h o n") produces many
+    one-character tokens, missing spaces produce very long ones.
+    """
+    words = _word_re.findall(text)
+    if not words:
+        return 0.0
+    plausible = sum(
+        1 for word in words
+        if 2 <= len(word) <= 25 or (len(word) == 1 and (word in _single_char_words or word.isdigit()))
+    )
+    return plausible / len(words)
+
+
+def _line_score(text: str) -> float:
+    """Line-break structure: average length of non-empty lines within a typical range."""
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return 0.0
+    average = sum(len(line) for line in lines) / len(lines)
+    if average < MIN_LINE_LENGTH:
+        return average / MIN_LINE_LENGTH
+    if average > MAX_LINE_LENGTH:
+        return max(0.0, MAX_LINE_LENGTH / average)
+    return 1.0
+
+
+def score_components(text: str, page_count: int = 1) -> dict:
+    """Return the individual quality components, each between 0 and 1."""
+    if not text or not text.strip():
+        return {name: 0.0 for name in WEIGHTS}
+    return {
+        'density': _density_score(text, page_count),
+        'glyphs': _glyph_score(text),
+        'words': _word_score(text),
+        'lines': _line_score(text),
+    }
+
+
+def score_text_quality(text: str, page_count: int = 1) -> float:
+    """
+    Score extracted text between 0 (unusable) and 1 (clean).
+
+    Args:
+        text: Extracted text
+        page_count: Number of pages the text was extracted from
+
+    Returns:
+        Weighted quality score
+    """
+    components = score_components(text, page_count)
+    return round(sum(WEIGHTS[name] * value for name, value in components.items()), 4)
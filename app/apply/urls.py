@@ -1,7 +1,15 @@
+from django.urls import path
 from rest_framework import routers
-from . import views
+from . import async_views, views
 
 router = routers.DefaultRouter()
 router.register('resumes', views.ResumeViewSet, basename='resume')
 
-urlpatterns = router.urls
\ No newline at end of file
+urlpatterns = [
+    path('resumes/<int:pk>/events/', async_views.resume_events, name='resume-events'),
+    path('internal/metrics/', views.metrics_view, name='metrics'),
+    # Native async variants of the resume endpoints for ASGI deployments
+    path('async/resumes/', async_views.AsyncResumeListView.as_view(), name='async-resume-list'),
+    path('async/resumes/<int:pk>/', async_views.AsyncResumeDetailView.as_view(), name='async-resume-detail'),
+    path('async/resumes/<int:pk>/status/', async_views.AsyncResumeStatusView.as_view(), name='async-resume-status'),
+] + router.urls
\ No newline at end of file
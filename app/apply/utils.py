@@ -1,84 +1,449 @@
 """
 Utility functions for text extraction from resume files.
 """
+import io
 import os
+import mmap
+import time
+import hashlib
 import logging
+import resource
+import tempfile
+import tracemalloc
 from io import BytesIO
 
+from . import metrics
+from .text_quality import score_text_quality
+
 logger = logging.getLogger(__name__)
 
+# Separator between PDF pages in extracted text (form feed), used by the
+# normalizer to find repeated headers and footers
+PAGE_BREAK = "\n\f\n"
 
-def extract_text_from_file(file):
+
+def compute_file_hash(file):
     """
-    Extract text from uploaded resume file.
+    Compute the SHA-256 hex digest of an uploaded file's content.
+    The file is read in chunks and rewound afterwards.
+
+    Args:
+        file: Django UploadedFile (or File) object
+
+    Returns:
+        str: 64 character hex digest
+    """
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+class BufferReader(io.BufferedIOBase):
+    """
+    Seekable read-only file over a shared buffer.
+
+    Every reader keeps its own position, so several consumers (extractors,
+    hashing, the storage upload) can read the same mapping without copying it.
+    """
+
+    def __init__(self, view, name=""):
+        super().__init__()
+        self._view = view
+        self._position = 0
+        self.name = name
+        self.size = len(view)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self._position = offset
+        return offset
+
+    def read(self, size=-1):
+        end = self.size if size is None or size < 0 else min(self._position + size, self.size)
+        data = bytes(self._view[self._position:end]) if end > self._position else b""
+        self._position = max(self._position, end)
+        return data
+
+    read1 = read
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _real_fileno(file):
+    """File descriptor of a disk-backed file (spooled temp files roll over to disk), or None."""
+    try:
+        if hasattr(file, 'flush'):
+            file.flush()
+        return file.fileno()
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        return None
+
+
+class SharedBuffer:
+    """
+    One read-only memory map of an uploaded or stored file.
+
+    Disk-backed files (Django's TemporaryUploadedFile, spooled storage
+    downloads) are mapped directly; in-memory files are first spooled to a
+    temp file in chunks. The mapped pages live in the page cache rather than
+    the process heap, so a 10MB upload costs a few chunks of heap however
+    many readers open() it. Use as a context manager; closing it logs the
+    memory used while it was open.
+    """
+
+    def __init__(self, file):
+        self.name = getattr(file, 'name', '') or ''
+        self._spool = None
+        self._rss_before = _peak_rss_mb()
+        fileno = _real_fileno(file)
+        if fileno is None:
+            self._spool = tempfile.TemporaryFile(prefix='resume-upload-')
+            if hasattr(file, 'chunks'):
+                for chunk in file.chunks():
+                    self._spool.write(chunk)
+            else:
+                file.seek(0)
+                for chunk in iter(lambda: file.read(64 * 1024), b""):
+                    self._spool.write(chunk)
+            self._spool.flush()
+            fileno = self._spool.fileno()
+        self.spooled = self._spool is not None
+        self.size = os.fstat(fileno).st_size
+        self._map = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ) if self.size else None
+        self.view = memoryview(self._map) if self._map is not None else memoryview(b"")
+
+    def open(self):
+        """A new reader positioned at the start of the buffer."""
+        return BufferReader(self.view, self.name)
+
+    def sha256(self):
+        """SHA-256 hex digest of the content (hashed in place)."""
+        return hashlib.sha256(self.view).hexdigest()
+
+    def close(self):
+        self.view.release()
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+        log_memory_peak(f"Upload {self.name} ({self.size / (1024 * 1024):.1f}MB, "
+                        f"{'spooled' if self.spooled else 'mapped from disk'})", self._rss_before)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _peak_rss_mb():
+    """Peak resident set size of the process in MB (ru_maxrss is KB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def log_memory_peak(label, rss_before):
+    """
+    Log the process peak RSS and how much it grew since rss_before. When
+    tracemalloc is tracing, the Python heap peak is reported (and reset) too.
+    """
+    rss_after = _peak_rss_mb()
+    message = f"{label}: peak RSS {rss_after:.0f}MB (+{rss_after - rss_before:.0f}MB)"
+    if tracemalloc.is_tracing():
+        _current, heap_peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        message += f", heap peak {heap_peak / (1024 * 1024):.1f}MB"
+    logger.info(message)
+
+
+def as_stream(file):
+    """
+    Seekable binary stream of a file's content for the extractors: a new
+    reader over the shared mapping for BufferReader input, else an in-memory copy.
+    """
+    if isinstance(file, BufferReader):
+        return BufferReader(file._view, file.name)
+    file.seek(0)
+    return BytesIO(file.read())
+
+
+def extract_document(file):
+    """
+    Extract text from uploaded resume file and report how it was extracted.
     Supports PDF, DOC, and DOCX formats.
-    
+
     Args:
         file: Django UploadedFile object
-        
+
     Returns:
-        str: Extracted text, or empty string if extraction fails
+        ExtractionResult: empty text if extraction fails
     """
+    started = time.perf_counter()
+    result = _extract_document(file)
+    metrics.observe('resume_extraction_seconds', time.perf_counter() - started, extractor=result.extractor or 'none')
+    return result
+
+
+def _extract_document(file):
     file_name = file.name.lower()
     file.seek(0)  # Reset file pointer to beginning
-    
+
     try:
         if file_name.endswith('.pdf'):
-            return extract_text_from_pdf(file)
+            return extract_pdf(file)
         elif file_name.endswith('.docx'):
-            return extract_text_from_docx(file)
+            text = extract_text_from_docx(file)
+            return ExtractionResult(text, 'python-docx', score_text_quality(text))
         elif file_name.endswith('.doc'):
-            return extract_text_from_doc(file)
+            text = extract_text_from_doc(file)
+            return ExtractionResult(text, 'python-docx', score_text_quality(text))
         else:
             logger.warning(f"Unsupported file type: {file_name}")
-            return ""
+            return ExtractionResult("")
     except Exception as e:
         logger.error(f"Error extracting text from {file_name}: {str(e)}")
-        # Return empty string instead of raising exception to not break the upload
-        return ""
+        # Return empty text instead of raising exception to not break the upload
+        return ExtractionResult("")
 
 
-def extract_text_from_pdf(file):
-    """Extract text from PDF file using pdfplumber (preferred) or PyPDF2 as fallback"""
-    file.seek(0)
-    
-    try:
-        # Try pdfplumber first (better text extraction)
-        import pdfplumber
-        with pdfplumber.open(BytesIO(file.read())) as pdf:
-            text_parts = []
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text_parts.append(page_text)
-            return "\n\n".join(text_parts)
-    except ImportError:
-        logger.warning("pdfplumber not available, falling back to PyPDF2")
-    except Exception as e:
-        logger.warning(f"pdfplumber extraction failed: {str(e)}, trying PyPDF2")
+def extract_text_from_file(file):
+    """
+    Extract text from uploaded resume file.
+    Supports PDF, DOC, and DOCX formats.
     
-    # Fallback to PyPDF2
-    try:
-        import PyPDF2
-        file.seek(0)
-        pdf_reader = PyPDF2.PdfReader(BytesIO(file.read()))
-        text_parts = []
-        for page in pdf_reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text_parts.append(page_text)
-        return "\n\n".join(text_parts)
-    except Exception as e:
-        logger.error(f"PyPDF2 extraction failed: {str(e)}")
-        return ""
+    Args:
+        file: Django UploadedFile object
+        
+    Returns:
+        str: Extracted text, or empty string if extraction fails
+    """
+    return extract_document(file).text
+
+
+class PageText:
+    """Text of one PDF page, with the extractor that produced it and how long it took."""
+
+    __slots__ = ('number', 'text', 'extractor', 'seconds')
+
+    def __init__(self, number, text, extractor, seconds):
+        self.number = number  # 1-based page number
+        self.text = text
+        self.extractor = extractor
+        self.seconds = seconds
+
+    def __repr__(self):
+        return f"PageText(number={self.number}, extractor={self.extractor!r}, chars={len(self.text)}, seconds={self.seconds:.3f})"
+
+
+class ExtractionResult:
+    """Extracted text of a document and which extractor produced it."""
+
+    __slots__ = ('text', 'extractor', 'score')
+
+    def __init__(self, text, extractor="", score=None):
+        self.text = text
+        self.extractor = extractor
+        self.score = score  # text quality score, see apply/text_quality.py
+
+    def __repr__(self):
+        return f"ExtractionResult(extractor={self.extractor!r}, score={self.score}, chars={len(self.text)})"
+
+
+DEFAULT_EXTRACTION_SETTINGS = {
+    'MAX_PAGES': 10,
+    'MAX_CHARS': 40000,
+    'QUALITY_THRESHOLD': 0.75,
+}
+
+
+def get_extraction_setting(name):
+    """Read a value from settings.RESUME_EXTRACTION, falling back to defaults."""
+    from django.conf import settings
+
+    return getattr(settings, 'RESUME_EXTRACTION', {}).get(name, DEFAULT_EXTRACTION_SETTINGS[name])
+
+
+def _pdfplumber_pages(stream, start_page):
+    """Yield (page_index, text) with pdfplumber, starting at start_page."""
+    import pdfplumber
+
+    with pdfplumber.open(stream) as pdf:
+        for index in range(start_page, len(pdf.pages)):
+            page = pdf.pages[index]
+            try:
+                yield index, page.extract_text() or ""
+            finally:
+                # Drop the page's parsed objects before moving on
+                page.close()
+
+
+def _pypdf2_pages(stream, start_page):
+    """Yield (page_index, text) with PyPDF2, starting at start_page."""
+    import PyPDF2
+
+    pdf_reader = PyPDF2.PdfReader(stream)
+    for index in range(start_page, len(pdf_reader.pages)):
+        yield index, pdf_reader.pages[index].extract_text() or ""
+
+
+# Extractors in the order they are tried; later ones resume from the failing page.
+# PyPDF2 is much faster, pdfplumber handles complex layouts better.
+FAST_PDF_EXTRACTORS = [
+    ('pypdf2', _pypdf2_pages),
+    ('pdfplumber', _pdfplumber_pages),
+]
+ACCURATE_PDF_EXTRACTORS = [
+    ('pdfplumber', _pdfplumber_pages),
+    ('pypdf2', _pypdf2_pages),
+]
+PDF_EXTRACTORS = FAST_PDF_EXTRACTORS
+
+
+def iter_pdf_pages(file, max_pages=None, max_chars=None, extractors=None):
+    """
+    Extract text from a PDF page by page.
+
+    Stops as soon as the page or character budget is reached. If an extractor
+    fails, the next one continues from the page that failed instead of
+    starting over.
+
+    Args:
+        file: Django UploadedFile object (or any binary file object)
+        max_pages: Maximum number of pages to read (defaults to RESUME_EXTRACTION['MAX_PAGES'])
+        max_chars: Maximum number of characters to return (defaults to RESUME_EXTRACTION['MAX_CHARS'])
+        extractors: List of (name, page generator) pairs, defaults to PDF_EXTRACTORS
+
+    Yields:
+        PageText for every page read
+    """
+    if max_pages is None:
+        max_pages = get_extraction_setting('MAX_PAGES')
+    if max_chars is None:
+        max_chars = get_extraction_setting('MAX_CHARS')
+
+    stream = as_stream(file)  # read once, shared by every extractor
+    next_page = 0
+    total_chars = 0
+
+    for name, page_generator in (extractors or PDF_EXTRACTORS):
+        stream.seek(0)
+        pages = page_generator(stream, next_page)
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    index, page_text = next(pages)
+                except StopIteration:
+                    return
+                elapsed = time.perf_counter() - started
+
+                if max_chars and total_chars + len(page_text) > max_chars:
+                    page_text = page_text[:max_chars - total_chars]
+                total_chars += len(page_text)
+                next_page = index + 1
+                yield PageText(index + 1, page_text, name, elapsed)
+
+                if (max_pages and next_page >= max_pages) or (max_chars and total_chars >= max_chars):
+                    logger.info(f"PDF extraction stopped at budget after {next_page} pages, {total_chars} chars")
+                    return
+        except ImportError:
+            logger.warning(f"{name} not available, trying next PDF extractor")
+        except Exception as e:
+            logger.warning(f"{name} extraction failed at page {next_page + 1}: {str(e)}, trying next PDF extractor")
+        finally:
+            pages.close()
+
+    logger.error("All PDF extractors failed")
+
+
+def _read_pdf_pages(file, extractors):
+    """Run iter_pdf_pages and return (text, page count, extractor names)."""
+    started = time.perf_counter()
+    text_parts = []
+    extractor_names = []
+    page_count = 0
+    slowest = None
+    for page in iter_pdf_pages(file, extractors=extractors):
+        page_count += 1
+        if page.text:
+            text_parts.append(page.text)
+        if page.extractor not in extractor_names:
+            extractor_names.append(page.extractor)
+        if slowest is None or page.seconds > slowest.seconds:
+            slowest = page
+        logger.debug(f"Extracted {page!r}")
+
+    if slowest is not None:
+        logger.info(
+            f"Extracted {page_count} PDF pages with {'+'.join(extractor_names)} in "
+            f"{time.perf_counter() - started:.3f}s (slowest: page {slowest.number}, {slowest.seconds:.3f}s)"
+        )
+    return PAGE_BREAK.join(text_parts), page_count, "+".join(extractor_names)
+
+
+def extract_pdf(file):
+    """
+    Extract text from a PDF, picking the extractor by output quality.
+
+    The fast extractor (PyPDF2) runs first. Its output is scored with
+    score_text_quality(); only when the score is below
+    RESUME_EXTRACTION['QUALITY_THRESHOLD'] does pdfplumber run as well,
+    and the better scoring text wins.
+
+    Args:
+        file: Django UploadedFile object
+
+    Returns:
+        ExtractionResult
+    """
+    threshold = get_extraction_setting('QUALITY_THRESHOLD')
+
+    text, page_count, extractor = _read_pdf_pages(file, FAST_PDF_EXTRACTORS)
+    score = score_text_quality(text, page_count)
+    if score >= threshold:
+        return ExtractionResult(text, extractor, score)
+
+    logger.info(f"Text quality {score} from {extractor or 'fast path'} is below {threshold}, trying pdfplumber")
+    accurate_text, accurate_pages, accurate_extractor = _read_pdf_pages(file, ACCURATE_PDF_EXTRACTORS)
+    accurate_score = score_text_quality(accurate_text, accurate_pages)
+    logger.info(f"Extractor scores: {extractor}={score}, {accurate_extractor}={accurate_score}")
+
+    if accurate_score > score:
+        return ExtractionResult(accurate_text, accurate_extractor, accurate_score)
+    return ExtractionResult(text, extractor, score)
+
+
+def extract_text_from_pdf(file):
+    """Extract text from PDF file, escalating from PyPDF2 to pdfplumber when the text quality is poor"""
+    return extract_pdf(file).text
 
 
 def extract_text_from_docx(file):
     """Extract text from DOCX file"""
     try:
         from docx import Document
-        file.seek(0)
-        doc = Document(BytesIO(file.read()))
+        doc = Document(as_stream(file))
         text_parts = []
         
         # Extract text from paragraphs
@@ -111,8 +476,7 @@ def extract_text_from_doc(file):
     try:
         # Try using python-docx (might work for some DOC files)
         from docx import Document
-        file.seek(0)
-        doc = Document(BytesIO(file.read()))
+        doc = Document(as_stream(file))
         text_parts = []
         for paragraph in doc.paragraphs:
             if paragraph.text.strip():
@@ -1,9 +1,25 @@
+import hmac
+
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from . import models
-from .serializers import ResumeSerializer
+from . import metrics, models, semantic_index
+from .direct_upload import DirectUploadError, create_upload, direct_uploads_available, finalize_upload
+from .matching import match_resumes
+from .pagination import ResumeKeysetPagination
+from .resume_queue import get_processing_setting, process_resume
+from .resume_search import search_available, search_resumes
+from .skill_index import resolve_query_skills, resumes_with_skills
+from .serializers import (
+    PROFILE_RELATIONS,
+    ResumeProfileSerializer,
+    ResumeSearchResultSerializer,
+    ResumeSerializer,
+    ResumeStatusSerializer,
+)
 
 
 class ResumeViewSet(viewsets.ModelViewSet):
@@ -11,14 +27,53 @@ class ResumeViewSet(viewsets.ModelViewSet):
     ViewSet for managing Resume uploads.
     
     Files are automatically saved to Cloudflare R2 via the storage backend.
+    Extraction and parsing happen asynchronously in the resume worker.
     """
     serializer_class = ResumeSerializer
+    pagination_class = ResumeKeysetPagination
     # permission_classes = [IsAuthenticated]
     queryset = models.Resume.objects.all()
     
     def get_queryset(self):
         """Return only resumes belonging to the authenticated user"""
-        return models.Resume.objects.filter(user=self.request.user)
+        queryset = models.Resume.objects.filter(user=self.request.user)
+        if self.action == 'list':
+            # Pages can hold many resumes: skip the large text columns
+            queryset = queryset.defer('text_extracted', 'text_normalized')
+        expand = self.get_expand()
+        if expand:
+            # One query per nested section for the whole page, not per resume
+            queryset = queryset.prefetch_related(*expand)
+        return queryset
+
+    def get_expand(self):
+        """
+        Parsed sections to nest in the response.
+
+        The profile action nests all of them; the list accepts
+        ``?expand=all`` or a comma-separated subset such as
+        ``?expand=experiences,skills``.
+        """
+        if self.action == 'profile':
+            return list(PROFILE_RELATIONS)
+        if self.action != 'list':
+            return []
+        requested = self.request.query_params.get('expand', '')
+        names = {name.strip() for name in requested.split(',') if name.strip()}
+        if 'all' in names:
+            return list(PROFILE_RELATIONS)
+        return [relation for relation in PROFILE_RELATIONS if relation in names]
+
+    def get_serializer_class(self):
+        if self.get_expand():
+            return ResumeProfileSerializer
+        return super().get_serializer_class()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand'] = self.get_expand()
+        context['omit_text'] = self.action == 'list'
+        return context
     
     def perform_create(self, serializer):
         """
@@ -26,6 +81,239 @@ class ResumeViewSet(viewsets.ModelViewSet):
         The file will be automatically uploaded to R2 via the storage backend.
         """
         serializer.save(user=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        """
+        Upload a resume.
+        Returns 202 Accepted while the resume waits in the processing queue.
+        """
+        response = super().create(request, *args, **kwargs)
+        if response.data.get('status') != models.Resume.Status.DONE:
+            response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
+    @action(detail=False, methods=['post'], url_path='upload-url')
+    def upload_url(self, request):
+        """
+        Get a presigned POST to upload a resume straight to storage.
+        POST /api/resumes/upload-url/ {"file_name": "cv.pdf", "content_type": "application/pdf", "size": 123456}
+
+        Upload the file to ``url`` as multipart form data with ``fields``,
+        then call finalize with ``upload_token``.
+        """
+        if not direct_uploads_available():
+            return Response(
+                {'error': 'Direct uploads require S3-compatible storage'},
+                status=status.HTTP_501_NOT_IMPLEMENTED,
+            )
+        file_name = str(request.data.get('file_name', '')).strip()
+        if not file_name:
+            return Response({'error': 'Missing file_name'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            size = request.data.get('size')
+            size = int(size) if size not in (None, '') else None
+            upload = create_upload(request.user, file_name, str(request.data.get('content_type', '')), size)
+        except (TypeError, ValueError):
+            return Response({'error': 'size must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        except DirectUploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(upload, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'])
+    def finalize(self, request):
+        """
+        Register a resume uploaded with a presigned POST and queue it.
+        POST /api/resumes/finalize/ {"upload_token": "..."}
+
+        The object's size and content type are checked from its metadata;
+        invalid objects are deleted. Returns 202 Accepted like a regular upload.
+        """
+        if not direct_uploads_available():
+            return Response(
+                {'error': 'Direct uploads require S3-compatible storage'},
+                status=status.HTTP_501_NOT_IMPLEMENTED,
+            )
+        token = str(request.data.get('upload_token', ''))
+        if not token:
+            return Response({'error': 'Missing upload_token'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            resume, created = finalize_upload(request.user, token)
+        except DirectUploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if created and get_processing_setting('MODE') == 'inline':
+            # No worker running (e.g. local development): process within the request
+            process_resume(resume)
+            resume.refresh_from_db()
+        data = ResumeSerializer(resume, context=self.get_serializer_context()).data
+        response_status = status.HTTP_200_OK if resume.status == models.Resume.Status.DONE else status.HTTP_202_ACCEPTED
+        return Response(data, status=response_status)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Full-text search over the user's resumes and their parsed sections.
+        GET /api/resumes/search/?q=python+django&limit=20
+
+        Results are ranked (skills and job titles weigh most) and carry a
+        highlighted snippet of the extracted text.
+        """
+        terms = request.query_params.get('q', '').strip()
+        if not terms:
+            return Response({'error': 'Missing search terms (q)'}, status=status.HTTP_400_BAD_REQUEST)
+        if not search_available():
+            return Response(
+                {'error': 'Full-text search requires PostgreSQL'},
+                status=status.HTTP_501_NOT_IMPLEMENTED,
+            )
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            limit = 20
+
+        results = search_resumes(models.Resume.objects.filter(user=request.user), terms)[:limit]
+        return Response({'results': ResumeSearchResultSerializer(results, many=True).data})
+
+    @action(detail=False, methods=['get'], url_path='by-skills')
+    def by_skills(self, request):
+        """
+        Find the user's resumes by canonical skill.
+        GET /api/resumes/by-skills/?all=python,django&any=aws,gcp&limit=20
+
+        ``all`` skills are required (AND), at least one ``any`` skill is
+        required (OR). Spellings are resolved through the skill dictionary,
+        so "python3" and "Python (Django)" match too.
+        """
+        def skill_names(param):
+            return [name.strip() for name in request.query_params.get(param, '').split(',') if name.strip()]
+
+        all_names, any_names = skill_names('all'), skill_names('any')
+        if not all_names and not any_names:
+            return Response({'error': 'Missing skills (all, any)'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            limit = 20
+
+        all_skills, unknown_all = resolve_query_skills(all_names)
+        any_skills, unknown_any = resolve_query_skills(any_names)
+        skills = {
+            'all': [skill.name for skill in all_skills],
+            'any': [skill.name for skill in any_skills],
+            'unknown': unknown_all + unknown_any,
+        }
+        # An unknown required skill, or only unknown optional ones, can match nothing
+        if unknown_all or (any_names and not any_skills):
+            return Response({'skills': skills, 'results': []})
+
+        resume_ids = list(resumes_with_skills(
+            models.Resume.objects.filter(user=request.user), all_skills, any_skills,
+        )[:limit])
+        resumes = (
+            models.Resume.objects.filter(id__in=resume_ids)
+            .defer('text_extracted', 'text_normalized')
+            .order_by('-id')
+        )
+        context = {**self.get_serializer_context(), 'omit_text': True}
+        serializer = ResumeSerializer(resumes, many=True, context=context)
+        return Response({'skills': skills, 'results': serializer.data})
+
+    @action(detail=False, methods=['post'])
+    def match(self, request):
+        """
+        Rank resumes against a job description.
+        POST /api/resumes/match/ {"job_description": "...", "top_k": 10}
+
+        Only the user's own processed resumes are ranked, like every other
+        endpoint of this viewset. Each result carries the combined score and a per-field breakdown
+        (text, skills, titles) with the terms that matched.
+        """
+        job_description = str(request.data.get('job_description', '')).strip()
+        if not job_description:
+            return Response({'error': 'Missing job_description'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            top_k = int(request.data.get('top_k') or 0) or None
+        except (TypeError, ValueError):
+            return Response({'error': 'top_k must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        matches = match_resumes(job_description, owner_id=request.user.id, top_k=top_k)
+
+        resumes = models.Resume.objects.filter(id__in=[match.resume_id for match in matches]).defer(
+            'text_extracted', 'text_normalized',
+        )
+        context = {**self.get_serializer_context(), 'omit_text': True}
+        resume_data = {row['id']: row for row in ResumeSerializer(resumes, many=True, context=context).data}
+        results = [
+            {
+                'resume': resume_data[match.resume_id],
+                'score': match.score,
+                'breakdown': match.breakdown,
+                'matched_terms': match.matched_terms,
+            }
+            for match in matches if match.resume_id in resume_data
+        ]
+        return Response({'results': results})
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """
+        Find resumes semantically similar to this one.
+        GET /api/resumes/{id}/similar/?limit=10
+        """
+        resume = self.get_object()
+        embedded = semantic_index.embed_resumes([resume.id])
+        if not embedded:
+            return Response({'results': []})
+        return self._similar_response(request, embedded[0][2], exclude_id=resume.id)
+
+    @action(detail=False, methods=['post'], url_path='similar')
+    def similar_to_text(self, request):
+        """
+        Find resumes semantically similar to a job post (or any text).
+        POST /api/resumes/similar/ {"text": "...", "limit": 10}
+        """
+        text = str(request.data.get('text', '')).strip()
+        if not text:
+            return Response({'error': 'Missing text'}, status=status.HTTP_400_BAD_REQUEST)
+        vector = semantic_index.embed_text(text, semantic_index.index_dim())
+        return self._similar_response(request, vector)
+
+    def _similar_response(self, request, vector, exclude_id=None):
+        """Search the user's resumes in the semantic index and serialize the hits."""
+        try:
+            limit = int(request.query_params.get('limit') or request.data.get('limit') or 0) or None
+        except (TypeError, ValueError):
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        hits = semantic_index.similar_resumes(vector, limit=limit, owner_id=request.user.id, exclude_id=exclude_id)
+
+        resumes = models.Resume.objects.filter(id__in=[resume_id for resume_id, _score in hits]).defer(
+            'text_extracted', 'text_normalized',
+        )
+        context = {**self.get_serializer_context(), 'omit_text': True}
+        resume_data = {row['id']: row for row in ResumeSerializer(resumes, many=True, context=context).data}
+        results = [
+            {'resume': resume_data[resume_id], 'score': score}
+            for resume_id, score in hits if resume_id in resume_data
+        ]
+        return Response({'results': results})
+
+    @action(detail=True, methods=['get'])
+    def profile(self, request, pk=None):
+        """
+        Get a resume with all its parsed sections nested.
+        GET /api/resumes/{id}/profile/
+        """
+        resume = self.get_object()
+        return Response(self.get_serializer(resume).data)
+
+    @action(detail=True, methods=['get'], url_path='status')
+    def processing_status(self, request, pk=None):
+        """
+        Get the processing status of a resume.
+        GET /api/resumes/{id}/status/
+        """
+        resume = self.get_object()
+        return Response(ResumeStatusSerializer(resume).data)
     
     @action(detail=True, methods=['get'])
     def download(self, request, pk=None):
@@ -46,3 +334,26 @@ class ResumeViewSet(viewsets.ModelViewSet):
             'file_url': file_url,
             'filename': resume.file.name.split('/')[-1] if resume.file.name else None
         })
+
+
+LOOPBACK_ADDRESSES = ('127.0.0.1', '::1')
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Pipeline metrics of all processes in the Prometheus text format.
+
+    Requires ``Authorization: Bearer <METRICS['TOKEN']>``; without a
+    configured token only loopback clients (a local Prometheus agent) are served.
+    """
+    if not metrics.get_metrics_setting('ENABLED'):
+        raise Http404
+    token = metrics.get_metrics_setting('TOKEN')
+    if token:
+        header = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(header.encode(), f'Bearer {token}'.encode()):
+            return HttpResponseForbidden()
+    elif request.META.get('REMOTE_ADDR') not in LOOPBACK_ADDRESSES:
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -37,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'corsheaders',
     'rest_framework',
     'djoser',
@@ -46,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'apply.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -141,3 +144,119 @@ SIMPLE_JWT = {
 CORS_ALLOWED_ORIGINS = []
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_ALL_ORIGINS = False  # Set to True only in development if needed
+
+# Resume processing queue
+# MODE 'queue' hands uploads to `manage.py process_resumes` workers,
+# 'inline' processes them within the upload request (no worker needed).
+RESUME_PROCESSING = {
+    'MODE': os.getenv('RESUME_PROCESSING_MODE', 'queue'),
+    'MAX_ATTEMPTS': 3,
+    'STALE_AFTER_SECONDS': 600,
+    'POLL_INTERVAL_SECONDS': 2,
+    # Threads for blocking storage (R2) writes of the async upload view (apply/async_views.py)
+    'ASYNC_STORAGE_WORKERS': 16,
+}
+
+# Uploads larger than this are spooled to a temp file instead of being held in
+# memory; apply.utils.SharedBuffer then maps them once for hashing, extraction and
+# the R2 upload. Run with PYTHONTRACEMALLOC=1 to log the heap peak per upload as well.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+
+# Direct-to-storage uploads (apply/direct_upload.py, S3-compatible storage only)
+# The bucket must allow CORS POSTs from the frontend origin for browser uploads.
+RESUME_UPLOADS = {
+    'MAX_FILE_SIZE': 10 * 1024 * 1024,
+    'URL_EXPIRES': 900,
+    'TOKEN_MAX_AGE': 3600,
+}
+
+# Gemini response cache (apply/gemini_cache.py)
+# Entries live in the database; LOCAL_MAX_ENTRIES > 0 adds an in-process LRU tier.
+GEMINI_CACHE = {
+    'ENABLED': True,
+    'TTL_SECONDS': 60 * 60 * 24 * 30,
+    'MAX_ENTRIES': 100000,
+    'LOCAL_MAX_ENTRIES': 256,
+    'LOCAL_TTL_SECONDS': 60 * 10,
+}
+
+# Gemini client (apply/gemini_client.py)
+# MODELS is the fallback chain; the first model that exists is kept for the process.
+GEMINI_CLIENT = {
+    'MODELS': ['gemini-1.5-flash', 'gemini-1.5-pro', 'gemini-pro'],
+    'MAX_RETRIES': 3,
+    'BACKOFF_BASE_SECONDS': 1.0,
+    'BACKOFF_MAX_SECONDS': 20.0,
+    'CIRCUIT_FAILURE_THRESHOLD': 5,
+    'CIRCUIT_RESET_SECONDS': 60,
+}
+
+# Batched Gemini parsing for bulk workloads (apply/gemini_batch.py)
+# Resumes shorter than SINGLE_DOCUMENT_CHARS are packed into one prompt,
+# up to MAX_DOCUMENTS resumes or MAX_CHARS characters per request.
+GEMINI_BATCH = {
+    'MAX_DOCUMENTS': 6,
+    'MAX_CHARS': 20000,
+    'SINGLE_DOCUMENT_CHARS': 8000,
+}
+
+# Resume text extraction budgets (apply/utils.py)
+# Gemini only needs the first pages of a resume; long portfolios stop early.
+# PDFs go through PyPDF2 first and only escalate to pdfplumber when the
+# text quality score (apply/text_quality.py) is below QUALITY_THRESHOLD.
+RESUME_EXTRACTION = {
+    'MAX_PAGES': 10,
+    'MAX_CHARS': 40000,
+    'QUALITY_THRESHOLD': 0.75,
+}
+
+# Resume progress events (apply/resume_events.py), streamed as server-sent
+# events from /api/resumes/{id}/events/. With STREAM_GEMINI the Gemini
+# response is streamed and each parsed item is written as soon as it completes.
+RESUME_EVENTS = {
+    'STREAM_GEMINI': True,
+    'RETENTION_SECONDS': 60 * 60,
+    'POLL_INTERVAL_SECONDS': 0.5,
+    'KEEPALIVE_SECONDS': 15,
+    'STREAM_TIMEOUT_SECONDS': 300,
+}
+
+# Full-text search over resumes (apply/resume_search.py, PostgreSQL only)
+# CONFIG is the text search configuration used for the vectors and queries.
+RESUME_SEARCH = {
+    'CONFIG': 'simple',
+    'HEADLINE_FRAGMENTS': 2,
+    'HEADLINE_WORDS': 25,
+}
+
+# Resume-to-job matching (apply/matching.py)
+# FIELD_WEIGHTS weighs the per-field TF-IDF cosine scores in the combined score.
+# REFRESH_INTERVAL is how often (seconds) a process picks up resumes parsed elsewhere.
+RESUME_MATCHING = {
+    'FIELD_WEIGHTS': {'text': 1.0, 'skills': 2.0, 'titles': 1.0},
+    'REFRESH_INTERVAL': 30,
+    'TOP_K': 10,
+    'MAX_TOP_K': 100,
+}
+
+# Semantic resume search (apply/semantic_index.py)
+# DIR holds the memory-mapped embedding files shared by all processes; it must be
+# on a local disk visible to the web and worker processes.
+# NPROBE trades recall for speed: inverted lists scanned per query.
+SEMANTIC_INDEX = {
+    'DIR': os.getenv('SEMANTIC_INDEX_DIR', str(BASE_DIR / 'var' / 'semantic_index')),
+    'DIM': 256,
+    'NPROBE': 8,
+    'MIN_TRAIN_ROWS': 1000,
+}
+
+# Pipeline metrics (apply/metrics.py), served in the Prometheus text format at
+# /api/internal/metrics/. Every process writes its values to DIR, which must be
+# on a local disk shared by the web and worker processes of a host. Scrape with
+# "Authorization: Bearer <TOKEN>"; without a TOKEN only loopback clients are served.
+METRICS = {
+    'ENABLED': True,
+    'DIR': os.getenv('METRICS_DIR', str(BASE_DIR / 'var' / 'metrics')),
+    'FLUSH_INTERVAL': 5,
+    'TOKEN': os.getenv('METRICS_TOKEN', ''),
+}
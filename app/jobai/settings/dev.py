@@ -50,6 +50,8 @@ STORAGES = {
             'default_acl': 'public-read',  # or 'private'
             'region_name': 'auto',         # R2 ignores this but boto3 needs it
             'signature_version': 's3v4',
+            # Stored files read back by the workers spool to disk above this size
+            'max_memory_size': FILE_UPLOAD_MAX_MEMORY_SIZE,
         },
     },
     # Static files (CSS, JS, etc.) -> Local storage (as before)